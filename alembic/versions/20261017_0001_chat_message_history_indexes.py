@@ -0,0 +1,33 @@
+"""chat message history indexes
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_chat_messages_quest_user_created", ["quest_id", "user_id", "created_at"]),
+    ("ix_chat_messages_quest_created", ["quest_id", "created_at"]),
+]
+
+def upgrade():
+    if not op.get_context().as_sql and not sa.inspect(op.get_bind()).has_table("chat_messages"):
+        # Fresh database: init_db creates the table together with its indexes
+        return
+
+    # CONCURRENTLY keeps chat writable while a large table is indexed (PostgreSQL)
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES:
+            op.create_index(name, "chat_messages", columns, if_not_exists=True, postgresql_concurrently=True)
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, _ in INDEXES:
+            op.drop_index(name, table_name="chat_messages", if_exists=True, postgresql_concurrently=True)
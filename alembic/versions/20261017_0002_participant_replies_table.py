@@ -0,0 +1,169 @@
+"""participant replies table
+
+Moves QuestParticipant.reply_log (a JSON array rewritten on every message)
+into the append-only participant_replies table and a message_count column.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from alembic import op
+from datetime import datetime
+import sqlalchemy as sa
+import uuid
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 500
+
+participants = sa.table(
+    "quest_participants",
+    sa.column("qp_id", sa.String),
+    sa.column("quest_id", sa.String),
+    sa.column("user_id", sa.String),
+    sa.column("reply_log", sa.JSON),
+    sa.column("message_count", sa.Integer)
+)
+
+replies = sa.table(
+    "participant_replies",
+    sa.column("reply_id", sa.String),
+    sa.column("quest_id", sa.String),
+    sa.column("user_id", sa.String),
+    sa.column("message_id", sa.String),
+    sa.column("score", sa.Integer),
+    sa.column("score_breakdown", sa.JSON),
+    sa.column("created_at", sa.DateTime)
+)
+
+messages = sa.table(
+    "chat_messages",
+    sa.column("message_id", sa.String),
+    sa.column("created_at", sa.DateTime)
+)
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if not inspector.has_table("quest_participants"):
+        # Fresh database: init_db creates the new schema
+        return
+
+    if not inspector.has_table("participant_replies"):
+        op.create_table(
+            "participant_replies",
+            sa.Column("reply_id", sa.String, primary_key=True),
+            sa.Column("quest_id", sa.String, sa.ForeignKey("quests.quest_id"), nullable=False),
+            sa.Column("user_id", sa.String, sa.ForeignKey("users.user_id"), nullable=False),
+            sa.Column("message_id", sa.String, sa.ForeignKey("chat_messages.message_id"), nullable=False, unique=True),
+            sa.Column("score", sa.Integer, nullable=False),
+            sa.Column("score_breakdown", sa.JSON),
+            sa.Column("created_at", sa.DateTime)
+        )
+        op.create_index(
+            "ix_participant_replies_quest_user_created",
+            "participant_replies",
+            ["quest_id", "user_id", "created_at"]
+        )
+
+    columns = {column["name"] for column in inspector.get_columns("quest_participants")}
+    if "message_count" not in columns:
+        op.add_column(
+            "quest_participants",
+            sa.Column("message_count", sa.Integer, nullable=False, server_default="0")
+        )
+    if "reply_log" not in columns:
+        return
+
+    _copy_reply_logs(bind)
+
+    with op.batch_alter_table("quest_participants") as batch_op:
+        batch_op.drop_column("reply_log")
+
+def _copy_reply_logs(bind):
+    """Copy every reply_log entry into participant_replies and set message_count"""
+    rows = bind.execute(
+        sa.select(participants.c.qp_id, participants.c.quest_id, participants.c.user_id, participants.c.reply_log)
+    ).fetchall()
+
+    for start in range(0, len(rows), BATCH_SIZE):
+        batch = rows[start:start + BATCH_SIZE]
+        entries = [
+            (row, entry)
+            for row in batch
+            for entry in (row.reply_log or [])
+            if isinstance(entry, dict) and entry.get("message_id")
+        ]
+
+        # Entries whose chat message no longer exists cannot satisfy the foreign key
+        existing = {}
+        message_ids = list({entry["message_id"] for _, entry in entries})
+        for offset in range(0, len(message_ids), BATCH_SIZE):
+            existing.update(bind.execute(
+                sa.select(messages.c.message_id, messages.c.created_at).where(
+                    messages.c.message_id.in_(message_ids[offset:offset + BATCH_SIZE])
+                )
+            ).fetchall())
+
+        counts = {}
+        inserts = []
+        for row, entry in entries:
+            message_id = entry["message_id"]
+            if message_id not in existing:
+                continue
+            # Popped so a message logged twice is only copied once
+            created_at = existing.pop(message_id)
+            counts[row.qp_id] = counts.get(row.qp_id, 0) + 1
+            inserts.append({
+                "reply_id": str(uuid.uuid4()),
+                "quest_id": row.quest_id,
+                "user_id": row.user_id,
+                "message_id": message_id,
+                "score": entry.get("score") or 0,
+                "score_breakdown": entry.get("score_breakdown") or {},
+                "created_at": created_at or _parse_timestamp(entry.get("timestamp"))
+            })
+
+        if inserts:
+            op.bulk_insert(replies, inserts)
+        for qp_id, count in counts.items():
+            bind.execute(
+                participants.update().where(participants.c.qp_id == qp_id).values(message_count=count)
+            )
+
+def _parse_timestamp(value):
+    try:
+        return datetime.fromisoformat(value) if value else None
+    except (TypeError, ValueError):
+        return None
+
+def downgrade():
+    bind = op.get_bind()
+    if not sa.inspect(bind).has_table("participant_replies"):
+        return
+
+    op.add_column("quest_participants", sa.Column("reply_log", sa.JSON))
+
+    logs = {}
+    for reply in bind.execute(sa.select(replies).order_by(replies.c.created_at)):
+        logs.setdefault((reply.quest_id, reply.user_id), []).append({
+            "message_id": reply.message_id,
+            "score": reply.score,
+            "score_breakdown": reply.score_breakdown or {},
+            "timestamp": reply.created_at.isoformat() if reply.created_at else None
+        })
+    for (quest_id, user_id), reply_log in logs.items():
+        bind.execute(
+            participants.update().where(
+                participants.c.quest_id == quest_id,
+                participants.c.user_id == user_id
+            ).values(reply_log=reply_log)
+        )
+
+    with op.batch_alter_table("quest_participants") as batch_op:
+        batch_op.drop_column("message_count")
+    op.drop_index("ix_participant_replies_quest_user_created", table_name="participant_replies")
+    op.drop_table("participant_replies")
@@ -0,0 +1,44 @@
+"""chat message keyset indexes
+
+Adds message_id to the chat history indexes so (created_at, message_id)
+keyset pages are served in index order.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+NEW_INDEXES = [
+    ("ix_chat_messages_quest_user_created_id", ["quest_id", "user_id", "created_at", "message_id"]),
+    ("ix_chat_messages_quest_created_id", ["quest_id", "created_at", "message_id"]),
+]
+
+OLD_INDEXES = [
+    ("ix_chat_messages_quest_user_created", ["quest_id", "user_id", "created_at"]),
+    ("ix_chat_messages_quest_created", ["quest_id", "created_at"]),
+]
+
+def _swap(create, drop):
+    if not op.get_context().as_sql and not sa.inspect(op.get_bind()).has_table("chat_messages"):
+        # Fresh database: init_db creates the table together with its indexes
+        return
+
+    # Build the replacements before dropping so history queries always have an index
+    with op.get_context().autocommit_block():
+        for name, columns in create:
+            op.create_index(name, "chat_messages", columns, if_not_exists=True, postgresql_concurrently=True)
+        for name, _ in drop:
+            op.drop_index(name, table_name="chat_messages", if_exists=True, postgresql_concurrently=True)
+
+def upgrade():
+    _swap(NEW_INDEXES, OLD_INDEXES)
+
+def downgrade():
+    _swap(OLD_INDEXES, NEW_INDEXES)
@@ -0,0 +1,128 @@
+"""incremental leaderboard
+
+Adds last_reply_at and total_messages to leaderboards, rebuilds every quest
+leaderboard from quest_participants (rows were previously rewritten on each
+message) and adds the rank-order and (quest_id, user_id) indexes used by
+incremental rank maintenance.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+from alembic import op
+from datetime import datetime
+import sqlalchemy as sa
+import uuid
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 500
+
+participants = sa.table(
+    "quest_participants",
+    sa.column("quest_id", sa.String),
+    sa.column("user_id", sa.String),
+    sa.column("score", sa.Integer),
+    sa.column("message_count", sa.Integer),
+    sa.column("last_reply_at", sa.DateTime)
+)
+
+leaderboards = sa.table(
+    "leaderboards",
+    sa.column("leaderboard_id", sa.String),
+    sa.column("quest_id", sa.String),
+    sa.column("user_id", sa.String),
+    sa.column("score", sa.Integer),
+    sa.column("rank", sa.Integer),
+    sa.column("last_reply_at", sa.DateTime),
+    sa.column("total_messages", sa.Integer),
+    sa.column("updated_at", sa.DateTime)
+)
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if not inspector.has_table("leaderboards"):
+        # Fresh database: init_db creates the new schema
+        return
+
+    columns = {column["name"] for column in inspector.get_columns("leaderboards")}
+    if "last_reply_at" not in columns:
+        op.add_column("leaderboards", sa.Column("last_reply_at", sa.DateTime))
+    if "total_messages" not in columns:
+        op.add_column("leaderboards", sa.Column("total_messages", sa.Integer, nullable=False, server_default="0"))
+
+    _rebuild_quest_leaderboards(bind)
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_leaderboards_quest_score_reply",
+            "leaderboards",
+            ["quest_id", sa.text("score DESC"), "last_reply_at", "user_id"],
+            if_not_exists=True,
+            postgresql_concurrently=True
+        )
+        op.create_index(
+            "ix_leaderboards_quest_user",
+            "leaderboards",
+            ["quest_id", "user_id"],
+            unique=True,
+            if_not_exists=True,
+            postgresql_concurrently=True
+        )
+
+def _rebuild_quest_leaderboards(bind):
+    """Rank every quest's replied participants; also removes duplicate (quest, user) rows"""
+    bind.execute(leaderboards.delete().where(leaderboards.c.quest_id.isnot(None)))
+
+    rows = bind.execute(
+        sa.select(
+            participants.c.quest_id,
+            participants.c.user_id,
+            participants.c.score,
+            participants.c.message_count,
+            participants.c.last_reply_at
+        ).where(participants.c.last_reply_at.isnot(None)).order_by(
+            participants.c.quest_id,
+            participants.c.score.desc(),
+            participants.c.last_reply_at,
+            participants.c.user_id
+        )
+    ).fetchall()
+
+    now = datetime.now()
+    inserts = []
+    quest_id, rank = None, 0
+    for row in rows:
+        rank = rank + 1 if row.quest_id == quest_id else 1
+        quest_id = row.quest_id
+        inserts.append({
+            "leaderboard_id": str(uuid.uuid4()),
+            "quest_id": row.quest_id,
+            "user_id": row.user_id,
+            "score": row.score or 0,
+            "rank": rank,
+            "last_reply_at": row.last_reply_at,
+            "total_messages": row.message_count or 0,
+            "updated_at": now
+        })
+        if len(inserts) >= BATCH_SIZE:
+            op.bulk_insert(leaderboards, inserts)
+            inserts = []
+    if inserts:
+        op.bulk_insert(leaderboards, inserts)
+
+def downgrade():
+    if not sa.inspect(op.get_bind()).has_table("leaderboards"):
+        return
+
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_leaderboards_quest_user", table_name="leaderboards", if_exists=True, postgresql_concurrently=True)
+        op.drop_index("ix_leaderboards_quest_score_reply", table_name="leaderboards", if_exists=True, postgresql_concurrently=True)
+
+    with op.batch_alter_table("leaderboards") as batch_op:
+        batch_op.drop_column("total_messages")
+        batch_op.drop_column("last_reply_at")
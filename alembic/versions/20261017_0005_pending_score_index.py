@@ -0,0 +1,46 @@
+"""pending score index
+
+Adds a partial index over user messages with score IS NULL, used by the
+batch scorer's periodic recovery of messages a worker lost before scoring.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+PENDING = sa.text("score IS NULL AND user_id IS NOT NULL")
+
+def upgrade():
+    if not op.get_context().as_sql and not sa.inspect(op.get_bind()).has_table("chat_messages"):
+        # Fresh database: init_db creates the table together with its indexes
+        return
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_chat_messages_score_pending",
+            "chat_messages",
+            ["created_at"],
+            if_not_exists=True,
+            postgresql_concurrently=True,
+            postgresql_where=PENDING,
+            sqlite_where=PENDING
+        )
+
+def downgrade():
+    if not op.get_context().as_sql and not sa.inspect(op.get_bind()).has_table("chat_messages"):
+        return
+
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_chat_messages_score_pending",
+            table_name="chat_messages",
+            if_exists=True,
+            postgresql_concurrently=True
+        )
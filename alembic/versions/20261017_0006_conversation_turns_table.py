@@ -0,0 +1,149 @@
+"""conversation turns table
+
+Moves ConversationSummary.recent_turns (a JSON array rewritten on every
+message) into the append-only conversation_turns table.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+"""
+from alembic import op
+from datetime import datetime, timedelta
+import sqlalchemy as sa
+import uuid
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 500
+
+summaries = sa.table(
+    "conversation_summaries",
+    sa.column("quest_id", sa.String),
+    sa.column("user_id", sa.String),
+    sa.column("recent_turns", sa.JSON),
+    sa.column("updated_at", sa.DateTime)
+)
+
+turns = sa.table(
+    "conversation_turns",
+    sa.column("turn_id", sa.String),
+    sa.column("quest_id", sa.String),
+    sa.column("user_id", sa.String),
+    sa.column("message_id", sa.String),
+    sa.column("role", sa.String),
+    sa.column("content", sa.Text),
+    sa.column("created_at", sa.DateTime)
+)
+
+messages = sa.table(
+    "chat_messages",
+    sa.column("message_id", sa.String),
+    sa.column("created_at", sa.DateTime)
+)
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if not inspector.has_table("conversation_summaries"):
+        # Fresh database: init_db creates the new schema
+        return
+
+    if not inspector.has_table("conversation_turns"):
+        op.create_table(
+            "conversation_turns",
+            sa.Column("turn_id", sa.String, primary_key=True),
+            sa.Column("quest_id", sa.String, sa.ForeignKey("quests.quest_id"), nullable=False),
+            sa.Column("user_id", sa.String, sa.ForeignKey("users.user_id"), nullable=False),
+            sa.Column("message_id", sa.String, sa.ForeignKey("chat_messages.message_id")),
+            sa.Column("role", sa.String, nullable=False),
+            sa.Column("content", sa.Text, nullable=False),
+            sa.Column("created_at", sa.DateTime, nullable=False)
+        )
+        op.create_index(
+            "ix_conversation_turns_quest_user_created",
+            "conversation_turns",
+            ["quest_id", "user_id", "created_at"]
+        )
+
+    columns = {column["name"] for column in inspector.get_columns("conversation_summaries")}
+    if "recent_turns" not in columns:
+        return
+
+    _copy_recent_turns(bind)
+
+    with op.batch_alter_table("conversation_summaries") as batch_op:
+        batch_op.drop_column("recent_turns")
+
+def _copy_recent_turns(bind):
+    """Copy every recent_turns entry into conversation_turns, keeping their order"""
+    rows = bind.execute(
+        sa.select(summaries.c.quest_id, summaries.c.user_id, summaries.c.recent_turns, summaries.c.updated_at)
+    ).fetchall()
+
+    for start in range(0, len(rows), BATCH_SIZE):
+        batch = rows[start:start + BATCH_SIZE]
+        entries = [
+            (row, [entry for entry in (row.recent_turns or []) if isinstance(entry, dict) and entry.get("content")])
+            for row in batch
+        ]
+
+        existing = {}
+        message_ids = list({entry["message_id"] for _, log in entries for entry in log if entry.get("message_id")})
+        for offset in range(0, len(message_ids), BATCH_SIZE):
+            existing.update(bind.execute(
+                sa.select(messages.c.message_id, messages.c.created_at).where(
+                    messages.c.message_id.in_(message_ids[offset:offset + BATCH_SIZE])
+                )
+            ).fetchall())
+
+        inserts = []
+        for row, log in entries:
+            # Entries without a surviving chat message get increasing timestamps so their order is kept
+            fallback = (row.updated_at or datetime.utcnow()) - timedelta(microseconds=len(log))
+            previous = None
+            for index, entry in enumerate(log):
+                message_id = entry.get("message_id")
+                created_at = existing.get(message_id) or fallback + timedelta(microseconds=index)
+                if previous is not None and created_at <= previous:
+                    created_at = previous + timedelta(microseconds=1)
+                previous = created_at
+                inserts.append({
+                    "turn_id": str(uuid.uuid4()),
+                    "quest_id": row.quest_id,
+                    "user_id": row.user_id,
+                    "message_id": message_id if message_id in existing else None,
+                    "role": entry.get("role") or "user",
+                    "content": entry["content"],
+                    "created_at": created_at
+                })
+
+        if inserts:
+            op.bulk_insert(turns, inserts)
+
+def downgrade():
+    bind = op.get_bind()
+    if not sa.inspect(bind).has_table("conversation_turns"):
+        return
+
+    op.add_column("conversation_summaries", sa.Column("recent_turns", sa.JSON))
+
+    logs = {}
+    for turn in bind.execute(sa.select(turns).order_by(turns.c.created_at)):
+        logs.setdefault((turn.quest_id, turn.user_id), []).append({
+            "message_id": turn.message_id,
+            "role": turn.role,
+            "content": turn.content
+        })
+    for (quest_id, user_id), recent_turns in logs.items():
+        bind.execute(
+            summaries.update().where(
+                summaries.c.quest_id == quest_id,
+                summaries.c.user_id == user_id
+            ).values(recent_turns=recent_turns)
+        )
+
+    op.drop_index("ix_conversation_turns_quest_user_created", table_name="conversation_turns")
+    op.drop_table("conversation_turns")
@@ -0,0 +1,40 @@
+"""quest prompt version
+
+Adds Quest.prompt_version, bumped on every quest edit, so the compiled
+prompt cache is keyed on (quest_id, prompt_version) instead of a hash of
+the quest's content computed on every message.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("quests"):
+        # Fresh database: init_db creates the new schema
+        return
+
+    columns = {column["name"] for column in inspector.get_columns("quests")}
+    if "prompt_version" not in columns:
+        op.add_column(
+            "quests",
+            sa.Column("prompt_version", sa.Integer, nullable=False, server_default="1")
+        )
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("quests"):
+        return
+
+    columns = {column["name"] for column in inspector.get_columns("quests")}
+    if "prompt_version" in columns:
+        with op.batch_alter_table("quests") as batch_op:
+            batch_op.drop_column("prompt_version")
@@ -0,0 +1,123 @@
+"""global leaderboard backfill
+
+Recomputes every user's global totals and ranks from quest_participants.
+Totals are now maintained by adding each score change to the stored row, so
+rows written by the old periodic refresh have to be exact before the first
+delta lands on them.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17
+"""
+from alembic import op
+from datetime import datetime
+import sqlalchemy as sa
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 500
+
+participants = sa.table(
+    "quest_participants",
+    sa.column("quest_id", sa.String),
+    sa.column("user_id", sa.String),
+    sa.column("score", sa.Integer)
+)
+
+users = sa.table(
+    "users",
+    sa.column("user_id", sa.String),
+    sa.column("username", sa.String)
+)
+
+global_leaderboard = sa.table(
+    "global_leaderboard",
+    sa.column("user_id", sa.String),
+    sa.column("username", sa.String),
+    sa.column("total_score", sa.Float),
+    sa.column("quests_participated", sa.Integer),
+    sa.column("average_score", sa.Float),
+    sa.column("last_updated", sa.DateTime),
+    sa.column("rank", sa.Integer)
+)
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if not inspector.has_table("global_leaderboard") or not inspector.has_table("quest_participants"):
+        # Fresh database: init_db creates the schema and rows are built as users join quests
+        return
+
+    _backfill_totals(bind)
+    _backfill_ranks(bind)
+
+def _backfill_totals(bind):
+    """Set every user's totals from their quest participations (as rebuild_global_leaderboard does)"""
+    totals = bind.execute(
+        sa.select(
+            participants.c.user_id,
+            users.c.username,
+            sa.func.coalesce(sa.func.sum(participants.c.score), 0).label("total_score"),
+            sa.func.count(participants.c.quest_id).label("quests_participated")
+        ).select_from(
+            participants.outerjoin(users, users.c.user_id == participants.c.user_id)
+        ).group_by(participants.c.user_id, users.c.username)
+    ).fetchall()
+    existing = {user_id for user_id, in bind.execute(sa.select(global_leaderboard.c.user_id))}
+
+    now = datetime.utcnow()
+    updates, inserts = [], []
+    for row in totals:
+        values = {
+            "total_score": float(row.total_score),
+            "quests_participated": row.quests_participated,
+            "average_score": float(row.total_score) / row.quests_participated if row.quests_participated else 0.0,
+            "last_updated": now
+        }
+        if row.user_id in existing:
+            updates.append({"b_user_id": row.user_id, **values})
+        else:
+            inserts.append({"user_id": row.user_id, "username": row.username or row.user_id, "rank": None, **values})
+
+    update_totals = global_leaderboard.update().where(
+        global_leaderboard.c.user_id == sa.bindparam("b_user_id")
+    ).values(
+        total_score=sa.bindparam("total_score"),
+        quests_participated=sa.bindparam("quests_participated"),
+        average_score=sa.bindparam("average_score"),
+        last_updated=sa.bindparam("last_updated")
+    )
+    for start in range(0, len(updates), BATCH_SIZE):
+        bind.execute(update_totals, updates[start:start + BATCH_SIZE])
+    for start in range(0, len(inserts), BATCH_SIZE):
+        op.bulk_insert(global_leaderboard, inserts[start:start + BATCH_SIZE])
+
+    # Users who left every quest keep their row (daily bonuses reference it) with zero totals
+    bind.execute(
+        global_leaderboard.update().where(
+            global_leaderboard.c.user_id.notin_(sa.select(participants.c.user_id))
+        ).values(total_score=0.0, quests_participated=0, average_score=0.0, last_updated=now)
+    )
+
+def _backfill_ranks(bind):
+    """Rank by average_score, ties by user_id, like GLOBAL_RANK_ORDER"""
+    rows = bind.execute(
+        sa.select(global_leaderboard.c.user_id, global_leaderboard.c.rank).order_by(
+            global_leaderboard.c.average_score.desc(),
+            global_leaderboard.c.user_id
+        )
+    ).fetchall()
+    changed = [{"b_user_id": row.user_id, "rank": rank} for rank, row in enumerate(rows, 1) if row.rank != rank]
+
+    update_rank = global_leaderboard.update().where(
+        global_leaderboard.c.user_id == sa.bindparam("b_user_id")
+    ).values(rank=sa.bindparam("rank"))
+    for start in range(0, len(changed), BATCH_SIZE):
+        bind.execute(update_rank, changed[start:start + BATCH_SIZE])
+
+def downgrade():
+    # Data only: the recomputed totals are also valid for the previous revision
+    pass
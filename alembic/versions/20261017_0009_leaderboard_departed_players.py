@@ -0,0 +1,51 @@
+"""leaderboard departed players
+
+Deletes quest leaderboard rows of players who have left the quest. Entries
+are now updated per player and never rebuilt on scoring, so rows left
+behind by earlier leaves would otherwise stay ranked for good; leave_quest
+now deletes the row itself.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+participants = sa.table(
+    "quest_participants",
+    sa.column("quest_id", sa.String),
+    sa.column("user_id", sa.String)
+)
+
+leaderboards = sa.table(
+    "leaderboards",
+    sa.column("quest_id", sa.String),
+    sa.column("user_id", sa.String)
+)
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if not inspector.has_table("leaderboards") or not inspector.has_table("quest_participants"):
+        # Fresh database: init_db creates the schema
+        return
+
+    bind.execute(
+        leaderboards.delete().where(
+            leaderboards.c.quest_id.isnot(None),
+            ~sa.exists().where(
+                participants.c.quest_id == leaderboards.c.quest_id,
+                participants.c.user_id == leaderboards.c.user_id
+            )
+        )
+    )
+
+def downgrade():
+    # Data only: the deleted rows belonged to players who had left
+    pass
@@ -1,5 +1,8 @@
 from celery import Celery
+from celery.signals import worker_process_init
 from app.core.config import settings
+import asyncio
+import threading
 
 # Create Celery app
 celery_app = Celery(
@@ -23,3 +26,27 @@ celery_app.conf.update(
         },
     },
 )
+
+# The Gemini SDK binds its async gRPC client to the event loop it is first used
+# on, so warmup and every task run on one long-lived loop per worker process
+# (asyncio.run would give each call a new loop and break the shared client)
+_worker_loop = None
+_worker_loop_lock = threading.Lock()
+
+def run_async(coro):
+    """Run a coroutine to completion on this worker process's event loop"""
+    global _worker_loop
+    with _worker_loop_lock:
+        if _worker_loop is None or _worker_loop.is_closed():
+            _worker_loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_worker_loop)
+        return _worker_loop.run_until_complete(coro)
+
+@worker_process_init.connect
+def init_worker_ai_clients(**kwargs):
+    """Create the shared AI client registry once per worker process"""
+    from app.services.ai_clients import init_ai_clients
+    
+    ai_clients = init_ai_clients()
+    if settings.AI_WARMUP_ON_STARTUP:
+        run_async(ai_clients.warmup())
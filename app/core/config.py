@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Dict, List
 import os
 
 class Settings(BaseSettings):
@@ -9,6 +9,21 @@ class Settings(BaseSettings):
     
     # Database (SQLite for testing, PostgreSQL for production)
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./test.db")
+    # Async driver URL for the hot routers; derived from DATABASE_URL when empty
+    # (postgresql -> postgresql+asyncpg, sqlite -> sqlite+aiosqlite)
+    ASYNC_DATABASE_URL: str = ""
+    # Connection pool, per engine and worker process (the sync and async engines
+    # each get one; ignored for SQLite)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0  # seconds to wait for a free connection before failing
+    DB_POOL_RECYCLE: int = 300  # seconds; keep below the server/proxy idle timeout
+    DB_POOL_PRE_PING: bool = True
+    # Optional read replica for read-only GET endpoints (same pool settings)
+    DATABASE_REPLICA_URL: str = ""
+    # After a write, that client's reads go to the primary for this long so they
+    # see their own changes despite replication lag
+    DB_REPLICA_PIN_SECONDS: float = 5.0
     
     # Redis removed - using external cron jobs instead
     # REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379")
@@ -25,7 +40,98 @@ class Settings(BaseSettings):
     GEMINI_MODEL: str = "gemini-2.5-flash"
     GEMINI_TEMPERATURE: float = 0.8
     GEMINI_MAX_TOKENS: int = 1000
-    
+
+    # AI backend: "gemini" or "fake" (deterministic, offline; for load tests)
+    AI_BACKEND: str = "gemini"
+    AI_FAKE_SEED: int = 0
+    AI_FAKE_LATENCY_DISTRIBUTION: str = "lognormal"  # fixed, uniform, lognormal
+    AI_FAKE_LATENCY_MS: float = 800.0  # fixed value, uniform center or lognormal median
+    AI_FAKE_LATENCY_JITTER_MS: float = 400.0  # uniform half-width
+    AI_FAKE_LATENCY_SIGMA: float = 0.5  # lognormal shape
+    AI_FAKE_ERROR_RATE: float = 0.0
+    AI_FAKE_SCORE_JSON: str = ""  # canned scoring JSON; random deterministic scores when empty
+
+    # AI request limits (per worker process)
+    AI_MAX_CONCURRENT_REQUESTS: int = 8
+    AI_REQUEST_TIMEOUT_SECONDS: float = 30.0
+    # Per-class LLM scheduling (priority: chat > scoring > opening > engagement > summary).
+    # rate_per_second=0 disables the token bucket; max_queue bounds waiting requests.
+    AI_SCHEDULER_CLASS_LIMITS: Dict[str, Dict[str, float]] = {
+        "chat": {"rate_per_second": 0, "burst": 1, "max_queue": 200},
+        "scoring": {"rate_per_second": 0, "burst": 1, "max_queue": 200},
+        "opening": {"rate_per_second": 1, "burst": 5, "max_queue": 20},
+        "engagement": {"rate_per_second": 2, "burst": 5, "max_queue": 1000},
+        "summary": {"rate_per_second": 2, "burst": 5, "max_queue": 500}
+    }
+    # Reply and score in a single structured-output call instead of two
+    AI_COMBINED_RESPONSE_SCORING: bool = False
+    # Compiled per-quest character prompts kept in memory
+    AI_PROMPT_CACHE_SIZE: int = 512
+    # Send the character persona as a Gemini system instruction (needs model support)
+    AI_USE_SYSTEM_INSTRUCTION: bool = True
+    # Memoized scores for repeated messages (LRU + TTL, optional score_cache table)
+    AI_SCORE_CACHE_ENABLED: bool = True
+    AI_SCORE_CACHE_SIZE: int = 10000
+    AI_SCORE_CACHE_TTL_SECONDS: int = 86400
+    AI_SCORE_CACHE_PERSISTENT: bool = False
+    # How often a worker deletes expired score_cache rows (on its next write)
+    AI_SCORE_CACHE_PURGE_INTERVAL_SECONDS: int = 3600
+    # Circuit breaker around the primary model; while open, calls use
+    # AI_FALLBACK_MODEL (or fail fast with 503 when none is configured)
+    AI_BREAKER_FAILURE_THRESHOLD: int = 5
+    AI_BREAKER_WINDOW_SECONDS: float = 30.0
+    AI_BREAKER_RESET_SECONDS: float = 30.0
+    AI_FALLBACK_MODEL: str = ""
+    # Fire a backup request when a call outlives the recent p95 latency
+    AI_HEDGE_ENABLED: bool = False
+    # Reply immediately and score messages later in batched JSON-array calls
+    AI_ASYNC_SCORING: bool = False
+    AI_SCORING_BATCH_SIZE: int = 8
+    AI_SCORING_BATCH_WAIT_SECONDS: float = 0.5
+    AI_SCORING_RETRY_SECONDS: float = 5.0
+    # Re-queue unscored messages lost by a worker (crash, kill, shutdown) at startup
+    # and every interval (0 = startup only); the grace period must outlast retries
+    AI_SCORING_RECOVERY_INTERVAL_SECONDS: float = 300.0
+    AI_SCORING_RECOVERY_GRACE_SECONDS: float = 120.0
+    AI_SCORING_RECOVERY_MAX_AGE_SECONDS: float = 86400.0
+    # Send one tiny request at startup so the first user call isn't cold
+    AI_WARMUP_ON_STARTUP: bool = False
+    AI_WARMUP_TIMEOUT_SECONDS: float = 10.0
+    # Per-call token/latency accounting (ring buffer, optional llm_call_log table)
+    AI_USAGE_BUFFER_SIZE: int = 10000
+    AI_USAGE_PERSISTENT: bool = False
+    AI_USAGE_FLUSH_SIZE: int = 50
+    # Prompt history budget: rolling per-participant summary + last few turns
+    AI_HISTORY_RECENT_TURNS: int = 6
+    AI_HISTORY_TURN_MAX_CHARS: int = 1000
+    AI_SUMMARY_REFRESH_TURNS: int = 10
+    AI_SUMMARY_MAX_CHARS: int = 1500
+
+    # Chat history polls (after=cursor) only return messages at least this old,
+    # so a cursor never skips a message whose write is still committing
+    CHAT_POLL_SETTLE_SECONDS: float = 2.0
+
+    # Idempotency-Key replay for chat sends and payments (optional idempotency_keys
+    # table shares keys across workers); duplicates wait for the in-flight request
+    IDEMPOTENCY_TTL_SECONDS: int = 86400
+    IDEMPOTENCY_MAX_ENTRIES: int = 10000
+    IDEMPOTENCY_WAIT_SECONDS: float = 60.0
+    IDEMPOTENCY_PERSISTENT: bool = False
+
+    # In-memory ranking per quest for leaderboard reads; changed entries are written
+    # to the leaderboards table every LEADERBOARD_SNAPSHOT_SECONDS. State is per
+    # process, so only enable it with a single worker
+    LEADERBOARD_ENGINE_ENABLED: bool = False
+    LEADERBOARD_SNAPSHOT_SECONDS: float = 5.0
+    LEADERBOARD_ENGINE_MAX_QUESTS: int = 100
+
+    # Serialized /live, /top and global leaderboard responses, invalidated by a
+    # per-quest version bumped on score commits. Versions are per process, so
+    # with several workers the TTL bounds how stale another worker's copy can be
+    LEADERBOARD_CACHE_ENABLED: bool = True
+    LEADERBOARD_CACHE_TTL_SECONDS: float = 2.0
+    LEADERBOARD_CACHE_MAX_ENTRIES: int = 1000
+
     # Security
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key-here")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
@@ -1,21 +1,113 @@
-from sqlalchemy import create_engine, MetaData, text
+from sqlalchemy import create_engine, event, MetaData, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.exc import SQLAlchemyError, OperationalError
-from fastapi import HTTPException
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.exc import SQLAlchemyError, OperationalError, TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from fastapi import HTTPException, Request, Response
+from fastapi.exceptions import RequestValidationError
 from app.core.config import settings
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Callable, Dict
 import asyncio
 import logging
+import math
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
+class PoolStats:
+    """Checkout counters for one connection pool"""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, wait: float, timed_out: bool = False):
+        with self._lock:
+            self.checkouts += 1
+            self.timeouts += timed_out
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": round(self.total_wait / self.checkouts * 1000, 2) if self.checkouts else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 2)
+            }
+
+class _InstrumentedPool:
+    """Times every checkout (queue wait, new connection and pre-ping)"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def connect(self):
+        started = time.monotonic()
+        try:
+            connection = super().connect()
+        except PoolTimeoutError:
+            self.stats.record(time.monotonic() - started, timed_out=True)
+            raise
+        self.stats.record(time.monotonic() - started)
+        return connection
+
+class InstrumentedQueuePool(_InstrumentedPool, QueuePool):
+    pass
+
+class InstrumentedAsyncQueuePool(_InstrumentedPool, AsyncAdaptedQueuePool):
+    pass
+
+def _pool_options(url, poolclass) -> Dict[str, Any]:
+    """Pool settings for server databases; SQLite keeps SQLAlchemy's default pool"""
+    options = {"pool_pre_ping": settings.DB_POOL_PRE_PING}  # Verify connections before use
+    if make_url(url).get_backend_name() != "sqlite":
+        options.update(
+            poolclass=poolclass,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE
+        )
+    return options
+
+def pool_status(engine) -> Dict[str, Any]:
+    """Current usage of an engine's connection pool"""
+    pool = engine.pool
+    status = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": max(pool.overflow(), 0)
+        })
+    if isinstance(pool, _InstrumentedPool):
+        # Configured from DB_POOL_* settings (server databases only)
+        status.update({
+            "max_overflow": settings.DB_MAX_OVERFLOW,
+            "timeout_seconds": settings.DB_POOL_TIMEOUT,
+            "recycle_seconds": settings.DB_POOL_RECYCLE,
+            "saturated": pool.checkedout() >= pool.size() + settings.DB_MAX_OVERFLOW
+        })
+        status.update(pool.stats.snapshot())
+    return status
+
 # Create database engine with connection pooling and error handling
 try:
     engine = create_engine(
         settings.DATABASE_URL,
-        pool_pre_ping=True,  # Verify connections before use
-        pool_recycle=300,    # Recycle connections every 5 minutes
-        echo=False           # Set to True for SQL debugging
+        echo=False,  # Set to True for SQL debugging
+        **_pool_options(settings.DATABASE_URL, InstrumentedQueuePool)
     )
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
     logger.info("Database engine created successfully")
@@ -23,16 +115,126 @@ except Exception as e:
     logger.error(f"Failed to create database engine: {e}")
     raise
 
+def _async_database_url(url: str, override: str = None):
+    """DATABASE_URL with its async driver: asyncpg for PostgreSQL, aiosqlite for SQLite"""
+    override = settings.ASYNC_DATABASE_URL if override is None else override
+    if override:
+        return override
+    
+    async_url = make_url(url.replace("postgres://", "postgresql://", 1))
+    if async_url.get_backend_name() == "postgresql":
+        async_url = async_url.set(drivername="postgresql+asyncpg")
+        if "sslmode" in async_url.query:
+            # asyncpg spells libpq's sslmode as ssl
+            sslmode = async_url.query["sslmode"]
+            async_url = async_url.difference_update_query(["sslmode"]).update_query_dict({"ssl": sslmode})
+    elif async_url.get_backend_name() == "sqlite":
+        async_url = async_url.set(drivername="sqlite+aiosqlite")
+    return async_url
+
+# Async engine for routers that must not block the event loop on DB I/O
+try:
+    async_database_url = _async_database_url(settings.DATABASE_URL)
+    async_engine = create_async_engine(
+        async_database_url,
+        echo=False,
+        **_pool_options(async_database_url, InstrumentedAsyncQueuePool)
+    )
+    AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+    logger.info("Async database engine created successfully")
+except Exception as e:
+    logger.error(f"Failed to create async database engine: {e}")
+    raise
+
+# Optional read replica for read-only endpoints; without one, reads use the primary
+replica_engine = None
+async_replica_engine = None
+ReplicaSessionLocal = SessionLocal
+AsyncReplicaSessionLocal = AsyncSessionLocal
+if settings.DATABASE_REPLICA_URL:
+    try:
+        replica_engine = create_engine(
+            settings.DATABASE_REPLICA_URL,
+            echo=False,
+            **_pool_options(settings.DATABASE_REPLICA_URL, InstrumentedQueuePool)
+        )
+        ReplicaSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=replica_engine)
+        
+        async_replica_url = _async_database_url(settings.DATABASE_REPLICA_URL, override="")
+        async_replica_engine = create_async_engine(
+            async_replica_url,
+            echo=False,
+            **_pool_options(async_replica_url, InstrumentedAsyncQueuePool)
+        )
+        AsyncReplicaSessionLocal = async_sessionmaker(
+            async_replica_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+        )
+        logger.info("Read replica engines created successfully")
+    except Exception as e:
+        logger.error(f"Failed to create read replica engines: {e}")
+        raise
+
+# Cookie set after a client's own write; while it is valid their reads stay on the primary
+READ_PRIMARY_COOKIE = "db_read_primary_until"
+
+def pin_reads_to_primary(request: Request, response: Response):
+    """Send this client's reads to the primary for DB_REPLICA_PIN_SECONDS (read-your-writes)"""
+    if not settings.DATABASE_REPLICA_URL or settings.DB_REPLICA_PIN_SECONDS <= 0:
+        return
+    secure = request.url.scheme == "https"
+    response.set_cookie(
+        READ_PRIMARY_COOKIE,
+        f"{time.time() + settings.DB_REPLICA_PIN_SECONDS:.3f}",
+        max_age=math.ceil(settings.DB_REPLICA_PIN_SECONDS),
+        httponly=True,
+        secure=secure,
+        samesite="none" if secure else "lax"  # the frontend is usually on another site
+    )
+
+def reads_pinned_to_primary(request: Request) -> bool:
+    try:
+        return float(request.cookies.get(READ_PRIMARY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+# Callbacks run once a session's outer transaction commits (in-memory state that
+# must never reflect rolled-back changes); AsyncSession callers pass db.sync_session
+AFTER_COMMIT_KEY = "after_commit_callbacks"
+
+def call_after_commit(db: Session, callback: Callable[[], Any]):
+    """Run `callback` after `db` commits; it is dropped if the transaction rolls back"""
+    db.info.setdefault(AFTER_COMMIT_KEY, []).append(callback)
+
+@event.listens_for(Session, "after_commit")
+def _run_after_commit(session: Session):
+    if session.in_nested_transaction():
+        # Savepoint release; the outer transaction can still roll back
+        return
+    for callback in session.info.pop(AFTER_COMMIT_KEY, ()):
+        try:
+            callback()
+        except Exception as e:
+            logger.error(f"After-commit callback failed: {e}")
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_after_commit(session: Session, previous_transaction):
+    # Savepoint rollbacks keep the outer transaction and its callbacks
+    if previous_transaction.parent is None:
+        session.info.pop(AFTER_COMMIT_KEY, None)
+
 # Create base class for models
 Base = declarative_base()
 
-# Dependency to get database session
-def get_db():
-    db = SessionLocal()
+@contextmanager
+def _session_scope(session_factory):
+    db = session_factory()
     try:
-        # Test database connection
-        db.execute(text("SELECT 1"))
+        # No per-request SELECT 1: pool_pre_ping already validates checked-out connections
         yield db
+    except (HTTPException, RequestValidationError):
+        # Raised by the endpoint itself (404, 409, ...) or by request validation: keep its status code
+        db.rollback()
+        raise
     except OperationalError as e:
         logger.error(f"Database connection error: {e}")
         db.rollback()
@@ -48,10 +250,57 @@ def get_db():
     finally:
         db.close()
 
+@asynccontextmanager
+async def _async_session_scope(session_factory):
+    async with session_factory() as db:
+        try:
+            yield db
+        except (HTTPException, RequestValidationError):
+            await db.rollback()
+            raise
+        except OperationalError as e:
+            logger.error(f"Database connection error: {e}")
+            await db.rollback()
+            raise HTTPException(status_code=503, detail="Database connection failed")
+        except SQLAlchemyError as e:
+            logger.error(f"Database error: {e}")
+            await db.rollback()
+            raise HTTPException(status_code=500, detail="Database operation failed")
+        except Exception as e:
+            logger.error(f"Unexpected database error: {e}")
+            await db.rollback()
+            raise HTTPException(status_code=500, detail="Internal server error")
+
+# Dependency to get database session
+def get_db():
+    with _session_scope(SessionLocal) as db:
+        yield db
+
+def get_read_db(request: Request):
+    """Session for read-only endpoints: the replica, or the primary right after the client's own write"""
+    session_factory = SessionLocal if reads_pinned_to_primary(request) else ReplicaSessionLocal
+    with _session_scope(session_factory) as db:
+        yield db
+
+async def get_async_db():
+    """Async counterpart of get_db
+    
+    Sync service code (CreditsService, LeaderboardService, ...) runs on the
+    same connection through `await db.run_sync(...)`.
+    """
+    async with _async_session_scope(AsyncSessionLocal) as db:
+        yield db
+
+async def get_async_read_db(request: Request):
+    """Async counterpart of get_read_db"""
+    session_factory = AsyncSessionLocal if reads_pinned_to_primary(request) else AsyncReplicaSessionLocal
+    async with _async_session_scope(session_factory) as db:
+        yield db
+
 async def init_db():
     """Initialize database tables"""
     # Import all models here to ensure they are registered
-    from app.models import user, quest, participant, input, pool, reward, leaderboard, bonus, message, wallet, admin, daily_ai_message, credits, global_leaderboard, ads, notification, spin_wheel
+    from app.models import user, quest, participant, input, pool, reward, leaderboard, bonus, message, wallet, admin, daily_ai_message, credits, global_leaderboard, ads, notification, spin_wheel, score_cache, llm_call_log, conversation_summary, idempotency_key
     
     # Create all tables
     Base.metadata.create_all(bind=engine)
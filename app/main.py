@@ -1,15 +1,20 @@
-from fastapi import FastAPI, HTTPException, Depends, UploadFile, File
+from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
 from sqlalchemy.orm import Session
 from sqlalchemy import text
+import asyncio
 import os
 from dotenv import load_dotenv
 
-from app.database import init_db, get_db
+from app.database import init_db, get_db, async_engine, engine, pool_status, replica_engine, async_replica_engine, pin_reads_to_primary
 from app.routers import quests, users, leaderboard, treasury, analytics, messaging, participation, bonus, wallet, auth, daily_ai_messages, payments, credits, leaderboard_realtime, global_leaderboard, ads, cron_jobs, notifications, spin_wheel
 from app.core.config import settings
+from app.services.ai_clients import init_ai_clients
+from app.services.batch_scorer import get_batch_scorer
+from app.services.leaderboard_engine import leaderboard_engine
+from app.services.llm_usage import llm_usage
 
 from create_admin import create_admin_user
 # Load environment variables
@@ -19,14 +24,44 @@ load_dotenv()
 async def lifespan(app: FastAPI):
     # Startup
     await init_db()
+    
+    # Shared AI backend and model clients for all requests
+    app.state.ai_clients = init_ai_clients()
+    if settings.AI_WARMUP_ON_STARTUP:
+        await app.state.ai_clients.warmup()
 
     try: 
         create_admin_user()
     except: 
         print(f"Failed to auto-create admin user")
+    
+    snapshot_task = None
+    if settings.LEADERBOARD_ENGINE_ENABLED:
+        snapshot_task = asyncio.create_task(leaderboard_engine.run_snapshots())
+    
+    # Pick up pending scores an earlier process lost
+    recovery_task = None
+    if settings.AI_ASYNC_SCORING:
+        if settings.AI_SCORING_RECOVERY_INTERVAL_SECONDS > 0:
+            recovery_task = asyncio.create_task(
+                get_batch_scorer().run_recovery(settings.AI_SCORING_RECOVERY_INTERVAL_SECONDS)
+            )
+        else:
+            await get_batch_scorer().recover_pending()
     yield
-    # Shutdown
-    pass
+    if recovery_task is not None:
+        recovery_task.cancel()
+    # Shutdown: score messages still waiting in the batch queue
+    await get_batch_scorer().flush()
+    # Write LLM call records still short of a full batch
+    await asyncio.to_thread(llm_usage.flush)
+    if snapshot_task is not None:
+        snapshot_task.cancel()
+        # Write ranks changed since the last snapshot
+        await asyncio.to_thread(leaderboard_engine.snapshot)
+    await async_engine.dispose()
+    if async_replica_engine is not None:
+        await async_replica_engine.dispose()
 
 app = FastAPI(
     title="Sapien AI-Quest API",
@@ -44,6 +79,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def read_your_writes(request: Request, call_next):
+    """After a successful write, keep this client's reads off the replica for a few seconds"""
+    response = await call_next(request)
+    if request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+        pin_reads_to_primary(request, response)
+    return response
+
 # Include routers
 app.include_router(quests.router, prefix="/api/quests", tags=["quests"])
 app.include_router(users.router, prefix="/api/users", tags=["users"])
@@ -97,6 +140,36 @@ async def health_check(db: Session = Depends(get_db)):
             }
         )
 
+@app.get("/health/db")
+async def database_health_check():
+    """Database connectivity and connection pool usage
+    
+    `saturated` means every pooled and overflow connection is checked out;
+    further requests wait up to DB_POOL_TIMEOUT and then fail with 503.
+    """
+    pools = {
+        "sync": pool_status(engine),
+        "async": pool_status(async_engine.sync_engine)
+    }
+    if replica_engine is not None:
+        pools["replica_sync"] = pool_status(replica_engine)
+        pools["replica_async"] = pool_status(async_replica_engine.sync_engine)
+    try:
+        async with async_engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+    except Exception as e:
+        return JSONResponse(
+            status_code=503,
+            content={"status": "unhealthy", "database": "disconnected", "error": str(e), "pools": pools}
+        )
+    
+    saturated = any(pool.get("saturated") for pool in pools.values())
+    return {
+        "status": "degraded" if saturated else "healthy",
+        "database": "connected",
+        "pools": pools
+    }
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,2 +1,2 @@
 # Database models
-from . import user, quest, participant, input, pool, reward, leaderboard, bonus, message, wallet, admin, daily_ai_message, credits, global_leaderboard, ads
+from . import user, quest, participant, input, pool, reward, leaderboard, bonus, message, wallet, admin, daily_ai_message, credits, global_leaderboard, ads, score_cache, llm_call_log, conversation_summary, idempotency_key
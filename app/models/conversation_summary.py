@@ -0,0 +1,33 @@
+from sqlalchemy import Column, String, Text, Integer, DateTime, ForeignKey, Index, UniqueConstraint
+from app.database import Base
+from datetime import datetime
+import uuid
+
+class ConversationSummary(Base):
+    """Rolling conversation memory for one participant in one quest"""
+    __tablename__ = "conversation_summaries"
+    __table_args__ = (UniqueConstraint("quest_id", "user_id", name="uq_conversation_summary_participant"),)
+    
+    summary_id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    quest_id = Column(String, ForeignKey("quests.quest_id"), nullable=False)
+    user_id = Column(String, ForeignKey("users.user_id"), nullable=False)
+    summary = Column(Text, default="")  # Condensed earlier conversation
+    turns_since_refresh = Column(Integer, default=0)  # Exchanges added since the last summary refresh
+    total_turns = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class ConversationTurn(Base):
+    """One unsummarized turn of a participant's memory (append-only until folded into the summary)"""
+    __tablename__ = "conversation_turns"
+    __table_args__ = (
+        # A participant's turns in conversation order
+        Index("ix_conversation_turns_quest_user_created", "quest_id", "user_id", "created_at"),
+    )
+    
+    turn_id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    quest_id = Column(String, ForeignKey("quests.quest_id"), nullable=False)
+    user_id = Column(String, ForeignKey("users.user_id"), nullable=False)
+    message_id = Column(String, ForeignKey("chat_messages.message_id"))
+    role = Column(String, nullable=False)  # user or assistant
+    content = Column(Text, nullable=False)
+    created_at = Column(DateTime, nullable=False)  # the chat message's timestamp
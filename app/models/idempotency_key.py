@@ -0,0 +1,14 @@
+from sqlalchemy import Column, String, DateTime, JSON
+from datetime import datetime
+from app.database import Base
+
+class IdempotencyKey(Base):
+    """Stored response (or in-progress claim) for one Idempotency-Key"""
+    __tablename__ = "idempotency_keys"
+    
+    key = Column(String(64), primary_key=True)  # sha256 of endpoint + user id + client key
+    fingerprint = Column(String(64), nullable=False)  # sha256 of the request body
+    status = Column(String(16), nullable=False)  # in_progress, completed
+    response = Column(JSON)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)  # claim lease while in progress, TTL once completed
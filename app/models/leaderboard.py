@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, DateTime, ForeignKey
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Index
 from sqlalchemy.sql import func
 from app.database import Base
 import uuid
@@ -10,5 +10,18 @@ class Leaderboard(Base):
     quest_id = Column(String, ForeignKey("quests.quest_id"))  # null for global
     user_id = Column(String, ForeignKey("users.user_id"), nullable=False)
     score = Column(Integer, default=0)
-    rank = Column(Integer)
+    rank = Column(Integer)  # legacy, no longer written: rank is the position in RANK_ORDER, computed on read
+    last_reply_at = Column(DateTime)  # tie-breaker: the earlier reply ranks higher
+    total_messages = Column(Integer, default=0, nullable=False)
     updated_at = Column(DateTime, default=func.now())
+
+# Rank order of a quest (score high to low, then last_reply_at, then user_id):
+# serves top-N reads and the count of entries ahead of a player (their rank)
+Index(
+    "ix_leaderboards_quest_score_reply",
+    Leaderboard.quest_id,
+    Leaderboard.score.desc(),
+    Leaderboard.last_reply_at,
+    Leaderboard.user_id
+)
+Index("ix_leaderboards_quest_user", Leaderboard.quest_id, Leaderboard.user_id, unique=True)
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime
+from datetime import datetime
+from app.database import Base
+
+class LLMCallLog(Base):
+    """One LLM call with its token counts and latency"""
+    __tablename__ = "llm_call_log"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    caller = Column(String(32), nullable=False)  # chat, scoring, opening, engagement
+    quest_id = Column(String, index=True)
+    model = Column(String(100))
+    success = Column(Boolean, nullable=False)
+    latency_ms = Column(Float, nullable=False)
+    prompt_chars = Column(Integer)
+    prompt_tokens = Column(Integer)
+    response_tokens = Column(Integer)
+    error = Column(String(255))
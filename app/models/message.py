@@ -1,10 +1,24 @@
-from sqlalchemy import Column, String, Text, Integer, DateTime, ForeignKey
+from sqlalchemy import Column, String, Text, Integer, DateTime, ForeignKey, Index, text
 from sqlalchemy.sql import func
 from app.database import Base
 import uuid
 
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
+    __table_args__ = (
+        # Per-participant history, newest first (also serves the opening message lookup, user_id IS NULL).
+        # message_id breaks created_at ties for keyset pagination.
+        Index("ix_chat_messages_quest_user_created_id", "quest_id", "user_id", "created_at", "message_id"),
+        # Quest-wide history in time order
+        Index("ix_chat_messages_quest_created_id", "quest_id", "created_at", "message_id"),
+        # Messages waiting for the batch scorer (small: rows leave it once scored)
+        Index(
+            "ix_chat_messages_score_pending",
+            "created_at",
+            postgresql_where=text("score IS NULL AND user_id IS NOT NULL"),
+            sqlite_where=text("score IS NULL AND user_id IS NOT NULL")
+        ),
+    )
     
     message_id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     quest_id = Column(String, ForeignKey("quests.quest_id"), nullable=False)
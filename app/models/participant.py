@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, DateTime, JSON, ForeignKey
+from sqlalchemy import Column, String, Integer, DateTime, JSON, ForeignKey, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.database import Base
@@ -11,7 +11,7 @@ class QuestParticipant(Base):
     quest_id = Column(String, ForeignKey("quests.quest_id"), nullable=False)
     user_id = Column(String, ForeignKey("users.user_id"), nullable=False)
     score = Column(Integer, default=0)
-    reply_log = Column(JSON, default=list)  # History of replies with scores
+    message_count = Column(Integer, default=0, nullable=False)  # Scored replies, one per ParticipantReply row
     joined_at = Column(DateTime, default=func.now())
     last_reply_at = Column(DateTime)
     last_hint_sent = Column(DateTime)
@@ -19,3 +19,18 @@ class QuestParticipant(Base):
     # Relationships
     quest = relationship("Quest", back_populates="participants")
     user = relationship("User", back_populates="participants")
+
+class ParticipantReply(Base):
+    """Append-only history of a participant's scored replies"""
+    __tablename__ = "participant_replies"
+    __table_args__ = (
+        Index("ix_participant_replies_quest_user_created", "quest_id", "user_id", "created_at"),
+    )
+    
+    reply_id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    quest_id = Column(String, ForeignKey("quests.quest_id"), nullable=False)
+    user_id = Column(String, ForeignKey("users.user_id"), nullable=False)
+    message_id = Column(String, ForeignKey("chat_messages.message_id"), nullable=False, unique=True)
+    score = Column(Integer, nullable=False)
+    score_breakdown = Column(JSON, default=dict)
+    created_at = Column(DateTime, default=func.now())
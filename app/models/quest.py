@@ -18,6 +18,7 @@ class Quest(Base):
     description = Column(Text)
     context = Column(Text)
     details = Column(JSON)  # stores properties, instructions, additional_text
+    prompt_version = Column(Integer, default=1, nullable=False)  # Bumped on every edit; keys the compiled prompt cache
     profile_image_url = Column(Text)
     media_url = Column(Text)
     distribution_rules = Column(JSON)  # distribution rules JSON
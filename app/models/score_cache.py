@@ -0,0 +1,12 @@
+from sqlalchemy import Column, String, DateTime, JSON
+from datetime import datetime
+from app.database import Base
+
+class ScoreCacheEntry(Base):
+    """Persisted score for a normalized message within one quest context"""
+    __tablename__ = "score_cache"
+    
+    cache_key = Column(String(64), primary_key=True)  # sha256 of message + quest context + criteria
+    score_data = Column(JSON, nullable=False)  # score, score_breakdown, feedback
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
@@ -4,20 +4,28 @@ from sqlalchemy import func, desc
 from datetime import datetime, timedelta
 from typing import Dict, Any
 
-from app.database import get_db
+from app.database import get_read_db
 from app.models.quest import Quest
 from app.models.participant import QuestParticipant
 from app.models.user import User
 from app.models.pool import QuestPool
 from app.models.admin import AdminUser
 from app.routers.auth import get_current_admin
+from app.services.ai_clients import get_ai_clients
+from app.services.batch_scorer import get_batch_scorer
+from app.services.circuit_breaker import circuit_breaker
+from app.services.leaderboard_cache import leaderboard_cache
+from app.services.leaderboard_engine import leaderboard_engine
+from app.services.llm_scheduler import get_llm_scheduler
+from app.services.llm_usage import llm_usage
+from app.services.score_cache import score_cache
 
 router = APIRouter()
 
 @router.get("/", response_model=Dict[str, Any])
 async def get_platform_analytics(
     current_admin: AdminUser = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get platform analytics (admin-only)"""
     
@@ -93,3 +101,61 @@ async def get_platform_analytics(
             for title, avg_score, participant_count in quest_scores
         ]
     }
+
+@router.get("/ai/score-cache", response_model=Dict[str, Any])
+async def get_score_cache_stats(
+    current_admin: AdminUser = Depends(get_current_admin)
+):
+    """Get score memoization cache hit/miss counters (admin-only)"""
+    return score_cache.stats()
+
+@router.get("/ai/scheduler", response_model=Dict[str, Any])
+async def get_llm_scheduler_stats(
+    current_admin: AdminUser = Depends(get_current_admin)
+):
+    """Get LLM scheduler queue depth and wait-time metrics (admin-only)"""
+    return get_llm_scheduler().stats()
+
+@router.get("/ai/circuit-breaker", response_model=Dict[str, Any])
+async def get_circuit_breaker_stats(
+    current_admin: AdminUser = Depends(get_current_admin)
+):
+    """Get LLM circuit breaker state and recent latency (admin-only)"""
+    return circuit_breaker.stats()
+
+@router.get("/ai/batch-scorer", response_model=Dict[str, Any])
+async def get_batch_scorer_stats(
+    current_admin: AdminUser = Depends(get_current_admin)
+):
+    """Get background batch scoring queue and throughput metrics (admin-only)"""
+    return get_batch_scorer().stats()
+
+@router.get("/ai/clients", response_model=Dict[str, Any])
+async def get_ai_client_stats(
+    current_admin: AdminUser = Depends(get_current_admin)
+):
+    """Get shared AI client registry state (admin-only)"""
+    return get_ai_clients().stats()
+
+@router.get("/ai/usage", response_model=Dict[str, Any])
+async def get_llm_usage_summary(
+    window_minutes: int = 60,
+    top_quests: int = 10,
+    current_admin: AdminUser = Depends(get_current_admin)
+):
+    """Get LLM token and latency usage by caller, model and quest (admin-only)"""
+    return llm_usage.summary(window_minutes=window_minutes, top_quests=top_quests)
+
+@router.get("/leaderboard-engine", response_model=Dict[str, Any])
+async def get_leaderboard_engine_stats(
+    current_admin: AdminUser = Depends(get_current_admin)
+):
+    """Get in-memory leaderboard sizes, memory use and snapshot counters (admin-only)"""
+    return leaderboard_engine.stats()
+
+@router.get("/leaderboard-cache", response_model=Dict[str, Any])
+async def get_leaderboard_cache_stats(
+    current_admin: AdminUser = Depends(get_current_admin)
+):
+    """Get leaderboard response cache hit, miss and 304 counters (admin-only)"""
+    return leaderboard_cache.stats()
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
 from app.services.credits_service import CreditsService
 from app.schemas.credits import CreditStatus, CreditPurchase, CreditResponse
 from typing import Dict, Any
@@ -13,12 +13,11 @@ router = APIRouter()
 async def get_credit_status(
     quest_id: str,
     user_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get user's credit status for a quest"""
     try:
-        credits_service = CreditsService(db)
-        status = credits_service.can_send_message(user_id, quest_id)
+        status = await db.run_sync(lambda session: CreditsService(session).can_send_message(user_id, quest_id))
         
         return CreditStatus(
             quest_id=quest_id,
@@ -38,21 +37,19 @@ async def purchase_credits(
     quest_id: str,
     user_id: str,
     purchase_data: CreditPurchase,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Purchase additional credits for a quest"""
     try:
-        credits_service = CreditsService(db)
-        
         # In a real implementation, this would integrate with payment system
         # For now, we'll just add the credits
-        result = credits_service.add_credits(
+        result = await db.run_sync(lambda session: CreditsService(session).add_credits(
             user_id=user_id,
             quest_id=quest_id,
             amount=purchase_data.amount,
             source="purchase",
             description=f"Purchased {purchase_data.amount} credits"
-        )
+        ))
         
         if result["success"]:
             return CreditResponse(
@@ -72,20 +69,18 @@ async def purchase_credits(
 async def claim_ad_reward(
     quest_id: str,
     user_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Claim credits from watching an ad"""
     try:
-        credits_service = CreditsService(db)
-        
         # Give 1 credit for watching an ad
-        result = credits_service.add_credits(
+        result = await db.run_sync(lambda session: CreditsService(session).add_credits(
             user_id=user_id,
             quest_id=quest_id,
             amount=1,
             source="ad_reward",
             description="Credits earned from watching ad"
-        )
+        ))
         
         if result["success"]:
             return CreditResponse(
@@ -104,12 +99,11 @@ async def claim_ad_reward(
 @router.get("/{quest_id}/stats")
 async def get_quest_credit_stats(
     quest_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get credit statistics for a quest (admin function)"""
     try:
-        credits_service = CreditsService(db)
-        stats = credits_service.get_quest_credit_stats(quest_id)
+        stats = await db.run_sync(lambda session: CreditsService(session).get_quest_credit_stats(quest_id))
         return stats
     except Exception as e:
         logger.error(f"Failed to get quest credit stats: {str(e)}")
@@ -119,15 +113,14 @@ async def get_quest_credit_stats(
 async def set_quest_credit_limit(
     quest_id: str,
     daily_credits: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Set daily credit limit for a quest (admin function)"""
     try:
         if daily_credits < 0:
             raise HTTPException(status_code=400, detail="Daily credits must be positive")
         
-        credits_service = CreditsService(db)
-        success = credits_service.set_quest_credit_limit(quest_id, daily_credits)
+        success = await db.run_sync(lambda session: CreditsService(session).set_quest_credit_limit(quest_id, daily_credits))
         
         if success:
             return {
@@ -263,8 +263,7 @@ Generate a mysterious, intriguing message to draw this user back. The message sh
 Write as a mysterious being would speak:"""
     
     try:
-        response = ai_service.model.generate_content(prompt)
-        return response.text
+        return await ai_service.generate_text(prompt)
     except Exception as e:
         logger.error(f"Failed to generate general engagement message: {e}")
         return "I sense your absence in the realm of philosophical mysteries. New enigmas have emerged that await your unique perspective. Will you return to unravel them?"
@@ -362,8 +361,7 @@ Generate a mysterious, teasing message to draw this user back to your quest. The
 Write as {character_name} would speak - be mysterious, intriguing, and personal:"""
     
     try:
-        response = ai_service.model.generate_content(prompt)
-        return response.text
+        return await ai_service.generate_text(prompt, quest_id=quest.quest_id)
     except Exception as e:
         logger.error(f"Failed to generate quest engagement message: {e}")
         return f"I sense your absence, {user.username or 'seeker'}. {character_name} here - the enigmas we began to unravel have deepened in your absence. What new insights await your return to our philosophical discourse?"
@@ -152,8 +152,7 @@ Generate a mysterious, teasing message to draw this user back to your quest. The
 
 Write as {character_name} would speak - be mysterious, intriguing, and personal:"""
             
-            response = ai_service.model.generate_content(prompt)
-            content = response.text
+            content = await ai_service.generate_text(prompt, quest_id=quest.quest_id)
             
         else:
             # General engagement message
@@ -173,8 +172,7 @@ Generate a mysterious, intriguing message to draw this user back. The message sh
 
 Write as a mysterious being would speak:"""
             
-            response = ai_service.model.generate_content(prompt)
-            content = response.text
+            content = await ai_service.generate_text(prompt)
         
         # Create daily AI message
         daily_message = DailyAIMessage(
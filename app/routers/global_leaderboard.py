@@ -1,7 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.services.global_leaderboard_service import GlobalLeaderboardService
+from app.services.leaderboard_cache import leaderboard_cache, GLOBAL_SCOPE
 from app.schemas.global_leaderboard import GlobalLeaderboardResponse, DailyBonusConfig, DailyBonusResponse
 from typing import List, Dict, Any
 import logging
@@ -11,11 +12,12 @@ router = APIRouter()
 
 @router.get("/", response_model=GlobalLeaderboardResponse)
 async def get_global_leaderboard(
+    request: Request,
     limit: int = 10,
     db: Session = Depends(get_db)
 ):
-    """Get global leaderboard across all quests"""
-    try:
+    """Get global leaderboard across all quests (ETag / If-None-Match aware)"""
+    async def build():
         service = GlobalLeaderboardService(db)
         leaderboard = service.get_global_leaderboard(limit)
         
@@ -24,17 +26,26 @@ async def get_global_leaderboard(
             leaderboard=leaderboard,
             total_users=len(leaderboard)
         )
+    
+    try:
+        return await leaderboard_cache.respond(request, GLOBAL_SCOPE, ("top", limit), build)
         
     except Exception as e:
         logger.error(f"Failed to get global leaderboard: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to get global leaderboard: {str(e)}")
 
 @router.post("/update")
-async def update_global_leaderboard(db: Session = Depends(get_db)):
-    """Update global leaderboard (admin function)"""
+async def update_global_leaderboard(
+    rebuild: bool = False,
+    db: Session = Depends(get_db)
+):
+    """Refresh global ranks, or with rebuild=true recompute all totals (admin function)"""
     try:
         service = GlobalLeaderboardService(db)
-        result = service.update_global_leaderboard()
+        if rebuild:
+            result = service.rebuild_global_leaderboard()
+        else:
+            result = service.update_global_leaderboard()
         
         if result["success"]:
             return result
@@ -3,10 +3,11 @@ from sqlalchemy.orm import Session
 from sqlalchemy import desc
 from typing import List, Optional
 
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.models.leaderboard import Leaderboard
 from app.models.user import User
 from app.schemas.leaderboard import LeaderboardEntry
+from app.services.leaderboard_service import LeaderboardService, RANK_ORDER
 
 router = APIRouter()
 
@@ -14,31 +15,30 @@ router = APIRouter()
 async def get_quest_leaderboard(
     quest_id: str,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get quest leaderboard by quest ID"""
-    leaderboard = db.query(Leaderboard).filter(
+    leaderboard = db.query(Leaderboard, User.username).join(
+        User, User.user_id == Leaderboard.user_id
+    ).filter(
         Leaderboard.quest_id == quest_id
-    ).order_by(desc(Leaderboard.score)).limit(limit).all()
+    ).order_by(*RANK_ORDER).limit(limit).all()
     
-    # Get user details for each entry
     entries = []
-    for entry in leaderboard:
-        user = db.query(User).filter(User.user_id == entry.user_id).first()
-        if user:
-            entries.append(LeaderboardEntry(
-                user_id=entry.user_id,
-                username=user.username,
-                score=entry.score,
-                rank=entry.rank
-            ))
+    for rank, (entry, username) in enumerate(leaderboard, 1):
+        entries.append(LeaderboardEntry(
+            user_id=entry.user_id,
+            username=username,
+            score=entry.score,
+            rank=rank
+        ))
     
     return entries
 
 @router.get("/global", response_model=List[LeaderboardEntry])
 async def get_global_leaderboard(
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get global leaderboard (all quests combined)"""
     # Get users with their total scores
@@ -61,35 +61,11 @@ async def update_quest_leaderboard(
     db: Session = Depends(get_db)
 ):
     """Update quest leaderboard (admin-only)"""
-    # This would typically be called after quest ends
-    # Calculate ranks based on quest participants
-    from app.models.participant import QuestParticipant
-    
-    participants = db.query(QuestParticipant).filter(
-        QuestParticipant.quest_id == quest_id
-    ).order_by(desc(QuestParticipant.score)).all()
-    
-    # Update leaderboard entries
-    for rank, participant in enumerate(participants, 1):
-        # Check if entry exists
-        existing_entry = db.query(Leaderboard).filter(
-            Leaderboard.quest_id == quest_id,
-            Leaderboard.user_id == participant.user_id
-        ).first()
-        
-        if existing_entry:
-            existing_entry.score = participant.score
-            existing_entry.rank = rank
-        else:
-            new_entry = Leaderboard(
-                quest_id=quest_id,
-                user_id=participant.user_id,
-                score=participant.score,
-                rank=rank
-            )
-            db.add(new_entry)
-    
-    db.commit()
+    # Entries are updated on every scored message; this rebuilds them from
+    # the participants, e.g. after a manual score fix
+    participants = LeaderboardService(db).rebuild_leaderboard(quest_id)
+    if participants is None:
+        raise HTTPException(status_code=500, detail="Failed to update quest leaderboard")
     
     return {"message": "Quest leaderboard updated successfully"}
 
@@ -1,6 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db, get_async_read_db
+from app.services.leaderboard_cache import leaderboard_cache, quest_scope
 from app.services.leaderboard_service import LeaderboardService
 from typing import List, Dict, Any
 import logging
@@ -10,27 +11,34 @@ router = APIRouter()
 
 @router.get("/{quest_id}/live")
 async def get_live_leaderboard(
+    request: Request,
     quest_id: str,
     limit: int = 10,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
-    """Get real-time leaderboard for a quest"""
-    try:
-        leaderboard_service = LeaderboardService(db)
-        
+    """Get real-time leaderboard for a quest (ETag / If-None-Match aware)"""
+    async def build():
         # Get current leaderboard
-        leaderboard = leaderboard_service.get_leaderboard(quest_id, limit)
+        leaderboard = await db.run_sync(lambda session: LeaderboardService(session).get_leaderboard(quest_id, limit))
         
         # Get quest status
-        quest_status = leaderboard_service.get_quest_status(quest_id)
+        quest_status = await db.run_sync(lambda session: LeaderboardService(session).get_quest_status(quest_id))
         
         return {
             "success": True,
             "quest_id": quest_id,
             "leaderboard": leaderboard,
             "quest_status": quest_status,
-            "timestamp": datetime.now().isoformat()
+            # Latest reply shown, taken from the data: a build-time clock would give
+            # every rebuild (each TTL, each worker) a new ETag for the same standings
+            "timestamp": max(
+                (entry["last_reply_at"] for entry in leaderboard if entry["last_reply_at"]),
+                default=None
+            )
         }
+    
+    try:
+        return await leaderboard_cache.respond(request, quest_scope(quest_id), ("live", limit), build)
         
     except Exception as e:
         logger.error(f"Failed to get live leaderboard: {str(e)}")
@@ -39,12 +47,11 @@ async def get_live_leaderboard(
 @router.post("/{quest_id}/update")
 async def update_leaderboard(
     quest_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Manually update leaderboard for a quest"""
     try:
-        leaderboard_service = LeaderboardService(db)
-        result = leaderboard_service.update_leaderboard(quest_id)
+        result = await db.run_sync(lambda session: LeaderboardService(session).update_leaderboard(quest_id))
         
         return result
         
@@ -55,12 +62,11 @@ async def update_leaderboard(
 @router.get("/{quest_id}/status")
 async def get_quest_status(
     quest_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """Get quest status and leaderboard info"""
     try:
-        leaderboard_service = LeaderboardService(db)
-        result = leaderboard_service.get_quest_status(quest_id)
+        result = await db.run_sync(lambda session: LeaderboardService(session).get_quest_status(quest_id))
         
         return result
         
@@ -70,14 +76,14 @@ async def get_quest_status(
 
 @router.get("/{quest_id}/top/{limit}")
 async def get_top_participants(
+    request: Request,
     quest_id: str,
     limit: int = 5,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
-    """Get top N participants for a quest"""
-    try:
-        leaderboard_service = LeaderboardService(db)
-        leaderboard = leaderboard_service.get_leaderboard(quest_id, limit)
+    """Get top N participants for a quest (ETag / If-None-Match aware)"""
+    async def build():
+        leaderboard = await db.run_sync(lambda session: LeaderboardService(session).get_leaderboard(quest_id, limit))
         
         return {
             "success": True,
@@ -85,10 +91,40 @@ async def get_top_participants(
             "top_participants": leaderboard,
             "count": len(leaderboard)
         }
+    
+    try:
+        return await leaderboard_cache.respond(request, quest_scope(quest_id), ("top", limit), build)
         
     except Exception as e:
         logger.error(f"Failed to get top participants: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to get top participants: {str(e)}")
 
-# Add datetime import
-from datetime import datetime
+@router.get("/{quest_id}/around/{user_id}")
+async def get_leaderboard_around_user(
+    quest_id: str,
+    user_id: str,
+    window: int = Query(5, ge=1, le=50),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """Get a player's rank with the `window` players above and below them"""
+    try:
+        around = await db.run_sync(
+            lambda session: LeaderboardService(session).get_leaderboard_around(quest_id, user_id, window)
+        )
+        if around is None:
+            raise HTTPException(status_code=404, detail="Player has no rank in this quest yet")
+        
+        return {
+            "success": True,
+            "quest_id": quest_id,
+            "user_id": user_id,
+            "rank": around["rank"],
+            "window": window,
+            "leaderboard": around["leaderboard"]
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to get leaderboard around user: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to get leaderboard around user: {str(e)}")
@@ -1,27 +1,41 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
-from datetime import datetime
+from typing import Any, Dict, Optional
+from datetime import datetime, timedelta
+import asyncio
+import base64
+import json
+import logging
+import uuid
 
-from app.database import get_db
+from app.core.config import settings
+from app.database import get_async_db, get_async_read_db, AsyncSessionLocal
 from app.models.message import ChatMessage
 from app.models.quest import Quest
-from app.models.participant import QuestParticipant
+from app.models.participant import QuestParticipant, ParticipantReply
 from app.models.user import User
-from app.schemas.message import MessageCreate, MessageResponse, AIResponse
+from app.schemas.message import MessageCreate, MessageResponse, MessagePage, AIResponse
 from app.services.ai_service import AIService
+from app.services.batch_scorer import DEFAULT_SCORING_CRITERIA, get_batch_scorer
+from app.services.conversation_memory import conversation_memory
 from app.services.credits_service import CreditsService
+from app.services.idempotency import idempotency_store
+from app.services.global_leaderboard_service import GlobalLeaderboardService
 from app.services.leaderboard_service import LeaderboardService
 
+logger = logging.getLogger(__name__)
 router = APIRouter()
 
-@router.post("/{quest_id}/messages", response_model=AIResponse)
-async def send_message(
-    quest_id: str,
-    message: MessageCreate,
-    db: Session = Depends(get_db)
-):
-    """Send message in quest (chat with AI)"""
+def _prepare_message(db: Session, quest_id: str, message: MessageCreate) -> Dict[str, Any]:
+    """Validate a chat send and load everything the LLM call needs
+    
+    Only reads here: nothing is written until the reply is back, and the read
+    transaction is ended before returning so no pooled connection is held
+    while waiting on the LLM. Runs through AsyncSession.run_sync.
+    """
     # Input validation
     if not message.user_message or len(message.user_message.strip()) == 0:
         raise HTTPException(status_code=400, detail="Message content cannot be empty")
@@ -32,9 +46,8 @@ async def send_message(
     if not message.user_id or len(message.user_id.strip()) == 0:
         raise HTTPException(status_code=400, detail="User ID is required")
     
-    # Check if user has credits
-    credits_service = CreditsService(db)
-    credit_status = credits_service.can_send_message(message.user_id, quest_id)
+    # Check if user has credits (the credit itself is spent with the reply)
+    credit_status = CreditsService(db).get_available_credits(message.user_id, quest_id)
     
     if not credit_status["can_send"]:
         raise HTTPException(
@@ -56,44 +69,257 @@ async def send_message(
     if not participant:
         raise HTTPException(status_code=400, detail="User is not participating in this quest")
     
-    # Save user message
-    user_message = ChatMessage(
-        quest_id=quest_id,
-        user_id=message.user_id,
-        content=message.user_message
+    # This participant's rolling summary and last few turns (not other users' messages)
+    summary, history = conversation_memory.load_history(db, quest_id, message.user_id)
+    
+    quest_details = quest.details or {}
+    chat = {
+        "quest_details": quest_details,
+        "quest_title": quest.title or "",
+        "quest_description": quest.description or "",
+        "quest_context": quest.context or "",
+        "quest_version": quest.prompt_version,
+        "scoring_criteria": quest_details.get("instructions", {}).get(
+            "scoring_criteria", DEFAULT_SCORING_CRITERIA
+        ),
+        "history": history,
+        "summary": summary
+    }
+    
+    # End the read-only transaction before the LLM call
+    db.rollback()
+    
+    return chat
+
+def _record_message(
+    db: Session,
+    quest_id: str,
+    message: MessageCreate,
+    character_response: str,
+    score_result: dict = None
+) -> AIResponse:
+    """Save the exchange, spend the credit and apply the score in one transaction
+    
+    Runs through AsyncSession.run_sync. Without a score_result the user message is saved as score-pending and
+    queued for the batch scorer.
+    """
+    try:
+        participant = db.query(QuestParticipant).filter(
+            QuestParticipant.quest_id == quest_id,
+            QuestParticipant.user_id == message.user_id
+        ).first()
+        
+        if not participant:
+            raise HTTPException(status_code=400, detail="User is not participating in this quest")
+        
+        # Timestamps are set here so nothing has to be re-read after the commit. Both are
+        # taken at write time, not when the request arrived: history polls page on
+        # created_at and only trust it once it is CHAT_POLL_SETTLE_SECONDS old. Message
+        # times are UTC like the column default (func.now()) used by other writers
+        now = datetime.now()
+        created_at = datetime.utcnow()
+        user_message = ChatMessage(
+            message_id=str(uuid.uuid4()),
+            quest_id=quest_id,
+            user_id=message.user_id,
+            content=message.user_message,
+            score=score_result.get("score", 50) if score_result is not None else None,
+            created_at=created_at
+        )
+        ai_message = ChatMessage(
+            message_id=str(uuid.uuid4()),
+            quest_id=quest_id,
+            user_id=None,  # AI message
+            content=character_response or "I'm having trouble responding right now.",
+            score=None,
+            created_at=created_at + timedelta(microseconds=1)  # the reply sorts after the message
+        )
+        db.add_all([user_message, ai_message])
+        
+        participant.last_reply_at = now
+        
+        # Update user's last activity
+        user = db.query(User).filter(User.user_id == message.user_id).first()
+        if user:
+            user.last_activity = now
+        
+        # Spend credit for sending message
+        credit_result = CreditsService(db, autocommit=False).spend_credit(
+            user_id=message.user_id,
+            quest_id=quest_id,
+            description="Message sent to AI"
+        )
+        
+        if not credit_result["success"]:
+            # Spent by a concurrent send since _prepare_message checked; nothing is saved
+            raise HTTPException(
+                status_code=402,
+                detail="No credits available. Purchase more or watch an ad to earn credits."
+            )
+        
+        if score_result is not None:
+            # Update participant score and the user's global totals
+            participant.score += user_message.score
+            GlobalLeaderboardService(db).apply_participant_change(message.user_id, score_delta=user_message.score)
+            
+            # Append to the reply history
+            participant.message_count = (participant.message_count or 0) + 1
+            db.add(ParticipantReply(
+                quest_id=quest_id,
+                user_id=message.user_id,
+                message_id=user_message.message_id,
+                score=user_message.score,
+                score_breakdown=score_result.get("score_breakdown", {}),
+                created_at=created_at
+            ))
+        
+        refresh_summary = conversation_memory.append_turn(
+            db, quest_id, message.user_id, user_message, ai_message
+        )
+        
+        if score_result is not None:
+            # The leaderboard reads scores back from the database
+            db.flush()
+            leaderboard_result = LeaderboardService(db, autocommit=False).update_leaderboard(quest_id, [message.user_id])
+            
+            if leaderboard_result.get("quest_ended"):
+                logger.info(f"Quest {quest_id} ended due to 100% completion")
+        
+        ai_result = _build_ai_response(user_message, ai_message, participant, score_result)
+        db.commit()
+    except HTTPException:
+        db.rollback()
+        raise
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Failed to save message: {str(e)}")
+    
+    if score_result is None:
+        get_batch_scorer().submit(ai_result.user_message.message_id)
+    
+    if refresh_summary:
+        conversation_memory.schedule_refresh(quest_id, message.user_id)
+    
+    return ai_result
+
+def _to_message_response(msg: ChatMessage) -> MessageResponse:
+    return MessageResponse(
+        message_id=msg.message_id,
+        quest_id=msg.quest_id,
+        user_id=msg.user_id,
+        content=msg.content,
+        score=msg.score,
+        created_at=msg.created_at
     )
+
+def _build_ai_response(
+    user_message: ChatMessage,
+    ai_message: ChatMessage,
+    participant: QuestParticipant,
+    score_result: dict = None
+) -> AIResponse:
+    if score_result is None:
+        # Score is applied later by the batch scorer
+        return AIResponse(
+            user_message=_to_message_response(user_message),
+            ai_message=_to_message_response(ai_message),
+            score=None,
+            score_breakdown={},
+            feedback="",
+            total_score=participant.score or 0,
+            score_pending=True
+        )
     
-    db.add(user_message)
-    db.commit()
-    db.refresh(user_message)
+    return AIResponse(
+        user_message=_to_message_response(user_message),
+        ai_message=_to_message_response(ai_message),
+        score=score_result.get("score", 50),
+        score_breakdown=score_result.get("score_breakdown", {}),
+        feedback=score_result.get("feedback", ""),
+        total_score=participant.score
+    )
+
+def _sse_event(event: str, data: dict) -> str:
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.post("/{quest_id}/messages", response_model=AIResponse)
+async def send_message(
+    quest_id: str,
+    message: MessageCreate,
+    db: AsyncSession = Depends(get_async_db),
+    idempotency_key: Optional[str] = Header(None)
+):
+    """Send message in quest (chat with AI)
     
-    # Get conversation history for context
-    conversation_history = db.query(ChatMessage).filter(
-        ChatMessage.quest_id == quest_id
-    ).order_by(ChatMessage.created_at.desc()).limit(10).all()
+    A retry with the same Idempotency-Key header gets the first reply back
+    without another LLM call or credit spend.
+    """
+    if not idempotency_key:
+        return await _send_message(quest_id, message, db)
     
-    # Convert to AI service format
-    history = []
-    for msg in reversed(conversation_history[-5:]):  # Last 5 messages for context
-        history.append({
-            "role": "user" if msg.user_id else "assistant",
-            "content": msg.content
-        })
+    return await idempotency_store.execute(
+        idempotency_store.build_key("chat_message", message.user_id, idempotency_key),
+        idempotency_store.fingerprint({"quest_id": quest_id, **message.model_dump()}),
+        lambda: _send_message(quest_id, message, db)
+    )
+
+async def _send_message(quest_id: str, message: MessageCreate, db: AsyncSession) -> AIResponse:
+    chat = await db.run_sync(_prepare_message, quest_id, message)
     
     # Initialize AI service
     ai_service = AIService()
     
     try:
-        # Generate AI character response
-        quest_details = quest.details or {}
-        ai_response = await ai_service.generate_character_response(
-            quest_details=quest_details,
-            user_message=message.user_message,
-            conversation_history=history,
-            quest_title=quest.title or "",
-            quest_description=quest.description or "",
-            quest_context=quest.context or ""
-        )
+        if settings.AI_ASYNC_SCORING:
+            # Reply now; the message is scored later together with others
+            ai_response = await ai_service.generate_character_response(
+                quest_details=chat["quest_details"],
+                user_message=message.user_message,
+                conversation_history=chat["history"],
+                quest_title=chat["quest_title"],
+                quest_description=chat["quest_description"],
+                quest_context=chat["quest_context"],
+                quest_id=quest_id,
+                conversation_summary=chat["summary"],
+                quest_version=chat["quest_version"]
+            )
+            score_result = None
+        elif settings.AI_COMBINED_RESPONSE_SCORING:
+            # One structured-output call returns both the reply and the score
+            ai_response, score_result = await ai_service.generate_response_and_score(
+                quest_details=chat["quest_details"],
+                user_message=message.user_message,
+                scoring_criteria=chat["scoring_criteria"],
+                conversation_history=chat["history"],
+                quest_title=chat["quest_title"],
+                quest_description=chat["quest_description"],
+                quest_context=chat["quest_context"],
+                quest_id=quest_id,
+                conversation_summary=chat["summary"],
+                quest_version=chat["quest_version"]
+            )
+        else:
+            # Generate the character response and score the message concurrently
+            ai_response, score_result = await asyncio.gather(
+                ai_service.generate_character_response(
+                    quest_details=chat["quest_details"],
+                    user_message=message.user_message,
+                    conversation_history=chat["history"],
+                    quest_title=chat["quest_title"],
+                    quest_description=chat["quest_description"],
+                    quest_context=chat["quest_context"],
+                    quest_id=quest_id,
+                    conversation_summary=chat["summary"],
+                    quest_version=chat["quest_version"]
+                ),
+                ai_service.score_user_message(
+                    user_message=message.user_message,
+                    quest_context=chat["quest_context"],
+                    scoring_criteria=chat["scoring_criteria"],
+                    quest_id=quest_id
+                )
+            )
         
         # Check if AI response failed
         if not ai_response.get("success", False):
@@ -102,23 +328,8 @@ async def send_message(
                 detail=f"AI service failed: {ai_response.get('error', 'Unknown error')}"
             )
         
-        # Score the user's message
-        scoring_criteria = quest_details.get("instructions", {}).get("scoring_criteria", {
-            "creativity": 0.3,
-            "depth": 0.4,
-            "originality": 0.2,
-            "emotional_intelligence": 0.1,
-            "philosophical_insight": 0.0
-        })
-        
-        score_result = await ai_service.score_user_message(
-            user_message=message.user_message,
-            quest_context=quest.context or "",
-            scoring_criteria=scoring_criteria
-        )
-        
         # Check if scoring failed
-        if not score_result.get("success", False):
+        if score_result is not None and not score_result.get("success", False):
             raise HTTPException(
                 status_code=500, 
                 detail=f"AI scoring failed: {score_result.get('error', 'Unknown error')}"
@@ -129,120 +340,197 @@ async def send_message(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"AI service error: {str(e)}")
     
-    # Update user message with score and save changes
-    try:
-        user_message.score = score_result.get("score", 50)
-        db.commit()
-        
-        # Update participant score
-        participant.score += score_result.get("score", 50)
-        participant.last_reply_at = datetime.now()
-        
-        # Update user's last activity
-        from app.models.user import User
-        user = db.query(User).filter(User.user_id == message.user_id).first()
-        if user:
-            user.last_activity = datetime.now()
-        
-        # Add to reply log
-        reply_log = participant.reply_log or []
-        reply_log.append({
-            "message_id": user_message.message_id,
-            "content": message.user_message,
-            "score": score_result.get("score", 50),
-            "score_breakdown": score_result.get("score_breakdown", {}),
-            "timestamp": datetime.now().isoformat()
-        })
-        participant.reply_log = reply_log
-        
-        # Spend credit for sending message
-        credit_result = credits_service.spend_credit(
-            user_id=message.user_id,
-            quest_id=quest_id,
-            description="Message sent to AI"
-        )
-        
-        if not credit_result["success"]:
-            logger.warning(f"Failed to spend credit for user {message.user_id}: {credit_result.get('error')}")
-        
-        # Update leaderboard and check for quest end
-        leaderboard_service = LeaderboardService(db)
-        leaderboard_result = leaderboard_service.update_leaderboard(quest_id)
-        
-        if leaderboard_result.get("quest_ended"):
-            logger.info(f"Quest {quest_id} ended due to 100% completion")
+    return await db.run_sync(
+        _record_message, quest_id, message,
+        ai_response.get("character_response"), score_result
+    )
+
+@router.post("/{quest_id}/messages/stream")
+async def stream_message(
+    quest_id: str,
+    message: MessageCreate,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Send message in quest and stream the character reply as server-sent events
+    
+    Emits `token` events with reply text as it is generated, then a single
+    `done` event carrying the same payload as POST /messages once the reply
+    and score are saved, or an `error` event. With AI_ASYNC_SCORING the `done`
+    payload has `score_pending` set and the score is applied later.
+    """
+    chat = await db.run_sync(_prepare_message, quest_id, message)
+    ai_service = AIService()
+    
+    async def event_stream():
+        # Score the message while the reply streams, unless the batch scorer will
+        score_task = None
+        if not settings.AI_ASYNC_SCORING:
+            score_task = asyncio.create_task(ai_service.score_user_message(
+                user_message=message.user_message,
+                quest_context=chat["quest_context"],
+                scoring_criteria=chat["scoring_criteria"],
+                quest_id=quest_id
+            ))
         
-        db.commit()
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(status_code=500, detail=f"Failed to update message and participant: {str(e)}")
+        try:
+            chunks = []
+            try:
+                async for text in ai_service.stream_character_response(
+                    quest_details=chat["quest_details"],
+                    user_message=message.user_message,
+                    conversation_history=chat["history"],
+                    quest_title=chat["quest_title"],
+                    quest_description=chat["quest_description"],
+                    quest_context=chat["quest_context"],
+                    quest_id=quest_id,
+                    conversation_summary=chat["summary"],
+                    quest_version=chat["quest_version"]
+                ):
+                    chunks.append(text)
+                    yield _sse_event("token", {"text": text})
+                
+                score_result = await score_task if score_task else None
+            except Exception as e:
+                yield _sse_event("error", {"detail": f"AI service error: {str(e)}"})
+                return
+            
+            if not chunks:
+                yield _sse_event("error", {"detail": "AI service failed: empty response"})
+                return
+            
+            if score_result is not None and not score_result.get("success", False):
+                yield _sse_event("error", {
+                    "detail": f"AI scoring failed: {score_result.get('error', 'Unknown error')}"
+                })
+                return
+            
+            # The request session may already be closed once streaming starts
+            write_db = AsyncSessionLocal()
+            try:
+                ai_result = await write_db.run_sync(
+                    _record_message, quest_id, message,
+                    "".join(chunks), score_result
+                )
+                yield _sse_event("done", ai_result.model_dump(mode="json"))
+            except HTTPException as e:
+                yield _sse_event("error", {"detail": e.detail})
+            finally:
+                await write_db.close()
+        finally:
+            if score_task and not score_task.done():
+                score_task.cancel()
     
-    # Save AI response as a message
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _encode_cursor(msg: ChatMessage) -> str:
+    return _encode_position(msg.created_at, msg.message_id)
+
+def _encode_position(created_at: datetime, message_id: str) -> str:
+    raw = f"{created_at.isoformat()}|{message_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def _decode_cursor(cursor: str) -> tuple:
     try:
-        ai_message = ChatMessage(
-            quest_id=quest_id,
-            user_id=None,  # AI message
-            content=ai_response.get("character_response", "I'm having trouble responding right now."),
-            score=None
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, message_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), message_id
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def _page_messages(db: AsyncSession, query, before: Optional[str], after: Optional[str], limit: int) -> MessagePage:
+    """Keyset pagination over (created_at, message_id)
+    
+    Without `after` the page is the newest `limit` messages (before `before`
+    when given); with `after` it is the oldest `limit` messages after it.
+    Messages are always returned oldest first. The explicit created_at
+    bound keeps the (quest_id, [user_id,] created_at, message_id) index usable.
+    
+    created_at is stamped before the write commits, so a row can become
+    visible behind rows committed after it. The polling cursor therefore
+    never passes a row younger than CHAT_POLL_SETTLE_SECONDS, which may
+    still be committing: `after` polls stop at settled rows, and the newest
+    page shows every row but points next_cursor at its last settled one
+    (rows after it come again in the next poll).
+    """
+    settled_before = datetime.utcnow() - timedelta(seconds=settings.CHAT_POLL_SETTLE_SECONDS)
+    if after:
+        query = query.where(ChatMessage.created_at <= settled_before)
+    if before:
+        created_at, message_id = _decode_cursor(before)
+        query = query.where(
+            ChatMessage.created_at <= created_at,
+            or_(ChatMessage.created_at < created_at, ChatMessage.message_id < message_id)
         )
-        
-        db.add(ai_message)
-        db.commit()
-        db.refresh(ai_message)
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(status_code=500, detail=f"Failed to save AI response: {str(e)}")
+    if after:
+        created_at, message_id = _decode_cursor(after)
+        query = query.where(
+            ChatMessage.created_at >= created_at,
+            or_(ChatMessage.created_at > created_at, ChatMessage.message_id > message_id)
+        )
+    
+    if after:
+        messages = (await db.scalars(
+            query.order_by(ChatMessage.created_at.asc(), ChatMessage.message_id.asc()).limit(limit + 1)
+        )).all()
+        has_more = len(messages) > limit
+        messages = messages[:limit]
+    else:
+        messages = (await db.scalars(
+            query.order_by(ChatMessage.created_at.desc(), ChatMessage.message_id.desc()).limit(limit + 1)
+        )).all()
+        has_more = len(messages) > limit
+        messages = list(reversed(messages[:limit]))
+    
+    next_cursor = _encode_cursor(messages[-1]) if messages else after  # an empty poll keeps the caller's position
+    if not after and not before and messages and messages[-1].created_at > settled_before:
+        settled = [msg for msg in messages if msg.created_at <= settled_before]
+        # Just before the unsettled rows: the settle time itself when none of the page is settled
+        next_cursor = _encode_cursor(settled[-1]) if settled else _encode_position(settled_before, "")
+    
+    return MessagePage(
+        messages=[_to_message_response(msg) for msg in messages],
+        has_more=has_more,
+        prev_cursor=_encode_cursor(messages[0]) if messages else before,
+        next_cursor=next_cursor
+    )
 
-@router.get("/{quest_id}/messages", response_model=List[MessageResponse])
+@router.get("/{quest_id}/messages", response_model=MessagePage)
 async def get_quest_messages(
     quest_id: str,
-    limit: int = 100,
-    db: Session = Depends(get_db)
+    limit: int = Query(100, ge=1, le=200),
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_read_db)
 ):
-    """Get chat history for quest including opening AI message"""
+    """Get a page of the quest's chat history, including the opening AI message
+    
+    Pass `next_cursor` as `after` to poll for new messages and `prev_cursor`
+    as `before` to load older ones.
+    """
     # Check if quest exists
-    quest = db.query(Quest).filter(Quest.quest_id == quest_id).first()
-    if not quest:
+    quest_exists = await db.scalar(select(Quest.quest_id).where(Quest.quest_id == quest_id))
+    if not quest_exists:
         raise HTTPException(status_code=404, detail="Quest not found")
     
-    # Get all messages for the quest (including opening AI message)
-    messages = db.query(ChatMessage).filter(
-        ChatMessage.quest_id == quest_id
-    ).order_by(ChatMessage.created_at.asc()).limit(limit).all()
-    
-    return [
-        MessageResponse(
-            message_id=msg.message_id,
-            quest_id=msg.quest_id,
-            user_id=msg.user_id,
-            content=msg.content,
-            score=msg.score,
-            created_at=msg.created_at
-        )
-        for msg in messages
-    ]
+    query = select(ChatMessage).where(ChatMessage.quest_id == quest_id)
+    return await _page_messages(db, query, before, after, limit)
 
-@router.get("/{quest_id}/messages/{user_id}", response_model=List[MessageResponse])
+@router.get("/{quest_id}/messages/{user_id}", response_model=MessagePage)
 async def get_user_messages(
     quest_id: str,
     user_id: str,
-    limit: int = 50,
-    db: Session = Depends(get_db)
+    limit: int = Query(50, ge=1, le=200),
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_read_db)
 ):
-    """Get user's message history in quest"""
-    messages = db.query(ChatMessage).filter(
+    """Get a page of the user's message history in quest (same cursors as the quest history)"""
+    query = select(ChatMessage).where(
         ChatMessage.quest_id == quest_id,
         ChatMessage.user_id == user_id
-    ).order_by(ChatMessage.created_at.desc()).limit(limit).all()
-    
-    return [
-        MessageResponse(
-            message_id=msg.message_id,
-            quest_id=msg.quest_id,
-            user_id=msg.user_id,
-            content=msg.content,
-            score=msg.score,
-            created_at=msg.created_at
-        )
-        for msg in messages
-    ]
+    )
+    return await _page_messages(db, query, before, after, limit)
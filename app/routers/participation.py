@@ -1,14 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from datetime import datetime
 
-from app.database import get_db
+from app.database import get_async_db
 from app.models.participant import QuestParticipant
 from app.models.quest import Quest
 from app.models.user import User
 from app.models.message import ChatMessage
 from app.schemas.participation import ParticipationCreate, ParticipationResponse
+from app.services.global_leaderboard_service import GlobalLeaderboardService
+from app.services.leaderboard_service import LeaderboardService
 
 router = APIRouter()
 
@@ -16,11 +19,11 @@ router = APIRouter()
 async def join_quest(
     quest_id: str,
     participation: ParticipationCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """User joins a quest"""
     # Check if quest exists
-    quest = db.query(Quest).filter(Quest.quest_id == quest_id).first()
+    quest = await db.get(Quest, quest_id)
     if not quest:
         raise HTTPException(status_code=404, detail="Quest not found")
     
@@ -32,15 +35,15 @@ async def join_quest(
         raise HTTPException(status_code=400, detail="Quest has ended")
     
     # Check if user exists
-    user = db.query(User).filter(User.user_id == participation.user_id).first()
+    user = await db.get(User, participation.user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     # Check if user is already participating
-    existing_participation = db.query(QuestParticipant).filter(
+    existing_participation = await db.scalar(select(QuestParticipant).where(
         QuestParticipant.quest_id == quest_id,
         QuestParticipant.user_id == participation.user_id
-    ).first()
+    ).limit(1))
     
     if existing_participation:
         raise HTTPException(status_code=400, detail="User is already participating in this quest")
@@ -50,12 +53,15 @@ async def join_quest(
         quest_id=quest_id,
         user_id=participation.user_id,
         score=0,
-        reply_log=[]
+        message_count=0
     )
     
     db.add(participant)
-    db.commit()
-    db.refresh(participant)
+    await db.run_sync(
+        lambda session: GlobalLeaderboardService(session).apply_participant_change(participation.user_id, quests_delta=1)
+    )
+    await db.commit()
+    await db.refresh(participant)
     
     return ParticipationResponse(
         qp_id=participant.qp_id,
@@ -68,12 +74,12 @@ async def join_quest(
 @router.get("/{quest_id}/participants", response_model=List[ParticipationResponse])
 async def get_quest_participants(
     quest_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get quest participants"""
-    participants = db.query(QuestParticipant).filter(
+    participants = (await db.scalars(select(QuestParticipant).where(
         QuestParticipant.quest_id == quest_id
-    ).all()
+    ))).all()
     
     return [
         ParticipationResponse(
@@ -90,38 +96,46 @@ async def get_quest_participants(
 async def leave_quest(
     quest_id: str,
     user_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """User leaves quest"""
-    participant = db.query(QuestParticipant).filter(
+    participant = await db.scalar(select(QuestParticipant).where(
         QuestParticipant.quest_id == quest_id,
         QuestParticipant.user_id == user_id
-    ).first()
+    ).limit(1))
     
     if not participant:
         raise HTTPException(status_code=404, detail="User is not participating in this quest")
     
-    db.delete(participant)
-    db.commit()
+    score = participant.score or 0
+    await db.delete(participant)
+    
+    def remove_standings(session):
+        # Same transaction: the quest and global leaderboards drop the player with the participation
+        LeaderboardService(session, autocommit=False).remove_participant(quest_id, user_id)
+        GlobalLeaderboardService(session).apply_participant_change(user_id, score_delta=-score, quests_delta=-1)
+    
+    await db.run_sync(remove_standings)
+    await db.commit()
     
     return {"message": "Successfully left the quest"}
 
 @router.get("/{quest_id}/opening-message")
 async def get_quest_opening_message(
     quest_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get the opening AI message for a quest"""
     # Check if quest exists
-    quest = db.query(Quest).filter(Quest.quest_id == quest_id).first()
+    quest = await db.get(Quest, quest_id)
     if not quest:
         raise HTTPException(status_code=404, detail="Quest not found")
     
     # Get the opening AI message (first message with user_id=None)
-    opening_message = db.query(ChatMessage).filter(
+    opening_message = await db.scalar(select(ChatMessage).where(
         ChatMessage.quest_id == quest_id,
         ChatMessage.user_id == None
-    ).order_by(ChatMessage.created_at.asc()).first()
+    ).order_by(ChatMessage.created_at.asc()).limit(1))
     
     if not opening_message:
         raise HTTPException(status_code=404, detail="Quest opening message not found")
@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import Optional
 
 from app.database import get_db
 from app.services.payment_splitter import PaymentSplitter
+from app.services.idempotency import idempotency_store
 from app.models.quest import Quest
 from app.models.participant import QuestParticipant
 
@@ -25,10 +26,24 @@ class PaymentResponse(BaseModel):
 @router.post("/process-payment", response_model=PaymentResponse)
 async def process_user_payment(
     payment: PaymentRequest,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None)
 ):
-    """Process a user payment and split between treasury and pool"""
+    """Process a user payment and split between treasury and pool
+    
+    A retry with the same Idempotency-Key header returns the first result
+    instead of splitting the payment again.
+    """
+    if not idempotency_key:
+        return await _process_user_payment(payment, db)
     
+    return await idempotency_store.execute(
+        idempotency_store.build_key("process_payment", payment.user_id, idempotency_key),
+        idempotency_store.fingerprint(payment.model_dump()),
+        lambda: _process_user_payment(payment, db)
+    )
+
+async def _process_user_payment(payment: PaymentRequest, db: Session) -> PaymentResponse:
     try:
         # Validate quest exists and is active
         quest = db.query(Quest).filter(Quest.quest_id == payment.quest_id).first()
@@ -13,6 +13,7 @@ from app.models.message import ChatMessage
 from app.schemas.quest import QuestCreate, QuestResponse, QuestUpdate
 from app.routers.auth import get_current_admin
 from app.services.ai_service import AIService
+from app.services.prompt_cache import prompt_cache
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -147,7 +148,8 @@ async def create_quest(
             ai_service = AIService()
             opening_response = await ai_service.generate_quest_opening_message(
                 quest_details=quest.details,
-                quest_context=quest.context or ""
+                quest_context=quest.context or "",
+                quest_id=quest.quest_id
             )
             
             if opening_response.get("success"):
@@ -277,10 +279,12 @@ async def update_quest(
     # Update fields
     for field, value in quest_update.dict(exclude_unset=True).items():
         setattr(quest, field, value)
+    quest.prompt_version = Quest.prompt_version + 1
     
     try:
         db.commit()
         db.refresh(quest)
+        prompt_cache.invalidate(quest_id)
         return quest
     except Exception as e:
         db.rollback()
@@ -300,6 +304,7 @@ async def delete_quest(
     try:
         db.delete(quest)
         db.commit()
+        prompt_cache.invalidate(quest_id)
         return {"message": "Quest deleted successfully"}
     except Exception as e:
         db.rollback()
@@ -559,8 +564,10 @@ async def update_quest_info(
         if "end_date" in quest_info_update:
             quest.end_date = datetime.fromisoformat(quest_info_update["end_date"])
         
+        quest.prompt_version = Quest.prompt_version + 1
         db.commit()
         db.refresh(quest)
+        prompt_cache.invalidate(quest_id)
         
         return {
             "message": "Quest information updated successfully",
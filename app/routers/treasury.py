@@ -4,7 +4,7 @@ from sqlalchemy import func, desc
 from datetime import datetime, timedelta
 from typing import List
 
-from app.database import get_db
+from app.database import get_read_db
 from app.models.pool import QuestPool
 from app.models.reward import QuestReward
 from app.schemas.treasury import TreasuryInfo, TransactionHistory
@@ -12,7 +12,7 @@ from app.schemas.treasury import TreasuryInfo, TransactionHistory
 router = APIRouter()
 
 @router.get("/", response_model=TreasuryInfo)
-async def get_treasury_info(db: Session = Depends(get_db)):
+async def get_treasury_info(db: Session = Depends(get_read_db)):
     """Get treasury info (balances, reserves, inflows/outflows)"""
     
     # Calculate total treasury from all quest pools
@@ -52,7 +52,7 @@ async def get_treasury_info(db: Session = Depends(get_db)):
 async def get_user_transaction_history(
     user_id: str,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get user's transaction history"""
     
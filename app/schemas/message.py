@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from datetime import datetime
 
 class MessageCreate(BaseModel):
@@ -17,10 +17,17 @@ class MessageResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class MessagePage(BaseModel):
+    messages: List[MessageResponse]  # Oldest first
+    has_more: bool  # More messages beyond this page in the direction fetched
+    prev_cursor: Optional[str] = None  # Pass as `before` for older messages
+    next_cursor: Optional[str] = None  # Pass as `after` to poll for newer messages
+
 class AIResponse(BaseModel):
     user_message: MessageResponse
     ai_message: MessageResponse
-    score: int
+    score: Optional[int]
     score_breakdown: Dict[str, Any]
     feedback: str
     total_score: int
+    score_pending: bool = False  # True when the score is applied later by the batch scorer
@@ -0,0 +1,177 @@
+from app.core.config import settings
+from typing import Any, AsyncIterator, Dict, List
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+
+class GeminiBackend:
+    """Google Gemini backend used in production"""
+    name = "gemini"
+
+    def __init__(self):
+        import google.generativeai as genai
+
+        self._genai = genai
+        genai.configure(api_key=settings.GEMINI_API_KEY)
+
+    def create_model(self, system_instruction: str = None, model_name: str = None):
+        """Build a Gemini model, optionally carrying a system instruction"""
+        model_name = model_name or settings.GEMINI_MODEL
+        if system_instruction:
+            return self._genai.GenerativeModel(
+                model_name, system_instruction=system_instruction
+            )
+        return self._genai.GenerativeModel(model_name)
+
+class FakeBackendError(RuntimeError):
+    """Injected failure raised by the fake backend"""
+
+class FakeUsageMetadata:
+    """Token counts estimated at roughly four characters per token"""
+
+    def __init__(self, prompt: str, text: str):
+        self.prompt_token_count = max(len(prompt) // 4, 1)
+        self.candidates_token_count = max(len(text) // 4, 1)
+        self.total_token_count = self.prompt_token_count + self.candidates_token_count
+
+class FakeResponse:
+    """Minimal stand-in for a Gemini response or stream chunk"""
+
+    def __init__(self, text: str, usage_metadata: FakeUsageMetadata = None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+class FakeStream:
+    """Async iterator over fake response chunks, paced like a streamed reply"""
+
+    def __init__(self, chunks: List[str], delay_seconds: float, usage_metadata: FakeUsageMetadata = None):
+        self._chunks = chunks
+        self._delay_seconds = delay_seconds
+        self._usage_metadata = usage_metadata
+
+    async def __aiter__(self) -> AsyncIterator[FakeResponse]:
+        for i, chunk in enumerate(self._chunks):
+            await asyncio.sleep(self._delay_seconds)
+            # Like Gemini, usage metadata comes with the last chunk
+            last = i == len(self._chunks) - 1
+            yield FakeResponse(chunk, self._usage_metadata if last else None)
+
+class FakeModel:
+    """Deterministic offline model for load tests
+
+    Latency, failures and scores are derived from a seeded RNG keyed on the
+    prompt, so the same run replays identically regardless of request order.
+    """
+
+    _WORDS = [
+        "the", "veil", "between", "question", "and", "answer", "is", "thin",
+        "seeker", "your", "words", "echo", "through", "the", "halls", "of",
+        "thought", "what", "lies", "beneath", "truth", "remains", "unspoken",
+        "consider", "again", "whether", "certainty", "is", "a", "door", "or", "a", "wall"
+    ]
+
+    def __init__(self, system_instruction: str = None, model_name: str = None):
+        self.system_instruction = system_instruction or ""
+        self.model_name = model_name or "fake"
+
+    async def generate_content_async(
+        self,
+        prompt: str,
+        generation_config: Dict[str, Any] = None,
+        stream: bool = False
+    ):
+        rng = random.Random(f"{settings.AI_FAKE_SEED}:{self.system_instruction}:{prompt}")
+        latency = self._sample_latency(rng)
+
+        if rng.random() < settings.AI_FAKE_ERROR_RATE:
+            await asyncio.sleep(latency)
+            raise FakeBackendError("Injected fake backend failure")
+
+        text = self._build_text(rng, prompt)
+        usage_metadata = FakeUsageMetadata(self.system_instruction + prompt, text)
+
+        if stream:
+            chunks = [text[i:i + 24] for i in range(0, len(text), 24)] or [""]
+            # Split latency between time to first token and the remaining chunks
+            await asyncio.sleep(latency * 0.3)
+            return FakeStream(chunks, latency * 0.7 / len(chunks), usage_metadata)
+
+        await asyncio.sleep(latency)
+        return FakeResponse(text, usage_metadata)
+
+    def _sample_latency(self, rng: random.Random) -> float:
+        """Sample a latency in seconds from the configured distribution"""
+        base_ms = settings.AI_FAKE_LATENCY_MS
+        distribution = settings.AI_FAKE_LATENCY_DISTRIBUTION
+
+        if distribution == "uniform":
+            jitter_ms = settings.AI_FAKE_LATENCY_JITTER_MS
+            latency_ms = rng.uniform(base_ms - jitter_ms, base_ms + jitter_ms)
+        elif distribution == "lognormal":
+            # base_ms is the median, sigma controls the tail
+            latency_ms = rng.lognormvariate(math.log(max(base_ms, 1)), settings.AI_FAKE_LATENCY_SIGMA)
+        else:
+            latency_ms = base_ms
+
+        return max(latency_ms, 0) / 1000
+
+    def _build_text(self, rng: random.Random, prompt: str) -> str:
+        """Build a reply shaped like what the prompt asks for"""
+        if "character_response" in prompt:
+            data = self._build_score(rng)
+            data["character_response"] = self._build_reply(rng)
+            return json.dumps(data)
+        batch = re.search(r"JSON array of exactly (\d+) objects", prompt)
+        if batch:
+            scores = []
+            for index in range(1, int(batch.group(1)) + 1):
+                scores.append({"index": index, **self._build_score(rng)})
+            return json.dumps(scores)
+        if "Respond in this EXACT JSON format" in prompt:
+            return json.dumps(self._build_score(rng))
+        return self._build_reply(rng)
+
+    def _build_reply(self, rng: random.Random) -> str:
+        words = [rng.choice(self._WORDS) for _ in range(rng.randint(20, 60))]
+        return " ".join(words).capitalize() + "."
+
+    def _build_score(self, rng: random.Random) -> Dict[str, Any]:
+        if settings.AI_FAKE_SCORE_JSON:
+            return json.loads(settings.AI_FAKE_SCORE_JSON)
+
+        breakdown = {
+            criterion: rng.randint(30, 95)
+            for criterion in ("creativity", "depth", "originality", "emotional_intelligence", "philosophical_insight")
+        }
+        return {
+            "score": round(sum(breakdown.values()) / len(breakdown)),
+            "breakdown": breakdown,
+            "feedback": "Deterministic score from the fake AI backend"
+        }
+
+class FakeBackend:
+    """Offline backend returning deterministic canned responses"""
+    name = "fake"
+
+    def create_model(self, system_instruction: str = None, model_name: str = None) -> FakeModel:
+        return FakeModel(system_instruction, model_name)
+
+_BACKENDS = {
+    GeminiBackend.name: GeminiBackend,
+    FakeBackend.name: FakeBackend,
+}
+
+_backend = None
+
+def get_ai_backend():
+    """Get the process-wide AI backend selected by settings.AI_BACKEND"""
+    global _backend
+    if _backend is None or _backend.name != settings.AI_BACKEND:
+        backend_class = _BACKENDS.get(settings.AI_BACKEND)
+        if backend_class is None:
+            raise ValueError(f"Unknown AI_BACKEND '{settings.AI_BACKEND}'. Expected one of: {', '.join(_BACKENDS)}")
+        _backend = backend_class()
+    return _backend
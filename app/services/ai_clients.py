@@ -0,0 +1,86 @@
+from app.core.config import settings
+from app.services.ai_backends import get_ai_backend
+from collections import OrderedDict
+from typing import Any, Dict
+import asyncio
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+class AIClientRegistry:
+    """Process-wide holder for the configured AI backend and its model clients
+
+    Created once at startup (FastAPI lifespan, Celery worker init) so request
+    handlers reuse the same configured backend, connection pool and model
+    objects instead of rebuilding them per request.
+    """
+
+    def __init__(self, backend, max_models: int = 64):
+        self.backend = backend
+        self.max_models = max_models
+        self.default_model = backend.create_model()
+        self.warmed_up = False
+        self.warmup_latency_ms = None
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_model(self, model_name: str = None, system_instruction: str = None):
+        """Get a cached model client, building it on first use"""
+        if not model_name and not system_instruction:
+            return self.default_model
+
+        key = (model_name or "", system_instruction or "")
+        with self._lock:
+            model = self._models.get(key)
+            if model is not None:
+                self._models.move_to_end(key)
+                return model
+
+        model = self.backend.create_model(system_instruction=system_instruction, model_name=model_name)
+        with self._lock:
+            self._models[key] = model
+            while len(self._models) > self.max_models:
+                self._models.popitem(last=False)
+        return model
+
+    async def warmup(self):
+        """Send one tiny request so the first user request doesn't pay connection setup"""
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(
+                self.default_model.generate_content_async(
+                    "Reply with OK.", generation_config={"max_output_tokens": 1}
+                ),
+                timeout=settings.AI_WARMUP_TIMEOUT_SECONDS
+            )
+            self.warmed_up = True
+            self.warmup_latency_ms = round((time.monotonic() - started) * 1000, 2)
+            logger.info(f"AI client warmup completed in {self.warmup_latency_ms}ms")
+        except Exception as e:
+            logger.warning(f"AI client warmup failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": self.backend.name,
+                "cached_models": len(self._models),
+                "max_models": self.max_models,
+                "warmed_up": self.warmed_up,
+                "warmup_latency_ms": self.warmup_latency_ms
+            }
+
+_registry = None
+
+def init_ai_clients() -> AIClientRegistry:
+    """Create the process-wide client registry (idempotent)"""
+    global _registry
+    backend = get_ai_backend()
+    if _registry is None or _registry.backend is not backend:
+        _registry = AIClientRegistry(backend, max_models=settings.AI_PROMPT_CACHE_SIZE)
+    return _registry
+
+def get_ai_clients() -> AIClientRegistry:
+    """Get the client registry, creating it if startup hooks did not run (scripts)"""
+    return init_ai_clients()
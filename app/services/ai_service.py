@@ -1,12 +1,177 @@
-import google.generativeai as genai
 from app.core.config import settings
-from typing import Dict, Any, List
+from app.services.ai_clients import get_ai_clients
+from app.services.circuit_breaker import CircuitOpenError, circuit_breaker
+from app.services.llm_scheduler import (
+    CHAT, SCORING, OPENING, ENGAGEMENT, SUMMARY, LLMCapacityError, get_llm_scheduler
+)
+from app.services.llm_usage import llm_usage
+from app.services.prompt_cache import CompiledPrompt, prompt_cache
+from app.services.score_cache import score_cache
+from typing import Dict, Any, AsyncIterator, List, Tuple
+import asyncio
 import json
+import time
 
 class AIService:
     def __init__(self):
-        genai.configure(api_key=settings.GEMINI_API_KEY)
-        self.model = genai.GenerativeModel(settings.GEMINI_MODEL)
+        # Backend and model clients are shared process-wide (see ai_clients)
+        self.clients = get_ai_clients()
+        self.backend = self.clients.backend
+        self.model = self.clients.default_model
+    
+    async def _generate(
+        self,
+        prompt: str,
+        timeout: float = None,
+        generation_config: Dict[str, Any] = None,
+        model: Any = None,
+        request_class: str = CHAT,
+        system_instruction: str = None,
+        quest_id: str = None
+    ):
+        """Call the model through the async client without blocking the event loop
+        
+        Calls are guarded by the circuit breaker (falling back to
+        AI_FALLBACK_MODEL while it is open) and, with AI_HEDGE_ENABLED, a
+        second request is fired when the first outlives the recent p95 latency.
+        """
+        primary = model or self.model
+        target, is_fallback = self._select_model(primary, system_instruction)
+        # Set once a primary call holds a slot, i.e. the provider is working on it
+        primary_started = False
+        
+        async def _call(call_model):
+            nonlocal primary_started
+            async with get_llm_scheduler().slot(request_class):
+                if call_model is primary:
+                    primary_started = True
+                started = time.monotonic()
+                try:
+                    response = await call_model.generate_content_async(
+                        prompt, generation_config=generation_config
+                    )
+                except BaseException as e:
+                    # Includes cancellation by the deadline or a winning hedge
+                    self._record_usage(
+                        request_class, call_model, prompt, started, quest_id,
+                        system_instruction=system_instruction, error=e
+                    )
+                    raise
+                if call_model is primary:
+                    circuit_breaker.record_success(time.monotonic() - started)
+                self._record_usage(
+                    request_class, call_model, prompt, started, quest_id,
+                    system_instruction=system_instruction, response=response
+                )
+                return response
+        
+        if settings.AI_HEDGE_ENABLED and not is_fallback:
+            call = self._hedged_call(_call, primary, system_instruction)
+        else:
+            call = _call(target)
+        
+        try:
+            # The deadline covers time spent waiting for a free slot as well
+            return await asyncio.wait_for(
+                call,
+                timeout=timeout or settings.AI_REQUEST_TIMEOUT_SECONDS
+            )
+        except LLMCapacityError:
+            # Local backpressure says nothing about provider health
+            raise
+        except asyncio.TimeoutError:
+            # Neither does a deadline that expired while still queued for a slot
+            if primary_started and not is_fallback:
+                circuit_breaker.record_failure()
+            raise
+        except Exception:
+            if not is_fallback:
+                circuit_breaker.record_failure()
+            raise
+    
+    async def _hedged_call(self, call, primary: Any, system_instruction: str = None):
+        """Run `call(primary)`, firing a backup request if it outlives the p95 latency"""
+        hedge_delay = circuit_breaker.latency_percentile(0.95)
+        first = asyncio.ensure_future(call(primary))
+        tasks = {first}
+        
+        try:
+            if hedge_delay is None:
+                return await first
+            
+            done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+            if done:
+                return first.result()
+            
+            hedge_model = self._fallback_model(system_instruction) or primary
+            tasks.add(asyncio.ensure_future(call(hedge_model)))
+            
+            # First successful response wins; fail only if both fail
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+    
+    def _select_model(self, primary: Any, system_instruction: str = None):
+        """Return (model, is_fallback) honouring the circuit breaker state"""
+        if circuit_breaker.allow_request():
+            return primary, False
+        
+        fallback = self._fallback_model(system_instruction)
+        if fallback is None:
+            raise CircuitOpenError(circuit_breaker.retry_after())
+        return fallback, True
+    
+    def _fallback_model(self, system_instruction: str = None):
+        """Cheaper model used while the primary is unhealthy, if configured"""
+        if not settings.AI_FALLBACK_MODEL:
+            return None
+        return self.clients.get_model(
+            model_name=settings.AI_FALLBACK_MODEL, system_instruction=system_instruction
+        )
+    
+    def _record_usage(
+        self,
+        request_class: str,
+        model: Any,
+        prompt: str,
+        started: float,
+        quest_id: str = None,
+        system_instruction: str = None,
+        response: Any = None,
+        error: BaseException = None
+    ):
+        """Record tokens and latency for one model call
+        
+        prompt_chars counts the system instruction too: the provider bills it
+        as prompt input on every call, even though it is set on the model.
+        """
+        prompt_tokens, response_tokens = llm_usage.extract_token_counts(response)
+        llm_usage.record(
+            caller=request_class,
+            model=getattr(model, "model_name", "unknown"),
+            latency=time.monotonic() - started,
+            success=error is None,
+            prompt_chars=len(prompt) + len(system_instruction or ""),
+            prompt_tokens=prompt_tokens,
+            response_tokens=response_tokens,
+            quest_id=quest_id,
+            error=type(error).__name__ if error is not None else None
+        )
+    
+    async def generate_text(self, prompt: str, request_class: str = ENGAGEMENT, quest_id: str = None) -> str:
+        """Generate free-form text for a prebuilt prompt"""
+        response = await self._generate(prompt, request_class=request_class, quest_id=quest_id)
+        return response.text
     
     async def generate_character_response(
         self,
@@ -15,34 +180,34 @@ class AIService:
         conversation_history: List[Dict[str, str]] = None,
         quest_title: str = "",
         quest_description: str = "",
-        quest_context: str = ""
+        quest_context: str = "",
+        quest_id: str = None,
+        conversation_summary: str = None,
+        quest_version: int = None
     ) -> Dict[str, Any]:
         """Generate AI character response based on quest properties"""
         
-        # Extract quest properties
-        properties = quest_details.get("properties", {})
-        instructions = quest_details.get("instructions", {})
-        additional_text = quest_details.get("additional_text", {})
-        
-        # Build character prompt with full quest context
-        character_prompt = self._build_character_prompt(
-            properties, instructions, additional_text, quest_title, quest_description, quest_context
+        # Build (or reuse) the character prompt with full quest context
+        compiled = self._get_compiled_prompt(
+            quest_details, quest_title, quest_description, quest_context, quest_id, quest_version
         )
         
         # Add conversation context
         context = self._build_conversation_context(
-            user_message, conversation_history
+            user_message, conversation_history, conversation_summary
         )
         
-        # Generate response
-        full_prompt = f"{character_prompt}\n\n{context}"
-        
         try:
-            response = self.model.generate_content(full_prompt)
+            prompt, model, system_instruction = self._with_character_prompt(compiled, context)
+            response = await self._generate(
+                prompt, model=model, system_instruction=system_instruction, quest_id=quest_id
+            )
             return {
                 "character_response": response.text,
                 "success": True
             }
+        except (LLMCapacityError, CircuitOpenError):
+            raise
         except Exception as e:
             return {
                 "character_response": "I'm having trouble responding right now. Please try again.",
@@ -50,44 +215,321 @@ class AIService:
                 "error": str(e)
             }
     
+    async def stream_character_response(
+        self,
+        quest_details: Dict[str, Any],
+        user_message: str,
+        conversation_history: List[Dict[str, str]] = None,
+        quest_title: str = "",
+        quest_description: str = "",
+        quest_context: str = "",
+        quest_id: str = None,
+        conversation_summary: str = None,
+        quest_version: int = None
+    ) -> AsyncIterator[str]:
+        """Yield the character response text as Gemini streams it"""
+        
+        compiled = self._get_compiled_prompt(
+            quest_details, quest_title, quest_description, quest_context, quest_id, quest_version
+        )
+        context = self._build_conversation_context(
+            user_message, conversation_history, conversation_summary
+        )
+        prompt, primary, system_instruction = self._with_character_prompt(compiled, context)
+        model, is_fallback = self._select_model(primary, system_instruction)
+        timeout = settings.AI_REQUEST_TIMEOUT_SECONDS
+        
+        async with get_llm_scheduler().slot(CHAT):
+            started = time.monotonic()
+            chunk = None
+            try:
+                response = await asyncio.wait_for(
+                    model.generate_content_async(prompt, stream=True),
+                    timeout=timeout
+                )
+                chunks = response.__aiter__()
+                while True:
+                    # Each chunk gets its own deadline so a stalled stream is abandoned
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), timeout=timeout)
+                    except StopAsyncIteration:
+                        break
+                    if chunk.text:
+                        yield chunk.text
+            except BaseException as e:
+                self._record_usage(
+                    CHAT, model, prompt, started, quest_id,
+                    system_instruction=system_instruction, error=e
+                )
+                if not is_fallback and isinstance(e, Exception):
+                    circuit_breaker.record_failure()
+                raise
+            
+            # Usage metadata arrives with the final chunk
+            self._record_usage(
+                CHAT, model, prompt, started, quest_id,
+                system_instruction=system_instruction, response=chunk
+            )
+            if not is_fallback:
+                circuit_breaker.record_success(time.monotonic() - started)
+    
     async def score_user_message(
         self,
         user_message: str,
         quest_context: str,
-        scoring_criteria: Dict[str, float]
+        scoring_criteria: Dict[str, float],
+        quest_id: str = None
     ) -> Dict[str, Any]:
         """Score user's message based on quest criteria"""
         
+        cache_key = None
+        if settings.AI_SCORE_CACHE_ENABLED:
+            cache_key = score_cache.build_key(user_message, quest_context, scoring_criteria, quest_id)
+            cached = await score_cache.get(cache_key)
+            if cached:
+                return {**cached, "success": True, "cached": True}
+        
         scoring_prompt = self._build_scoring_prompt(
             user_message, quest_context, scoring_criteria
         )
         
         try:
-            response = self.model.generate_content(scoring_prompt)
+            response = await self._generate(scoring_prompt, request_class=SCORING, quest_id=quest_id)
             
             # Parse JSON response
             score_data = json.loads(response.text)
             
-            return {
-                "score": score_data.get("score", 50),
-                "score_breakdown": score_data.get("breakdown", {}),
-                "feedback": score_data.get("feedback", ""),
-                "success": True
-            }
+            score_result = self._build_score_result(score_data)
+            if cache_key:
+                await score_cache.set(cache_key, score_result)
+            return score_result
+        except (LLMCapacityError, CircuitOpenError):
+            raise
         except Exception as e:
-            return {
-                "score": 50,
-                "score_breakdown": {
-                    "creativity": 50,
-                    "depth": 50,
-                    "originality": 50,
-                    "emotional_intelligence": 50,
-                    "philosophical_insight": 50
+            return self._build_score_failure(e)
+    
+    async def score_user_messages(
+        self,
+        user_messages: List[str],
+        quest_context: str,
+        scoring_criteria: Dict[str, float],
+        quest_id: str = None
+    ) -> List[Dict[str, Any]]:
+        """Score several messages from one quest in a single JSON-array call
+        
+        Returns one score result per message, in order. Cached scores are
+        reused and only the remaining messages are sent to the model.
+        """
+        results = [None] * len(user_messages)
+        cache_keys = [None] * len(user_messages)
+        
+        if settings.AI_SCORE_CACHE_ENABLED:
+            for i, user_message in enumerate(user_messages):
+                cache_keys[i] = score_cache.build_key(user_message, quest_context, scoring_criteria, quest_id)
+                cached = await score_cache.get(cache_keys[i])
+                if cached:
+                    results[i] = {**cached, "success": True, "cached": True}
+        
+        missing = [i for i, result in enumerate(results) if result is None]
+        if not missing:
+            return results
+        
+        scoring_prompt = self._build_batch_scoring_prompt(
+            [user_messages[i] for i in missing], quest_context, scoring_criteria
+        )
+        
+        try:
+            response = await self._generate(
+                scoring_prompt,
+                generation_config={"response_mime_type": "application/json"},
+                request_class=SCORING,
+                quest_id=quest_id
+            )
+            
+            # Parse JSON array, matching entries back by index
+            score_items = json.loads(response.text)
+            if not isinstance(score_items, list):
+                raise ValueError("Batch scoring response is not a JSON array")
+            
+            by_index = {}
+            for position, item in enumerate(score_items):
+                if isinstance(item, dict):
+                    by_index[item.get("index", position + 1)] = item
+            
+            for position, i in enumerate(missing):
+                score_data = by_index.get(position + 1)
+                if score_data is None:
+                    results[i] = self._build_score_failure(ValueError("Missing score in batch response"))
+                    continue
+                results[i] = self._build_score_result(score_data)
+                if cache_keys[i]:
+                    await score_cache.set(cache_keys[i], results[i])
+        except (LLMCapacityError, CircuitOpenError):
+            raise
+        except Exception as e:
+            for i in missing:
+                results[i] = self._build_score_failure(e)
+        
+        return results
+    
+    async def generate_response_and_score(
+        self,
+        quest_details: Dict[str, Any],
+        user_message: str,
+        scoring_criteria: Dict[str, float],
+        conversation_history: List[Dict[str, str]] = None,
+        quest_title: str = "",
+        quest_description: str = "",
+        quest_context: str = "",
+        quest_id: str = None,
+        conversation_summary: str = None,
+        quest_version: int = None
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Generate the character reply and the score in one structured-output call
+        
+        Returns the same (character response, score) dicts as
+        generate_character_response and score_user_message.
+        """
+        
+        cache_key = None
+        if settings.AI_SCORE_CACHE_ENABLED:
+            cache_key = score_cache.build_key(user_message, quest_context, scoring_criteria, quest_id)
+            cached = await score_cache.get(cache_key)
+            if cached:
+                # Score is already known, only the reply needs the model
+                ai_response = await self.generate_character_response(
+                    quest_details, user_message, conversation_history,
+                    quest_title, quest_description, quest_context, quest_id,
+                    conversation_summary, quest_version
+                )
+                return ai_response, {**cached, "success": True, "cached": True}
+        
+        compiled = self._get_compiled_prompt(
+            quest_details, quest_title, quest_description, quest_context, quest_id, quest_version
+        )
+        context = self._build_conversation_context(
+            user_message, conversation_history, conversation_summary
+        )
+        
+        try:
+            prompt, model, system_instruction = self._with_character_prompt(compiled, context)
+            response = await self._generate(
+                self._build_combined_prompt(prompt, scoring_criteria),
+                generation_config={"response_mime_type": "application/json"},
+                model=model,
+                system_instruction=system_instruction,
+                quest_id=quest_id
+            )
+            data = json.loads(response.text)
+            
+            character_response = data.get("character_response")
+            if not character_response:
+                raise ValueError("Combined response is missing character_response")
+            
+            score_result = self._build_score_result(data)
+            if cache_key:
+                await score_cache.set(cache_key, score_result)
+            
+            return (
+                {"character_response": character_response, "success": True},
+                score_result
+            )
+        except (LLMCapacityError, CircuitOpenError):
+            raise
+        except Exception as e:
+            return (
+                {
+                    "character_response": "I'm having trouble responding right now. Please try again.",
+                    "success": False,
+                    "error": str(e)
                 },
-                "feedback": "Scoring unavailable",
-                "success": False,
-                "error": str(e)
-            }
+                self._build_score_failure(e)
+            )
+    
+    async def summarize_conversation(
+        self,
+        existing_summary: str,
+        turns: List[Dict[str, str]],
+        quest_id: str = None
+    ) -> str:
+        """Fold older conversation turns into the participant's running summary"""
+        summary_prompt = self._build_summary_prompt(existing_summary, turns)
+        response = await self._generate(summary_prompt, request_class=SUMMARY, quest_id=quest_id)
+        return response.text.strip()
+    
+    def _build_score_result(self, score_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Build a successful score result from parsed model JSON"""
+        return {
+            "score": score_data.get("score", 50),
+            "score_breakdown": score_data.get("breakdown", {}),
+            "feedback": score_data.get("feedback", ""),
+            "success": True
+        }
+    
+    def _build_score_failure(self, error: Exception) -> Dict[str, Any]:
+        """Build the neutral fallback score used when scoring fails"""
+        return {
+            "score": 50,
+            "score_breakdown": {
+                "creativity": 50,
+                "depth": 50,
+                "originality": 50,
+                "emotional_intelligence": 50,
+                "philosophical_insight": 50
+            },
+            "feedback": "Scoring unavailable",
+            "success": False,
+            "error": str(error)
+        }
+    
+    def _get_compiled_prompt(
+        self,
+        quest_details: Dict[str, Any],
+        quest_title: str = "",
+        quest_description: str = "",
+        quest_context: str = "",
+        quest_id: str = None,
+        quest_version: int = None
+    ) -> CompiledPrompt:
+        """Get the character prompt for a quest, reusing the cached build when unchanged
+        
+        The cache is keyed on the quest's prompt_version, which every edit
+        bumps; callers without it fall back to hashing the quest content.
+        """
+        
+        if quest_version is not None:
+            version = quest_version
+        else:
+            version = prompt_cache.compute_version(
+                quest_details, quest_title, quest_description, quest_context
+            )
+        if quest_id:
+            compiled = prompt_cache.get(quest_id, version)
+            if compiled:
+                return compiled
+        
+        character_prompt = self._build_character_prompt(
+            quest_details.get("properties", {}),
+            quest_details.get("instructions", {}),
+            quest_details.get("additional_text", {}),
+            quest_title, quest_description, quest_context
+        )
+        
+        model = None
+        if settings.AI_USE_SYSTEM_INSTRUCTION:
+            # The persona becomes a reusable system instruction for this quest
+            model = self.backend.create_model(system_instruction=character_prompt)
+        
+        compiled = CompiledPrompt(version, character_prompt, model)
+        if quest_id:
+            prompt_cache.set(quest_id, compiled)
+        return compiled
+    
+    def _with_character_prompt(self, compiled: CompiledPrompt, context: str):
+        """Return the prompt, model and system instruction to use for a message"""
+        if compiled.model is not None:
+            return context, compiled.model, compiled.character_prompt
+        return f"{compiled.character_prompt}\n\n{context}", self.model, None
     
     def _build_character_prompt(
         self,
@@ -175,21 +617,46 @@ Respond as {character_name} would, incorporating your personality, background, s
     def _build_conversation_context(
         self,
         user_message: str,
-        conversation_history: List[Dict[str, str]] = None
+        conversation_history: List[Dict[str, str]] = None,
+        conversation_summary: str = None
     ) -> str:
         """Build conversation context"""
         
         context = f"User's message: {user_message}"
         
+        if conversation_summary:
+            context += f"\n\nSummary of your earlier conversation with this user:\n{conversation_summary}"
+        
         if conversation_history:
             context += "\n\nPrevious conversation:\n"
-            for msg in conversation_history[-5:]:  # Last 5 messages
+            for msg in conversation_history[-settings.AI_HISTORY_RECENT_TURNS:]:
                 context += f"{msg.get('role', 'user')}: {msg.get('content', '')}\n"
         
         context += "\n\nRespond as your character would, incorporating the user's message into the ongoing narrative."
         
         return context
     
+    def _build_summary_prompt(
+        self,
+        existing_summary: str,
+        turns: List[Dict[str, str]]
+    ) -> str:
+        """Build prompt updating a rolling conversation summary"""
+        
+        transcript = "\n".join(f"{turn.get('role', 'user')}: {turn.get('content', '')}" for turn in turns)
+        
+        prompt = f"""You maintain the memory of an ongoing philosophical dialogue between a character and one user.
+
+Current summary:
+{existing_summary or "(none yet)"}
+
+New conversation turns:
+{transcript}
+
+Rewrite the summary so it includes the new turns. Keep the user's key ideas, positions, questions and any promises or revelations made by the character. Drop small talk. Write at most 150 words in plain prose, third person, no headings."""
+        
+        return prompt
+    
     def _build_scoring_prompt(
         self,
         user_message: str,
@@ -232,12 +699,104 @@ Respond in this EXACT JSON format:
         
         return prompt
     
+    def _build_batch_scoring_prompt(
+        self,
+        user_messages: List[str],
+        quest_context: str,
+        scoring_criteria: Dict[str, float]
+    ) -> str:
+        """Build prompt scoring several user messages into one JSON array"""
+        
+        numbered_messages = "\n".join(
+            f'[{i}] "{user_message}"' for i, user_message in enumerate(user_messages, start=1)
+        )
+        
+        prompt = f"""You are an expert philosophical dialogue evaluator. Score each of the user responses below independently, based on these criteria:
+
+Quest Context: {quest_context}
+User Responses:
+{numbered_messages}
+
+SCORING CRITERIA (rate 0-100 for each):
+- Creativity: How original and imaginative is the response?
+- Depth: How thoughtful and profound is the answer?
+- Originality: How unique and unexpected is the approach?
+- Emotional Intelligence: How well does it show understanding of human emotions?
+- Philosophical Insight: How much does it demonstrate philosophical thinking?
+
+WEIGHTS:
+- Creativity: {scoring_criteria.get('creativity', 0.3)}
+- Depth: {scoring_criteria.get('depth', 0.4)}
+- Originality: {scoring_criteria.get('originality', 0.2)}
+- Emotional Intelligence: {scoring_criteria.get('emotional_intelligence', 0.1)}
+- Philosophical Insight: {scoring_criteria.get('philosophical_insight', 0.0)}
+
+Respond with a JSON array of exactly {len(user_messages)} objects, one per response, in this EXACT format:
+[
+  {{
+    "index": [response number],
+    "score": [0-100],
+    "breakdown": {{
+      "creativity": [0-100],
+      "depth": [0-100],
+      "originality": [0-100],
+      "emotional_intelligence": [0-100],
+      "philosophical_insight": [0-100]
+    }},
+    "feedback": "[brief feedback explaining the score]"
+  }}
+]"""
+        
+        return prompt
+    
+    def _build_combined_prompt(
+        self,
+        reply_prompt: str,
+        scoring_criteria: Dict[str, float]
+    ) -> str:
+        """Build prompt asking for the in-character reply and its score as one JSON object"""
+        
+        prompt = f"""{reply_prompt}
+
+In addition to your reply, act as an expert philosophical dialogue evaluator and score the user's message. Your score must never be mentioned in the reply itself.
+
+SCORING CRITERIA (rate 0-100 for each):
+- Creativity: How original and imaginative is the response?
+- Depth: How thoughtful and profound is the answer?
+- Originality: How unique and unexpected is the approach?
+- Emotional Intelligence: How well does it show understanding of human emotions?
+- Philosophical Insight: How much does it demonstrate philosophical thinking?
+
+WEIGHTS:
+- Creativity: {scoring_criteria.get('creativity', 0.3)}
+- Depth: {scoring_criteria.get('depth', 0.4)}
+- Originality: {scoring_criteria.get('originality', 0.2)}
+- Emotional Intelligence: {scoring_criteria.get('emotional_intelligence', 0.1)}
+- Philosophical Insight: {scoring_criteria.get('philosophical_insight', 0.0)}
+
+Respond in this EXACT JSON format:
+{{
+  "character_response": "[your in-character reply]",
+  "score": [0-100],
+  "breakdown": {{
+    "creativity": [0-100],
+    "depth": [0-100],
+    "originality": [0-100],
+    "emotional_intelligence": [0-100],
+    "philosophical_insight": [0-100]
+  }},
+  "feedback": "[brief feedback explaining the score]"
+}}"""
+        
+        return prompt
+    
     async def generate_quest_opening_message(
         self,
         quest_details: Dict[str, Any],
         quest_context: str,
         quest_title: str = "",
-        quest_description: str = ""
+        quest_description: str = "",
+        quest_id: str = None
     ) -> Dict[str, Any]:
         """Generate the opening AI message for a quest by refining a template"""
         
@@ -261,11 +820,13 @@ Respond in this EXACT JSON format:
             )
         
         try:
-            response = self.model.generate_content(opening_prompt)
+            response = await self._generate(opening_prompt, request_class=OPENING, quest_id=quest_id)
             return {
                 "opening_message": response.text,
                 "success": True
             }
+        except (LLMCapacityError, CircuitOpenError):
+            raise
         except Exception as e:
             return {
                 "opening_message": "Welcome to this quest! Are you ready to begin?",
@@ -410,8 +971,11 @@ REFINED OPENING MESSAGE:"""
             quest_description = quest.description or ""
             
             return await self.generate_quest_opening_message(
-                quest_details, quest_context, quest_title, quest_description
+                quest_details, quest_context, quest_title, quest_description,
+                quest_id=quest.quest_id
             )
+        except (LLMCapacityError, CircuitOpenError):
+            raise
         except Exception as e:
             return {
                 "opening_message": "Welcome to this quest! Are you ready to begin?",
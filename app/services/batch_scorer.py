@@ -0,0 +1,352 @@
+from app.core.config import settings
+from app.database import SessionLocal
+from app.services.circuit_breaker import CircuitOpenError
+from app.services.llm_scheduler import LLMCapacityError
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+import asyncio
+import logging
+import uuid
+import weakref
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SCORING_CRITERIA = {
+    "creativity": 0.3,
+    "depth": 0.4,
+    "originality": 0.2,
+    "emotional_intelligence": 0.1,
+    "philosophical_insight": 0.0
+}
+
+class BatchScorer:
+    """Background scorer for chat messages saved with a pending score
+
+    Message ids are queued by the chat endpoint. A worker task drains the
+    queue, waiting up to `max_wait_seconds` to fill a batch, scores each
+    quest's messages with one JSON-array LLM call and applies the scores,
+    participant totals and leaderboard for the whole batch at once.
+
+    The queue is only in memory. Messages it loses (crash, kill, retries
+    pending at shutdown) keep score IS NULL in the database, and
+    recover_pending() re-queues those older than `recovery_grace_seconds`.
+    """
+
+    def __init__(
+        self,
+        batch_size: int,
+        max_wait_seconds: float,
+        retry_seconds: float,
+        recovery_grace_seconds: float = 120.0,
+        recovery_max_age_seconds: float = 86400.0
+    ):
+        self.batch_size = max(batch_size, 1)
+        self.max_wait_seconds = max_wait_seconds
+        self.retry_seconds = retry_seconds
+        self.recovery_grace_seconds = recovery_grace_seconds
+        self.recovery_max_age_seconds = recovery_max_age_seconds
+        self.enqueued = 0
+        self.scored = 0
+        self.failed = 0
+        self.retried = 0
+        self.recovered = 0
+        self.batches = 0
+        self.llm_calls = 0
+        self._queue = asyncio.Queue()
+        self._worker = None
+        self._tracked = set()  # ids queued or waiting for a retry in this process
+
+    def submit(self, message_id: str):
+        """Queue a saved user message for scoring"""
+        self.enqueued += 1
+        self._tracked.add(message_id)
+        self._queue.put_nowait(message_id)
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def recover_pending(self, limit: int = 1000) -> int:
+        """Re-queue pending messages that no scorer is holding any more; returns how many"""
+        message_ids = await asyncio.to_thread(self._find_stranded, limit)
+        recovered = 0
+        for message_id in message_ids:
+            if message_id not in self._tracked:
+                self.submit(message_id)
+                recovered += 1
+        if recovered:
+            self.recovered += recovered
+            logger.info(f"Re-queued {recovered} messages with a pending score")
+        return recovered
+
+    async def run_recovery(self, interval_seconds: float):
+        """Background task: recover_pending() now and every `interval_seconds` until cancelled"""
+        while True:
+            try:
+                await self.recover_pending()
+            except Exception as e:
+                logger.error(f"Pending score recovery failed: {e}")
+            await asyncio.sleep(interval_seconds)
+
+    async def flush(self):
+        """Score everything still queued (used on shutdown)"""
+        if self._worker is not None and not self._worker.done():
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+
+        while not self._queue.empty():
+            message_ids = []
+            while not self._queue.empty() and len(message_ids) < self.batch_size:
+                message_ids.append(self._queue.get_nowait())
+            await self.score_batch(message_ids, retry=False)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            message_ids = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait_seconds
+
+            try:
+                while len(message_ids) < self.batch_size:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        message_ids.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+                    except asyncio.TimeoutError:
+                        break
+
+                await self.score_batch(message_ids)
+            except asyncio.CancelledError:
+                # Cancelled by flush(): hand the batch back so it is scored there
+                for message_id in message_ids:
+                    self._queue.put_nowait(message_id)
+                raise
+            except Exception as e:
+                logger.error(f"Batch scoring failed for {len(message_ids)} messages: {e}")
+
+    async def score_batch(self, message_ids: List[str], retry: bool = True):
+        """Score a batch of pending messages and persist the results"""
+        retrying = set()
+        try:
+            await self._score_batch(message_ids, retry, retrying)
+        finally:
+            # Anything not scheduled for a retry is done here, or left to recover_pending()
+            self._tracked.difference_update(set(message_ids) - retrying)
+
+    async def _score_batch(self, message_ids: List[str], retry: bool, retrying: set):
+        from app.services.ai_service import AIService
+
+        groups = await asyncio.to_thread(self._load_pending, message_ids)
+        if not groups:
+            return
+
+        self.batches += 1
+        ai_service = AIService()
+
+        for quest_id, group in groups.items():
+            try:
+                self.llm_calls += 1
+                results = await ai_service.score_user_messages(
+                    user_messages=[content for _, content in group["messages"]],
+                    quest_context=group["quest_context"],
+                    scoring_criteria=group["scoring_criteria"],
+                    quest_id=quest_id
+                )
+            except (LLMCapacityError, CircuitOpenError) as e:
+                pending_ids = [message_id for message_id, _ in group["messages"]]
+                if retry:
+                    # Provider is saturated or unhealthy: try again later
+                    self.retried += len(pending_ids)
+                    retrying.update(pending_ids)
+                    asyncio.get_running_loop().call_later(
+                        max(self.retry_seconds, e.retry_after), self._requeue, pending_ids
+                    )
+                else:
+                    logger.warning(f"Dropping {len(pending_ids)} pending scores for quest {quest_id}: {e.detail}")
+                continue
+
+            scores = []
+            for (message_id, _), score_result in zip(group["messages"], results):
+                if not score_result.get("success", False):
+                    # Neutral fallback score so the message does not stay pending forever
+                    self.failed += 1
+                    logger.warning(f"Scoring failed for message {message_id}: {score_result.get('error')}")
+                scores.append((message_id, score_result))
+
+            await asyncio.to_thread(self._apply_scores, quest_id, scores)
+            self.scored += len(scores)
+
+    def _requeue(self, message_ids: List[str]):
+        for message_id in message_ids:
+            self._queue.put_nowait(message_id)
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self._queue.qsize(),
+            "batch_size": self.batch_size,
+            "max_wait_seconds": self.max_wait_seconds,
+            "enqueued": self.enqueued,
+            "scored": self.scored,
+            "failed": self.failed,
+            "retried": self.retried,
+            "recovered": self.recovered,
+            "batches": self.batches,
+            "llm_calls": self.llm_calls,
+            "messages_per_llm_call": round(self.scored / self.llm_calls, 2) if self.llm_calls else 0.0
+        }
+
+    def _find_stranded(self, limit: int) -> List[str]:
+        """Ids of user messages still unscored after the grace period (oldest first)
+
+        The grace period covers messages another worker still holds in its
+        queue or retry timer; the max age keeps out rows left unscored by the
+        old synchronous flow when its scoring call failed. created_at is UTC,
+        the clock of its func.now() column default.
+        """
+        from app.models.message import ChatMessage
+
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            return [message_id for message_id, in db.query(ChatMessage.message_id).filter(
+                ChatMessage.score.is_(None),
+                ChatMessage.user_id.isnot(None),
+                ChatMessage.created_at < now - timedelta(seconds=self.recovery_grace_seconds),
+                ChatMessage.created_at >= now - timedelta(seconds=self.recovery_max_age_seconds)
+            ).order_by(ChatMessage.created_at).limit(limit)]
+        finally:
+            db.close()
+
+    def _load_pending(self, message_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Load still-unscored messages grouped by quest with their scoring context"""
+        from app.models.message import ChatMessage
+        from app.models.quest import Quest
+
+        db = SessionLocal()
+        try:
+            messages = db.query(ChatMessage).filter(
+                ChatMessage.message_id.in_(message_ids),
+                ChatMessage.score.is_(None)
+            ).order_by(ChatMessage.created_at).all()
+
+            groups = {}
+            for msg in messages:
+                if msg.quest_id not in groups:
+                    quest = db.query(Quest).filter(Quest.quest_id == msg.quest_id).first()
+                    if not quest:
+                        logger.warning(f"Skipping score for message {msg.message_id}: quest {msg.quest_id} not found")
+                        continue
+                    quest_details = quest.details or {}
+                    groups[msg.quest_id] = {
+                        "quest_context": quest.context or "",
+                        "scoring_criteria": quest_details.get("instructions", {}).get(
+                            "scoring_criteria", DEFAULT_SCORING_CRITERIA
+                        ),
+                        "messages": []
+                    }
+                if msg.quest_id in groups:
+                    groups[msg.quest_id]["messages"].append((msg.message_id, msg.content))
+            return groups
+        finally:
+            db.close()
+
+    def _apply_scores(self, quest_id: str, scores: List[tuple]):
+        """Write message scores, participant totals and the leaderboard for one quest"""
+        from app.models.message import ChatMessage
+        from app.models.participant import QuestParticipant, ParticipantReply
+        from app.services.global_leaderboard_service import GlobalLeaderboardService
+        from app.services.leaderboard_service import LeaderboardService
+
+        db = SessionLocal()
+        try:
+            messages = {
+                msg.message_id: msg
+                # Locked so a worker recovering the same messages skips them once this commits
+                for msg in db.query(ChatMessage).filter(
+                    ChatMessage.message_id.in_([message_id for message_id, _ in scores]),
+                    ChatMessage.score.is_(None)
+                ).with_for_update().all()
+            }
+            if not messages:
+                return
+
+            participants = {
+                participant.user_id: participant
+                for participant in db.query(QuestParticipant).filter(
+                    QuestParticipant.quest_id == quest_id,
+                    QuestParticipant.user_id.in_({msg.user_id for msg in messages.values()})
+                ).all()
+            }
+
+            message_updates = []
+            replies = []
+            for message_id, score_result in scores:
+                msg = messages.get(message_id)
+                if msg is None:
+                    # Already scored by another worker
+                    continue
+
+                score = score_result.get("score", 50)
+                message_updates.append({"message_id": message_id, "score": score})
+
+                participant = participants.get(msg.user_id)
+                if participant is None:
+                    continue
+                participant.score = (participant.score or 0) + score
+                participant.message_count = (participant.message_count or 0) + 1
+                replies.append({
+                    "reply_id": str(uuid.uuid4()),
+                    "quest_id": quest_id,
+                    "user_id": msg.user_id,
+                    "message_id": message_id,
+                    "score": score,
+                    "score_breakdown": score_result.get("score_breakdown", {}),
+                    "created_at": msg.created_at or datetime.utcnow()
+                })
+
+            db.bulk_update_mappings(ChatMessage, message_updates)
+            db.bulk_insert_mappings(ParticipantReply, replies)
+            db.flush()
+
+            score_deltas = {}
+            for reply in replies:
+                score_deltas[reply["user_id"]] = score_deltas.get(reply["user_id"], 0) + reply["score"]
+            global_leaderboard = GlobalLeaderboardService(db)
+            for user_id, score_delta in score_deltas.items():
+                global_leaderboard.apply_participant_change(user_id, score_delta=score_delta)
+
+            leaderboard_result = LeaderboardService(db, autocommit=False).update_leaderboard(
+                quest_id, [reply["user_id"] for reply in replies]
+            )
+            if leaderboard_result.get("quest_ended"):
+                logger.info(f"Quest {quest_id} ended due to 100% completion")
+
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Failed to apply batch scores for quest {quest_id}: {e}")
+            raise
+        finally:
+            db.close()
+
+# The queue and worker task are bound to an event loop, so each loop gets its own scorer
+_scorers = weakref.WeakKeyDictionary()
+
+def get_batch_scorer() -> BatchScorer:
+    """Get the batch scorer bound to the running event loop"""
+    loop = asyncio.get_running_loop()
+    scorer = _scorers.get(loop)
+    if scorer is None:
+        scorer = BatchScorer(
+            settings.AI_SCORING_BATCH_SIZE,
+            settings.AI_SCORING_BATCH_WAIT_SECONDS,
+            settings.AI_SCORING_RETRY_SECONDS,
+            recovery_grace_seconds=settings.AI_SCORING_RECOVERY_GRACE_SECONDS,
+            recovery_max_age_seconds=settings.AI_SCORING_RECOVERY_MAX_AGE_SECONDS
+        )
+        _scorers[loop] = scorer
+    return scorer
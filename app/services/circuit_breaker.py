@@ -0,0 +1,118 @@
+from fastapi import HTTPException
+from app.core.config import settings
+from collections import deque
+from typing import Any, Dict, Optional
+import math
+import threading
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitOpenError(HTTPException):
+    """Raised instead of calling the LLM provider while the breaker is open"""
+
+    def __init__(self, retry_after: float):
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(
+            status_code=503,
+            detail="AI service is temporarily unavailable. Please retry shortly.",
+            headers={"Retry-After": str(self.retry_after)}
+        )
+
+class CircuitBreaker:
+    """Rolling-window circuit breaker for the primary LLM model
+
+    Opens after `failure_threshold` failures within `window_seconds`, rejects
+    calls for `reset_seconds`, then lets a single probe through (half-open).
+    A successful probe closes the breaker, a failed one reopens it. It also
+    keeps recent successful latencies, which set the hedging delay.
+    """
+
+    def __init__(self, failure_threshold: int, window_seconds: float, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.window_seconds = window_seconds
+        self.reset_seconds = reset_seconds
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probe_started_at = None
+        self.times_opened = 0
+        self._failures = deque()
+        self._latencies = deque(maxlen=500)
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """Whether a call may go to the primary model right now"""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if now - self.opened_at < self.reset_seconds:
+                    return False
+                self.state = HALF_OPEN
+                self.probe_started_at = None
+            # Half-open: one probe at a time; a probe that never reported back is replaced
+            if self.probe_started_at is None or now - self.probe_started_at >= self.reset_seconds:
+                self.probe_started_at = now
+                return True
+            return False
+
+    def record_success(self, latency: float = None):
+        with self._lock:
+            if latency is not None:
+                self._latencies.append(latency)
+            if self.state != CLOSED:
+                self.state = CLOSED
+                self.probe_started_at = None
+                self._failures.clear()
+
+    def record_failure(self):
+        with self._lock:
+            now = time.monotonic()
+            self._failures.append(now)
+            while self._failures and now - self._failures[0] > self.window_seconds:
+                self._failures.popleft()
+            if self.state == HALF_OPEN or len(self._failures) >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.times_opened += 1
+                self.state = OPEN
+                self.opened_at = now
+                self.probe_started_at = None
+
+    def retry_after(self) -> float:
+        with self._lock:
+            if self.state != OPEN:
+                return 1
+            return self.reset_seconds - (time.monotonic() - self.opened_at)
+
+    def latency_percentile(self, percentile: float, min_samples: int = 20) -> Optional[float]:
+        """Recent successful-call latency at the given percentile, in seconds"""
+        with self._lock:
+            if len(self._latencies) < min_samples:
+                return None
+            latencies = sorted(self._latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * percentile))]
+
+    def stats(self) -> Dict[str, Any]:
+        p50 = self.latency_percentile(0.5, min_samples=1)
+        p95 = self.latency_percentile(0.95, min_samples=1)
+        with self._lock:
+            return {
+                "state": self.state,
+                "recent_failures": len(self._failures),
+                "failure_threshold": self.failure_threshold,
+                "window_seconds": self.window_seconds,
+                "reset_seconds": self.reset_seconds,
+                "times_opened": self.times_opened,
+                "latency_samples": len(self._latencies),
+                "p50_latency_ms": round(p50 * 1000, 2) if p50 is not None else None,
+                "p95_latency_ms": round(p95 * 1000, 2) if p95 is not None else None
+            }
+
+circuit_breaker = CircuitBreaker(
+    failure_threshold=settings.AI_BREAKER_FAILURE_THRESHOLD,
+    window_seconds=settings.AI_BREAKER_WINDOW_SECONDS,
+    reset_seconds=settings.AI_BREAKER_RESET_SECONDS
+)
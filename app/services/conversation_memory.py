@@ -0,0 +1,219 @@
+from sqlalchemy import case, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.database import SessionLocal
+from app.models.conversation_summary import ConversationSummary, ConversationTurn
+from app.models.message import ChatMessage
+from datetime import datetime
+from typing import Dict, List, Tuple
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+class ConversationMemory:
+    """Per-participant rolling summary plus the last few turns
+
+    Prompts get a fixed budget: persona + summary + at most
+    AI_HISTORY_RECENT_TURNS turns. Turns are appended as rows as part of
+    the chat write (a fixed-size write per message); every
+    AI_SUMMARY_REFRESH_TURNS exchanges a background task folds the older
+    turns into the summary and deletes them.
+    """
+
+    def __init__(self):
+        self._refreshing = set()
+
+    def load_history(
+        self,
+        db: Session,
+        quest_id: str,
+        user_id: str,
+        exclude_message_id: str = None
+    ) -> Tuple[str, List[Dict[str, str]]]:
+        """Return (summary, recent turns) for one participant"""
+        memory = self._get(db, quest_id, user_id)
+        if memory is not None:
+            turns = db.query(ConversationTurn.role, ConversationTurn.content).filter(
+                ConversationTurn.quest_id == quest_id,
+                ConversationTurn.user_id == user_id
+            ).order_by(ConversationTurn.created_at.desc()).limit(settings.AI_HISTORY_RECENT_TURNS).all()
+            return memory.summary or "", [
+                {"role": role, "content": content} for role, content in reversed(turns)
+            ]
+
+        # No memory yet (first message or pre-existing participant): use their own recent messages
+        query = db.query(ChatMessage).filter(
+            ChatMessage.quest_id == quest_id,
+            ChatMessage.user_id == user_id
+        )
+        if exclude_message_id:
+            query = query.filter(ChatMessage.message_id != exclude_message_id)
+        messages = query.order_by(ChatMessage.created_at.desc()).limit(settings.AI_HISTORY_RECENT_TURNS).all()
+
+        return "", [{"role": "user", "content": msg.content} for msg in reversed(messages)]
+
+    def append_turn(
+        self,
+        db: Session,
+        quest_id: str,
+        user_id: str,
+        user_message: ChatMessage,
+        ai_message: ChatMessage
+    ) -> bool:
+        """Add one exchange to the participant's memory (caller commits)
+
+        Returns True when the summary is due for a refresh.
+        """
+        max_chars = settings.AI_HISTORY_TURN_MAX_CHARS
+        db.add_all([
+            ConversationTurn(
+                quest_id=quest_id,
+                user_id=user_id,
+                message_id=message.message_id,
+                role=role,
+                content=message.content[:max_chars],
+                created_at=message.created_at or datetime.utcnow()
+            )
+            for role, message in (("user", user_message), ("assistant", ai_message))
+        ])
+
+        turns_since_refresh = self._count_exchange(db, quest_id, user_id)
+        return turns_since_refresh >= settings.AI_SUMMARY_REFRESH_TURNS
+
+    def _count_exchange(self, db: Session, quest_id: str, user_id: str) -> int:
+        """Increment the participant's counters in place; returns turns_since_refresh"""
+        turns_since_refresh = db.execute(
+            update(ConversationSummary).where(
+                ConversationSummary.quest_id == quest_id,
+                ConversationSummary.user_id == user_id
+            ).values(
+                turns_since_refresh=ConversationSummary.turns_since_refresh + 1,
+                total_turns=ConversationSummary.total_turns + 1,
+                updated_at=datetime.utcnow()
+            ).returning(ConversationSummary.turns_since_refresh).execution_options(synchronize_session=False)
+        ).scalar()
+        if turns_since_refresh is not None:
+            return turns_since_refresh
+
+        try:
+            with db.begin_nested():
+                db.add(ConversationSummary(
+                    quest_id=quest_id, user_id=user_id, summary="", turns_since_refresh=1, total_turns=1
+                ))
+            return 1
+        except IntegrityError:
+            # Created by a concurrent request in the meantime
+            return self._count_exchange(db, quest_id, user_id)
+
+    def schedule_refresh(self, quest_id: str, user_id: str):
+        """Refresh the summary in the background, at most once at a time per participant"""
+        key = (quest_id, user_id)
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+        asyncio.get_running_loop().create_task(self._refresh(key))
+
+    async def _refresh(self, key: Tuple[str, str]):
+        from app.services.ai_service import AIService
+
+        quest_id, user_id = key
+        try:
+            loaded = await asyncio.to_thread(self._load_for_refresh, quest_id, user_id)
+            if loaded is None:
+                return
+            summary, overflow, turns_since_refresh = loaded
+
+            new_summary = await AIService().summarize_conversation(summary, overflow, quest_id=quest_id)
+            if not new_summary:
+                return
+
+            await asyncio.to_thread(
+                self._save_refresh, quest_id, user_id,
+                new_summary[:settings.AI_SUMMARY_MAX_CHARS],
+                [turn["turn_id"] for turn in overflow],
+                turns_since_refresh
+            )
+        except Exception as e:
+            logger.warning(f"Failed to refresh conversation summary for {user_id} in quest {quest_id}: {e}")
+        finally:
+            self._refreshing.discard(key)
+
+    def _get(self, db: Session, quest_id: str, user_id: str):
+        return db.query(ConversationSummary).filter(
+            ConversationSummary.quest_id == quest_id,
+            ConversationSummary.user_id == user_id
+        ).first()
+
+    def _load_for_refresh(self, quest_id: str, user_id: str):
+        """Return (summary, turns to fold in, turns_since_refresh), or None when nothing is older than the window"""
+        db = SessionLocal()
+        try:
+            memory = self._get(db, quest_id, user_id)
+            if memory is None:
+                return None
+            turns = [
+                {"turn_id": turn_id, "role": role, "content": content}
+                for turn_id, role, content in db.query(
+                    ConversationTurn.turn_id, ConversationTurn.role, ConversationTurn.content
+                ).filter(
+                    ConversationTurn.quest_id == quest_id,
+                    ConversationTurn.user_id == user_id
+                ).order_by(ConversationTurn.created_at)
+            ]
+            overflow = turns[:-settings.AI_HISTORY_RECENT_TURNS] if settings.AI_HISTORY_RECENT_TURNS else turns
+            if not overflow:
+                return None
+            return memory.summary or "", overflow, memory.turns_since_refresh or 0
+        finally:
+            db.close()
+
+    def _save_refresh(self, quest_id: str, user_id: str, summary: str, summarized_ids: List[str], turns_since_refresh: int):
+        """Store the new summary and drop the turns it covers
+
+        The summary row is locked, and only the summarized turn rows are
+        deleted: turns appended while the summary was being generated are
+        separate rows and stay. If those turns are already gone, another
+        refresh got there first and this one is discarded.
+        """
+        db = SessionLocal()
+        try:
+            memory = db.query(ConversationSummary).filter(
+                ConversationSummary.quest_id == quest_id,
+                ConversationSummary.user_id == user_id
+            ).with_for_update().first()
+            if memory is None:
+                return
+
+            deleted = db.query(ConversationTurn).filter(
+                ConversationTurn.quest_id == quest_id,
+                ConversationTurn.user_id == user_id,
+                ConversationTurn.turn_id.in_(summarized_ids)
+            ).delete(synchronize_session=False)
+            if deleted != len(summarized_ids):
+                db.rollback()
+                return
+
+            # Relative, so exchanges counted since the refresh started are kept
+            db.execute(
+                update(ConversationSummary).where(
+                    ConversationSummary.summary_id == memory.summary_id
+                ).values(
+                    summary=summary,
+                    turns_since_refresh=case(
+                        (ConversationSummary.turns_since_refresh > turns_since_refresh,
+                         ConversationSummary.turns_since_refresh - turns_since_refresh),
+                        else_=0
+                    ),
+                    updated_at=datetime.utcnow()
+                ).execution_options(synchronize_session=False)
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+conversation_memory = ConversationMemory()
@@ -7,8 +7,14 @@ import json
 import uuid
 
 class CreditsService:
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, autocommit: bool = True):
+        # autocommit=False leaves flushing and committing to the caller's unit of work
         self.db = db
+        self.autocommit = autocommit
+    
+    def _commit(self):
+        if self.autocommit:
+            self.db.commit()
     
     def get_user_credits(self, user_id: str, quest_id: str) -> Optional[UserCredits]:
         """Get user's credits for a specific quest"""
@@ -27,8 +33,9 @@ class CreditsService:
             last_reset_date=datetime.utcnow()
         )
         self.db.add(user_credits)
-        self.db.commit()
-        self.db.refresh(user_credits)
+        if self.autocommit:
+            self.db.commit()
+            self.db.refresh(user_credits)
         return user_credits
     
     def reset_daily_credits(self, user_id: str, quest_id: str) -> UserCredits:
@@ -45,7 +52,7 @@ class CreditsService:
             # Reset credits for new day
             user_credits.credits_used_today = 0
             user_credits.last_reset_date = now
-            self.db.commit()
+            self._commit()
             
             # Log the reset transaction
             self._log_credit_transaction(
@@ -82,23 +89,48 @@ class CreditsService:
             "next_reset": self._get_next_reset_time()
         }
     
-    def spend_credit(self, user_id: str, quest_id: str, description: str = "Message sent") -> Dict[str, Any]:
-        """Spend a credit for sending a message"""
+    def get_available_credits(self, user_id: str, quest_id: str) -> Dict[str, Any]:
+        """Read-only version of can_send_message
+        
+        A missing credits row or one not yet reset today counts as a fresh daily
+        allowance; the row itself is created or reset when the credit is spent.
+        """
         user_credits = self.get_user_credits(user_id, quest_id)
         
         if not user_credits:
-            return {"success": False, "error": "No credits found for user"}
+            daily_credits, used_today = 1, 0
+        elif user_credits.last_reset_date.date() < datetime.utcnow().date():
+            daily_credits, used_today = user_credits.daily_credits, 0
+        else:
+            daily_credits, used_today = user_credits.daily_credits, user_credits.credits_used_today
         
-        # Reset credits if needed
+        available_credits = daily_credits - used_today
+        return {
+            "can_send": available_credits > 0,
+            "available_credits": available_credits,
+            "daily_credits": daily_credits,
+            "used_today": used_today,
+            "next_reset": self._get_next_reset_time()
+        }
+    
+    def spend_credit(self, user_id: str, quest_id: str, description: str = "Message sent") -> Dict[str, Any]:
+        """Spend a credit for sending a message"""
+        # Creates the credits row if missing and resets it on a new day
         user_credits = self.reset_daily_credits(user_id, quest_id)
         
-        # Check if user has credits
-        if user_credits.credits_used_today >= user_credits.daily_credits:
+        # Spend the credit only if one is left; concurrent sends cannot both take the last one
+        spent = self.db.query(UserCredits).filter(
+            UserCredits.credit_id == user_credits.credit_id,
+            UserCredits.credits_used_today < UserCredits.daily_credits
+        ).update({
+            UserCredits.credits_used_today: UserCredits.credits_used_today + 1
+        }, synchronize_session=False)
+        
+        if not spent:
             return {"success": False, "error": "No credits available"}
         
-        # Spend the credit
-        user_credits.credits_used_today += 1
-        self.db.commit()
+        self.db.refresh(user_credits)
+        self._commit()
         
         # Log the transaction
         self._log_credit_transaction(
@@ -184,7 +216,7 @@ class CreditsService:
             })
         )
         self.db.add(transaction)
-        self.db.commit()
+        self._commit()
     
     def _get_next_reset_time(self) -> str:
         """Get next credit reset time (UTC 00:00)"""
@@ -2,95 +2,171 @@ from sqlalchemy.orm import Session
 from app.models.global_leaderboard import GlobalLeaderboard, GlobalDailyBonus, DailyBonusConfig
 from app.models.participant import QuestParticipant
 from app.models.quest import Quest
+from app.models.user import User
 from app.models.wallet import UserWallet, WalletTransaction
-from sqlalchemy import func, desc, and_
+from app.services.leaderboard_cache import leaderboard_cache, GLOBAL_SCOPE
+from sqlalchemy import func, desc, and_, or_, case, update
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime, timedelta
 from typing import Dict, Any, List
 import logging
 
 logger = logging.getLogger(__name__)
 
+# user_id breaks ties so ranks are stable between refreshes
+GLOBAL_RANK_ORDER = (desc(GlobalLeaderboard.average_score), GlobalLeaderboard.user_id)
+
 class GlobalLeaderboardService:
     def __init__(self, db: Session):
         self.db = db
     
+    def apply_participant_change(self, user_id: str, score_delta: float = 0, quests_delta: int = 0):
+        """Add a participant's score change, join (+1) or leave (-1) to the user's global totals
+        
+        Runs in the caller's transaction and does not commit; ranks are refreshed
+        by update_global_leaderboard. A user without a row yet gets one built from
+        their quest_participants rows, which already include this change.
+        """
+        if not score_delta and not quests_delta:
+            return
+        leaderboard_cache.bump_after_commit(self.db, GLOBAL_SCOPE)
+        
+        total_score = GlobalLeaderboard.total_score + score_delta
+        quests_participated = GlobalLeaderboard.quests_participated + quests_delta
+        updated = self.db.query(GlobalLeaderboard).filter(GlobalLeaderboard.user_id == user_id).update({
+            GlobalLeaderboard.total_score: total_score,
+            GlobalLeaderboard.quests_participated: quests_participated,
+            # Right-hand sides read the old values, so this is the new average
+            GlobalLeaderboard.average_score: case(
+                (quests_participated > 0, total_score / quests_participated), else_=0.0
+            ),
+            GlobalLeaderboard.last_updated: datetime.utcnow()
+        }, synchronize_session=False)
+        if updated:
+            return
+        
+        self.db.flush()
+        totals = self.db.query(
+            func.coalesce(func.sum(QuestParticipant.score), 0),
+            func.count(QuestParticipant.quest_id)
+        ).filter(QuestParticipant.user_id == user_id).one()
+        username = self.db.query(User.username).filter(User.user_id == user_id).scalar()
+        try:
+            with self.db.begin_nested():
+                self.db.add(GlobalLeaderboard(
+                    user_id=user_id,
+                    username=username or user_id,
+                    total_score=totals[0],
+                    quests_participated=totals[1],
+                    average_score=totals[0] / totals[1] if totals[1] else 0.0,
+                    last_updated=datetime.utcnow(),
+                    rank=None
+                ))
+        except IntegrityError:
+            # Created by a concurrent request in the meantime; apply the change to it
+            self.apply_participant_change(user_id, score_delta, quests_delta)
+    
     def update_global_leaderboard(self) -> Dict[str, Any]:
-        """Update global leaderboard with all users' average scores"""
+        """Refresh global ranks; totals are kept current by apply_participant_change"""
+        try:
+            ranks_changed = self._update_global_ranks()
+            self.db.commit()
+            
+            logger.info(f"Updated global leaderboard ranks for {ranks_changed} users")
+            return {
+                "success": True,
+                "users_updated": ranks_changed,
+                "message": "Global leaderboard updated successfully"
+            }
+            
+        except Exception as e:
+            logger.error(f"Failed to update global leaderboard: {str(e)}")
+            self.db.rollback()
+            return {"success": False, "error": str(e)}
+    
+    def rebuild_global_leaderboard(self) -> Dict[str, Any]:
+        """Recompute every user's totals from quest_participants, then ranks (repair)"""
         try:
-            # Get all users with their quest participation data
             user_scores = self.db.query(
                 QuestParticipant.user_id,
-                QuestParticipant.username,
+                User.username,
                 func.sum(QuestParticipant.score).label('total_score'),
                 func.count(QuestParticipant.quest_id).label('quests_participated')
+            ).outerjoin(
+                User, User.user_id == QuestParticipant.user_id
             ).group_by(
-                QuestParticipant.user_id, QuestParticipant.username
+                QuestParticipant.user_id, User.username
             ).all()
             
-            # Clear existing global leaderboard
-            self.db.query(GlobalLeaderboard).delete()
-            
-            # Create new global leaderboard entries
-            global_entries = []
+            existing = {user_id for user_id, in self.db.query(GlobalLeaderboard.user_id)}
+            now = datetime.utcnow()
+            updates, inserts = [], []
             for user_data in user_scores:
-                average_score = user_data.total_score / user_data.quests_participated if user_data.quests_participated > 0 else 0
-                
-                global_entry = GlobalLeaderboard(
-                    user_id=user_data.user_id,
-                    username=user_data.username,
-                    total_score=user_data.total_score,
-                    quests_participated=user_data.quests_participated,
-                    average_score=average_score,
-                    last_updated=datetime.utcnow()
-                )
-                global_entries.append(global_entry)
-                self.db.add(global_entry)
+                total_score = user_data.total_score or 0
+                row = {
+                    "user_id": user_data.user_id,
+                    "username": user_data.username or user_data.user_id,
+                    "total_score": total_score,
+                    "quests_participated": user_data.quests_participated,
+                    "average_score": total_score / user_data.quests_participated if user_data.quests_participated > 0 else 0,
+                    "last_updated": now
+                }
+                (updates if user_data.user_id in existing else inserts).append(row)
             
-            self.db.commit()
+            self.db.bulk_update_mappings(GlobalLeaderboard, updates)
+            self.db.bulk_insert_mappings(GlobalLeaderboard, inserts)
+            
+            # Users who left every quest keep their row (daily bonuses reference it) with zero totals
+            self.db.query(GlobalLeaderboard).filter(
+                GlobalLeaderboard.user_id.notin_(self.db.query(QuestParticipant.user_id))
+            ).update({
+                GlobalLeaderboard.total_score: 0.0,
+                GlobalLeaderboard.quests_participated: 0,
+                GlobalLeaderboard.average_score: 0.0,
+                GlobalLeaderboard.last_updated: now
+            }, synchronize_session=False)
             
-            # Update ranks
             self._update_global_ranks()
+            leaderboard_cache.bump_after_commit(self.db, GLOBAL_SCOPE)
+            self.db.commit()
             
-            logger.info(f"Updated global leaderboard with {len(global_entries)} users")
+            logger.info(f"Rebuilt global leaderboard with {len(user_scores)} users")
             return {
                 "success": True,
-                "users_updated": len(global_entries),
-                "message": "Global leaderboard updated successfully"
+                "users_updated": len(user_scores),
+                "message": "Global leaderboard rebuilt successfully"
             }
             
         except Exception as e:
-            logger.error(f"Failed to update global leaderboard: {str(e)}")
+            logger.error(f"Failed to rebuild global leaderboard: {str(e)}")
             self.db.rollback()
             return {"success": False, "error": str(e)}
     
-    def _update_global_ranks(self):
-        """Update ranks for global leaderboard"""
-        try:
-            # Get all users ordered by average score
-            users = self.db.query(GlobalLeaderboard).order_by(
-                desc(GlobalLeaderboard.average_score)
-            ).all()
-            
-            # Update ranks
-            for rank, user in enumerate(users, 1):
-                user.rank = rank
-                self.db.commit()
-                
-        except Exception as e:
-            logger.error(f"Failed to update global ranks: {str(e)}")
-            self.db.rollback()
+    def _update_global_ranks(self) -> int:
+        """Set every rank from average_score with one UPDATE ... FROM; returns rows changed"""
+        ranked = self.db.query(
+            GlobalLeaderboard.user_id,
+            func.row_number().over(order_by=GLOBAL_RANK_ORDER).label("new_rank")
+        ).subquery()
+        
+        result = self.db.execute(
+            update(GlobalLeaderboard).where(
+                GlobalLeaderboard.user_id == ranked.c.user_id,
+                or_(GlobalLeaderboard.rank.is_(None), GlobalLeaderboard.rank != ranked.c.new_rank)
+            ).values(rank=ranked.c.new_rank).execution_options(synchronize_session=False)
+        )
+        return result.rowcount
     
     def get_global_leaderboard(self, limit: int = 10) -> List[Dict[str, Any]]:
         """Get global leaderboard"""
         try:
-            users = self.db.query(GlobalLeaderboard).order_by(
-                desc(GlobalLeaderboard.average_score)
-            ).limit(limit).all()
+            users = self.db.query(GlobalLeaderboard).order_by(*GLOBAL_RANK_ORDER).limit(limit).all()
             
             leaderboard = []
-            for user in users:
+            for rank, user in enumerate(users, 1):
                 leaderboard.append({
-                    "rank": user.rank,
+                    # Position in the live order; stored ranks refresh on update_global_leaderboard
+                    "rank": rank,
                     "user_id": user.user_id,
                     "username": user.username,
                     "average_score": round(user.average_score, 2),
@@ -116,6 +192,9 @@ class GlobalLeaderboardService:
             if not config:
                 return {"success": False, "error": "No active bonus configuration found"}
             
+            # Ranks may be stale between refreshes
+            self._update_global_ranks()
+            
             # Get top 3 users
             top_users = self.db.query(GlobalLeaderboard).filter(
                 GlobalLeaderboard.rank <= 3
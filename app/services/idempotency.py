@@ -0,0 +1,230 @@
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.exc import IntegrityError
+from app.core.config import settings
+from app.database import SessionLocal
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# How often a duplicate polls the idempotency_keys table for another worker's result
+POLL_INTERVAL_SECONDS = 0.2
+
+class IdempotencyStore:
+    """Replays the stored response for retried requests carrying an Idempotency-Key
+
+    Completed responses are kept for `ttl_seconds` (LRU in memory, optionally
+    the idempotency_keys table so every worker sees them). A duplicate that
+    arrives while the first request is still running waits up to
+    `wait_seconds` for its result instead of executing again. Failed requests
+    are not stored, so a retry after an error runs again.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        ttl_seconds: int = 86400,
+        wait_seconds: float = 60.0,
+        persistent: bool = False
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.wait_seconds = wait_seconds
+        self.persistent = persistent
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def build_key(scope: str, user_id: str, idempotency_key: str) -> str:
+        """Scope a client key to one endpoint and user"""
+        payload = json.dumps([scope, user_id, idempotency_key])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def fingerprint(request: Dict[str, Any]) -> str:
+        """Hash of the request body, to reject a key reused for a different request"""
+        payload = json.dumps(jsonable_encoder(request), sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def execute(self, key: str, fingerprint: str, handler: Callable[[], Awaitable[Any]]) -> Any:
+        """Run `handler` once per key and return its (possibly stored) response"""
+        stored = self._get_memory(key, fingerprint)
+        if stored is not None:
+            return stored
+
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            self._check_fingerprint(in_flight[0], fingerprint)
+            return await self._wait(in_flight[1])
+
+        if self.persistent:
+            stored = await self._claim_persistent(key, fingerprint)
+            if stored is not None:
+                self._store_memory(key, fingerprint, stored)
+                return stored
+
+        future = asyncio.get_running_loop().create_future()
+        # Mark the outcome retrieved even when no duplicate is waiting on it
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._in_flight[key] = (fingerprint, future)
+        try:
+            result = await handler()
+        except BaseException as e:
+            if self.persistent:
+                await asyncio.to_thread(self._release_persistent, key)
+            if isinstance(e, Exception):
+                future.set_exception(e)
+            else:
+                future.cancel()
+            raise
+        finally:
+            self._in_flight.pop(key, None)
+
+        response = jsonable_encoder(result)
+        self._store_memory(key, fingerprint, response)
+        if self.persistent:
+            await asyncio.to_thread(self._save_persistent, key, fingerprint, response)
+        future.set_result(response)
+        return result
+
+    async def _wait(self, future: asyncio.Future) -> Any:
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout=self.wait_seconds)
+        except asyncio.TimeoutError:
+            raise HTTPException(
+                status_code=409,
+                detail="A request with this Idempotency-Key is still being processed"
+            )
+
+    @staticmethod
+    def _check_fingerprint(stored: str, fingerprint: str):
+        if stored != fingerprint:
+            raise HTTPException(
+                status_code=422,
+                detail="Idempotency-Key was already used for a different request"
+            )
+
+    def _get_memory(self, key: str, fingerprint: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, stored_fingerprint, response = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+
+        self._check_fingerprint(stored_fingerprint, fingerprint)
+        return response
+
+    def _store_memory(self, key: str, fingerprint: str, response: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, fingerprint, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def _claim_persistent(self, key: str, fingerprint: str) -> Optional[Any]:
+        """Claim the key in the table, or wait for the worker that holds it
+
+        Returns the stored response when the key was already completed, None
+        once this worker owns the key.
+        """
+        deadline = time.monotonic() + self.wait_seconds
+        while True:
+            status, stored_fingerprint, response = await asyncio.to_thread(self._try_claim, key, fingerprint)
+            if status == "claimed":
+                return None
+
+            self._check_fingerprint(stored_fingerprint, fingerprint)
+            if status == "completed":
+                return response
+            if time.monotonic() >= deadline:
+                raise HTTPException(
+                    status_code=409,
+                    detail="A request with this Idempotency-Key is still being processed"
+                )
+            await asyncio.sleep(POLL_INTERVAL_SECONDS)
+
+    def _try_claim(self, key: str, fingerprint: str) -> tuple:
+        from app.models.idempotency_key import IdempotencyKey
+
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            entry = db.query(IdempotencyKey).filter(IdempotencyKey.key == key).first()
+            if entry is not None and entry.expires_at > now:
+                return entry.status, entry.fingerprint, entry.response
+
+            if entry is not None:
+                # Expired result, or a claim whose worker died: take it over
+                db.delete(entry)
+                db.flush()
+            db.add(IdempotencyKey(
+                key=key,
+                fingerprint=fingerprint,
+                status="in_progress",
+                created_at=now,
+                expires_at=now + timedelta(seconds=self.wait_seconds)  # claim lease
+            ))
+            db.commit()
+            return "claimed", fingerprint, None
+        except IntegrityError:
+            # Another worker claimed it first; report in progress and poll again
+            db.rollback()
+            return "in_progress", fingerprint, None
+        finally:
+            db.close()
+
+    def _save_persistent(self, key: str, fingerprint: str, response: Any):
+        from app.models.idempotency_key import IdempotencyKey
+
+        db = SessionLocal()
+        try:
+            db.merge(IdempotencyKey(
+                key=key,
+                fingerprint=fingerprint,
+                status="completed",
+                response=response,
+                created_at=datetime.utcnow(),
+                expires_at=datetime.utcnow() + timedelta(seconds=self.ttl_seconds)
+            ))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Failed to store idempotent response: {e}")
+        finally:
+            db.close()
+
+    def _release_persistent(self, key: str):
+        from app.models.idempotency_key import IdempotencyKey
+
+        db = SessionLocal()
+        try:
+            db.query(IdempotencyKey).filter(
+                IdempotencyKey.key == key,
+                IdempotencyKey.status == "in_progress"
+            ).delete()
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Failed to release idempotency key: {e}")
+        finally:
+            db.close()
+
+idempotency_store = IdempotencyStore(
+    max_entries=settings.IDEMPOTENCY_MAX_ENTRIES,
+    ttl_seconds=settings.IDEMPOTENCY_TTL_SECONDS,
+    wait_seconds=settings.IDEMPOTENCY_WAIT_SECONDS,
+    persistent=settings.IDEMPOTENCY_PERSISTENT
+)
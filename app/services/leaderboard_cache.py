@@ -0,0 +1,152 @@
+from app.core.config import settings
+from app.database import call_after_commit
+from collections import OrderedDict
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import Session
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import hashlib
+import json
+import threading
+import time
+
+GLOBAL_SCOPE = ("global",)
+
+def quest_scope(quest_id: str) -> tuple:
+    return ("quest", quest_id)
+
+class LeaderboardCache:
+    """Per-process cache of serialized leaderboard responses
+
+    Every scope (a quest, or the global leaderboard) has a version counter that
+    is bumped after a transaction changing its scores commits. Bodies are cached
+    under (scope, key, version), so a bump makes all of the scope's entries
+    unreachable without scanning them. Other workers' commits do not bump this
+    process's counters, which is what the TTL bounds. ETags hash the body, so a
+    304 is only ever sent for identical content, whichever worker built it.
+    """
+
+    def __init__(self, enabled: bool = True, ttl_seconds: float = 2.0, max_entries: int = 1000):
+        self.enabled = enabled
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self._versions = {}
+        self._entries = OrderedDict()  # (scope, key, version) -> (expires_at, etag, body)
+        self._lock = threading.Lock()
+
+    def version(self, scope: tuple) -> int:
+        with self._lock:
+            return self._versions.get(scope, 0)
+
+    def bump(self, scope: tuple):
+        """Invalidate every cached response of a scope"""
+        with self._lock:
+            self._versions[scope] = self._versions.get(scope, 0) + 1
+
+    def bump_after_commit(self, db: Session, scope: tuple):
+        """Bump the scope's version once `db` commits its changes"""
+        call_after_commit(db, lambda: self.bump(scope))
+
+    def get(self, scope: tuple, key: tuple) -> Optional[Tuple[str, bytes]]:
+        """(etag, body) cached for the scope's current version, if still fresh"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            cache_key = (scope, key, self._versions.get(scope, 0))
+            entry = self._entries.get(cache_key)
+            if entry is None:
+                return None
+            expires_at, etag, body = entry
+            if expires_at <= time.monotonic():
+                del self._entries[cache_key]
+                return None
+            self._entries.move_to_end(cache_key)
+            return etag, body
+
+    def set(self, scope: tuple, key: tuple, version: int, etag: str, body: bytes):
+        """Store a body built while the scope was at `version`"""
+        if not self.enabled:
+            return
+        with self._lock:
+            if self._versions.get(scope, 0) != version:
+                # Bumped while the body was being built; it may already be stale
+                return
+            cache_key = (scope, key, version)
+            self._entries[cache_key] = (time.monotonic() + self.ttl_seconds, etag, body)
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    @staticmethod
+    def serialize(payload: Any) -> Tuple[str, bytes]:
+        """JSON body encoded like FastAPI's JSONResponse, and its ETag"""
+        body = json.dumps(
+            jsonable_encoder(payload),
+            ensure_ascii=False,
+            allow_nan=False,
+            indent=None,
+            separators=(",", ":")
+        ).encode("utf-8")
+        return f'"{hashlib.sha256(body).hexdigest()[:32]}"', body
+
+    @staticmethod
+    def _etag_matches(request: Request, etag: str) -> bool:
+        header = request.headers.get("if-none-match")
+        if not header:
+            return False
+        for candidate in header.split(","):
+            candidate = candidate.strip()
+            if candidate == "*" or candidate.removeprefix("W/") == etag:
+                return True
+        return False
+
+    async def respond(
+        self,
+        request: Request,
+        scope: tuple,
+        key: tuple,
+        build: Callable[[], Awaitable[Any]]
+    ) -> Response:
+        """Cached response for (scope, key), built with `build()` on a miss; 304 for a matching If-None-Match"""
+        cached = self.get(scope, key)
+        if cached is not None:
+            self.hits += 1
+            etag, body = cached
+        else:
+            self.misses += 1
+            version = self.version(scope)
+            etag, body = self.serialize(await build())
+            self.set(scope, key, version, etag, body)
+
+        # Clients may keep the body but must revalidate it on every poll
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if self._etag_matches(request, etag):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = len(self._entries)
+            scopes = len(self._versions)
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "versioned_scopes": scopes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "not_modified": self.not_modified
+        }
+
+leaderboard_cache = LeaderboardCache(
+    enabled=settings.LEADERBOARD_CACHE_ENABLED,
+    ttl_seconds=settings.LEADERBOARD_CACHE_TTL_SECONDS,
+    max_entries=settings.LEADERBOARD_CACHE_MAX_ENTRIES
+)
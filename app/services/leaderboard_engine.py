@@ -0,0 +1,501 @@
+from app.core.config import settings
+from app.database import SessionLocal, call_after_commit
+from bisect import bisect_left, insort
+from datetime import datetime
+from sqlalchemy.orm import Session
+from typing import Any, Dict, List, Optional
+import asyncio
+import logging
+import sys
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+class SortedKeyList:
+    """Sorted list of unique keys with O(log n) insert, remove and position lookups
+
+    Keys live in sublists of at most 2 * LOAD items; a Fenwick tree over the
+    sublist lengths turns "position of key" and "key at position" into
+    logarithmic operations.
+    """
+
+    LOAD = 256
+
+    def __init__(self, keys: List[tuple] = ()):
+        keys = sorted(keys)
+        self._lists = [keys[i:i + self.LOAD] for i in range(0, len(keys), self.LOAD)]
+        self._maxes = [sublist[-1] for sublist in self._lists]
+        self._len = len(keys)
+        self._rebuild_tree()
+
+    def __len__(self) -> int:
+        return self._len
+
+    def add(self, key: tuple):
+        if not self._lists:
+            self._lists = [[key]]
+            self._maxes = [key]
+            self._len = 1
+            self._rebuild_tree()
+            return
+
+        i = bisect_left(self._maxes, key)
+        if i == len(self._maxes):
+            i -= 1
+            self._lists[i].append(key)
+            self._maxes[i] = key
+        else:
+            insort(self._lists[i], key)
+        self._len += 1
+
+        sublist = self._lists[i]
+        if len(sublist) > 2 * self.LOAD:
+            self._lists[i:i + 1] = [sublist[:self.LOAD], sublist[self.LOAD:]]
+            self._maxes[i:i + 1] = [sublist[self.LOAD - 1], sublist[-1]]
+            self._rebuild_tree()
+        else:
+            self._tree_add(i, 1)
+
+    def remove(self, key: tuple):
+        i = bisect_left(self._maxes, key)
+        sublist = self._lists[i]
+        del sublist[bisect_left(sublist, key)]
+        self._len -= 1
+
+        if sublist:
+            self._maxes[i] = sublist[-1]
+            self._tree_add(i, -1)
+        else:
+            del self._lists[i]
+            del self._maxes[i]
+            self._rebuild_tree()
+
+    def index(self, key: tuple) -> int:
+        """Number of keys before `key`"""
+        i = bisect_left(self._maxes, key)
+        if i == len(self._maxes):
+            return self._len
+        return self._prefix(i) + bisect_left(self._lists[i], key)
+
+    def islice(self, start: int, stop: int):
+        """Keys at positions start..stop-1"""
+        start, stop = max(start, 0), min(stop, self._len)
+        if start >= stop:
+            return
+        i, offset = self._locate(start)
+        remaining = stop - start
+        while remaining > 0:
+            chunk = self._lists[i][offset:offset + remaining]
+            yield from chunk
+            remaining -= len(chunk)
+            i, offset = i + 1, 0
+
+    def __iter__(self):
+        for sublist in self._lists:
+            yield from sublist
+
+    def memory_bytes(self) -> int:
+        return (
+            sys.getsizeof(self._lists) + sys.getsizeof(self._maxes) + sys.getsizeof(self._tree)
+            + sum(sys.getsizeof(sublist) for sublist in self._lists)
+        )
+
+    def _rebuild_tree(self):
+        tree = [0] * (len(self._lists) + 1)
+        for i, sublist in enumerate(self._lists, 1):
+            tree[i] += len(sublist)
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def _tree_add(self, i: int, delta: int):
+        i += 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def _prefix(self, i: int) -> int:
+        """Total length of the first i sublists"""
+        total = 0
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def _locate(self, position: int) -> tuple:
+        """(sublist index, offset) of the key at `position`"""
+        i = 0
+        step = 1 << (len(self._tree).bit_length() - 1)
+        while step:
+            candidate = i + step
+            if candidate < len(self._tree) and self._tree[candidate] <= position:
+                i = candidate
+                position -= self._tree[candidate]
+            step >>= 1
+        return i, position
+
+class QuestRanking:
+    """Ranked players of one quest: score high to low, then earlier last_reply_at"""
+
+    def __init__(self, quest_id: str, rows: List[tuple]):
+        self.quest_id = quest_id
+        self.loaded_at = time.time()
+        self._entries = {}
+        for user_id, score, last_reply_at, total_messages in rows:
+            self._entries[user_id] = (score or 0, last_reply_at, total_messages or 0)
+        self._keys = SortedKeyList([self._key(user_id, entry) for user_id, entry in self._entries.items()])
+        self._dirty = set()
+
+    @staticmethod
+    def _key(user_id: str, entry: tuple) -> tuple:
+        score, last_reply_at, _ = entry
+        return (-score, last_reply_at, user_id)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def update(self, user_id: str, score: int, last_reply_at: datetime, total_messages: int):
+        old = self._entries.get(user_id)
+        if old is not None:
+            self._keys.remove(self._key(user_id, old))
+        entry = (score or 0, last_reply_at, total_messages or 0)
+        self._entries[user_id] = entry
+        self._keys.add(self._key(user_id, entry))
+        self._dirty.add(user_id)
+
+    def remove(self, user_id: str):
+        """Drop a player who left the quest (their row is deleted in the same transaction)"""
+        old = self._entries.pop(user_id, None)
+        if old is not None:
+            self._keys.remove(self._key(user_id, old))
+        self._dirty.discard(user_id)
+
+    def apply(self, user_id: str, score: Optional[int], last_reply_at: datetime, total_messages: int):
+        """An update staged by LeaderboardEngine; a None score is a removal"""
+        if score is None:
+            self.remove(user_id)
+        else:
+            self.update(user_id, score, last_reply_at, total_messages)
+
+    def rank(self, user_id: str) -> Optional[int]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        return self._keys.index(self._key(user_id, entry)) + 1
+
+    def entries(self, start: int, stop: int) -> List[Dict[str, Any]]:
+        """Leaderboard entries for ranks start+1..stop"""
+        start = max(start, 0)
+        result = []
+        for position, key in enumerate(self._keys.islice(start, stop), start + 1):
+            user_id = key[2]
+            score, last_reply_at, total_messages = self._entries[user_id]
+            result.append({
+                "rank": position,
+                "user_id": user_id,
+                "score": score,
+                "last_reply_at": last_reply_at,
+                "total_messages": total_messages
+            })
+        return result
+
+    def max_score(self) -> int:
+        top = next(self._keys.islice(0, 1), None)
+        return -top[0] if top else 0
+
+    def snapshot_changes(self) -> List[Dict[str, Any]]:
+        """Entries whose row in the leaderboards table is out of date
+
+        Only the changed players' rows are written; ranks are not stored (SQL
+        reads rank by the score order), so moving past others rewrites nothing.
+        """
+        changes = []
+        for user_id in self._dirty:
+            score, last_reply_at, total_messages = self._entries[user_id]
+            changes.append({
+                "user_id": user_id,
+                "score": score,
+                "last_reply_at": last_reply_at,
+                "total_messages": total_messages
+            })
+        return changes
+
+    def mark_loaded(self, stored: Dict[str, tuple]):
+        """Compare with the leaderboards table rows ((score, last_reply_at, total_messages) per user)"""
+        self._dirty = {
+            user_id for user_id, entry in self._entries.items()
+            if stored.get(user_id) != entry
+        }
+
+    @property
+    def unsaved_changes(self) -> int:
+        return len(self._dirty)
+
+    def mark_snapshotted(self, changes: List[Dict[str, Any]]):
+        for change in changes:
+            entry = self._entries.get(change["user_id"])
+            if entry == (change["score"], change["last_reply_at"], change["total_messages"]):
+                # Not updated again while the snapshot was being written
+                self._dirty.discard(change["user_id"])
+
+    def memory_bytes(self) -> int:
+        """Approximate memory held by this quest's ranking"""
+        total = sys.getsizeof(self._entries) + self._keys.memory_bytes()
+        for user_id, entry in self._entries.items():
+            total += sys.getsizeof(user_id) + sys.getsizeof(entry) + sys.getsizeof(entry[1])
+            total += sys.getsizeof((0, None, None))  # sort key tuple
+        return total
+
+class LeaderboardEngine:
+    """In-process order-statistic leaderboards, loaded lazily per quest
+
+    Rank, top-N and status reads are answered from memory in O(log n).
+    Score changes are applied after their transaction commits and written
+    to the leaderboards table every `snapshot_seconds`. State is per
+    process: enable it only when a single worker serves the API.
+    """
+
+    def __init__(self, snapshot_seconds: float = 5.0, max_quests: int = 100):
+        self.snapshot_seconds = snapshot_seconds
+        self.max_quests = max_quests
+        self.loads = 0
+        self.snapshots = 0
+        self.rows_written = 0
+        self._rankings = {}
+        self._loading = {}  # quest_id -> updates committed while the quest was loading
+        self._lock = threading.Lock()
+
+    def stage(self, db: Session, quest_id: str, participants: List[Any]):
+        """Apply the participants' scores once `db` commits"""
+        updates = [
+            (
+                quest_id,
+                participant.user_id,
+                participant.score or 0,
+                participant.last_reply_at,
+                participant.message_count or 0
+            )
+            for participant in participants
+        ]
+        call_after_commit(db, lambda: self.apply(updates))
+
+    def stage_removal(self, db: Session, quest_id: str, user_id: str):
+        """Drop a player who left the quest once `db` commits"""
+        call_after_commit(db, lambda: self.apply([(quest_id, user_id, None, None, None)]))
+
+    def stage_reload(self, db: Session, quest_id: str):
+        """Drop the quest's ranking once `db` commits (after a rebuild)"""
+        call_after_commit(db, lambda: self.apply([(quest_id, None, None, None, None)]))
+
+    def apply(self, updates: List[tuple]):
+        with self._lock:
+            for quest_id, user_id, score, last_reply_at, total_messages in updates:
+                if user_id is None:
+                    self._rankings.pop(quest_id, None)
+                    continue
+                if quest_id in self._loading:
+                    self._loading[quest_id].append((user_id, score, last_reply_at, total_messages))
+                    continue
+                ranking = self._rankings.get(quest_id)
+                if ranking is not None:
+                    # Quests not loaded yet pick the change up from the database
+                    ranking.apply(user_id, score, last_reply_at, total_messages)
+
+    def top(self, quest_id: str, limit: int) -> List[Dict[str, Any]]:
+        """Entries for ranks 1..limit"""
+        ranking = self._get_ranking(quest_id)
+        with self._lock:
+            return ranking.entries(0, limit)
+
+    def rank(self, quest_id: str, user_id: str) -> Optional[int]:
+        """A player's rank, None before their first scored reply"""
+        ranking = self._get_ranking(quest_id)
+        with self._lock:
+            return ranking.rank(user_id)
+
+    def around(self, quest_id: str, user_id: str, window: int) -> Optional[tuple]:
+        """(rank, entries within `window` ranks of the player), None if unranked"""
+        ranking = self._get_ranking(quest_id)
+        with self._lock:
+            rank = ranking.rank(user_id)
+            if rank is None:
+                return None
+            return rank, ranking.entries(rank - 1 - window, rank + window)
+
+    def summary(self, quest_id: str) -> Dict[str, int]:
+        """Ranked player count and top score"""
+        ranking = self._get_ranking(quest_id)
+        with self._lock:
+            return {"ranked_count": len(ranking), "max_score": ranking.max_score()}
+
+    def _get_ranking(self, quest_id: str) -> QuestRanking:
+        """The quest's ranking, loaded from committed quest_participants rows on first use"""
+        with self._lock:
+            ranking = self._rankings.get(quest_id)
+            if ranking is not None:
+                return ranking
+            self._loading.setdefault(quest_id, [])
+
+        try:
+            rows, stored = self._load_rows(quest_id)
+            ranking = QuestRanking(quest_id, rows)
+        except Exception:
+            with self._lock:
+                self._loading.pop(quest_id, None)
+            raise
+
+        with self._lock:
+            pending = self._loading.pop(quest_id, [])
+            if quest_id in self._rankings:
+                # Another request finished loading first; pending updates went to it
+                return self._rankings[quest_id]
+            ranking.mark_loaded(stored)
+            for update in pending:
+                ranking.apply(*update)
+            self._rankings[quest_id] = ranking
+            self.loads += 1
+            self._evict()
+            return ranking
+
+    def _load_rows(self, quest_id: str) -> tuple:
+        # Own primary session: never the caller's uncommitted transaction or a lagging replica
+        db = SessionLocal()
+        try:
+            return self._query_rows(db, quest_id)
+        finally:
+            db.close()
+
+    def _query_rows(self, db: Session, quest_id: str) -> tuple:
+        from app.models.leaderboard import Leaderboard
+        from app.models.participant import QuestParticipant
+
+        stored = {
+            row.user_id: (row.score, row.last_reply_at, row.total_messages)
+            for row in db.query(
+                Leaderboard.user_id,
+                Leaderboard.score,
+                Leaderboard.last_reply_at,
+                Leaderboard.total_messages
+            ).filter(Leaderboard.quest_id == quest_id)
+        }
+        rows = db.query(
+            QuestParticipant.user_id,
+            QuestParticipant.score,
+            QuestParticipant.last_reply_at,
+            QuestParticipant.message_count
+        ).filter(
+            QuestParticipant.quest_id == quest_id,
+            QuestParticipant.last_reply_at.isnot(None)
+        ).all()
+        return rows, stored
+
+    def _evict(self):
+        # Least recently loaded quests without unsaved changes go first
+        while len(self._rankings) > self.max_quests:
+            candidates = [q for q, r in self._rankings.items() if not r.unsaved_changes]
+            if not candidates:
+                break
+            oldest = min(candidates, key=lambda q: self._rankings[q].loaded_at)
+            del self._rankings[oldest]
+
+    def snapshot(self) -> int:
+        """Write changed entries of every quest to the leaderboards table"""
+        with self._lock:
+            work = [(quest_id, ranking, ranking.snapshot_changes()) for quest_id, ranking in self._rankings.items()]
+        work = [item for item in work if item[2]]
+        if not work:
+            return 0
+
+        written = 0
+        for quest_id, ranking, changes in work:
+            try:
+                self._write_snapshot(quest_id, changes)
+            except Exception as e:
+                logger.error(f"Failed to snapshot leaderboard for quest {quest_id}: {e}")
+                continue
+            with self._lock:
+                ranking.mark_snapshotted(changes)
+            written += len(changes)
+
+        self.snapshots += 1
+        self.rows_written += written
+        return written
+
+    def _write_snapshot(self, quest_id: str, changes: List[Dict[str, Any]]):
+        from app.models.leaderboard import Leaderboard
+        from app.models.participant import QuestParticipant
+
+        db = SessionLocal()
+        try:
+            existing = {}
+            user_ids = [change["user_id"] for change in changes]
+            for offset in range(0, len(user_ids), 500):
+                existing.update(db.query(Leaderboard.user_id, Leaderboard.leaderboard_id).filter(
+                    Leaderboard.quest_id == quest_id,
+                    Leaderboard.user_id.in_(user_ids[offset:offset + 500])
+                ).all())
+
+            now = datetime.now()
+            updates, inserts = [], []
+            for change in changes:
+                row = dict(change, quest_id=quest_id, updated_at=now)
+                if change["user_id"] in existing:
+                    updates.append(dict(row, leaderboard_id=existing[change["user_id"]]))
+                else:
+                    inserts.append(dict(row, leaderboard_id=str(uuid.uuid4())))
+            if inserts:
+                # A player who left after this snapshot was taken must not get their row back
+                remaining = {user_id for user_id, in db.query(QuestParticipant.user_id).filter(
+                    QuestParticipant.quest_id == quest_id,
+                    QuestParticipant.user_id.in_([row["user_id"] for row in inserts])
+                )}
+                inserts = [row for row in inserts if row["user_id"] in remaining]
+            db.bulk_update_mappings(Leaderboard, updates)
+            db.bulk_insert_mappings(Leaderboard, inserts)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    async def run_snapshots(self):
+        """Background task: snapshot every `snapshot_seconds` until cancelled"""
+        while True:
+            await asyncio.sleep(self.snapshot_seconds)
+            try:
+                await asyncio.to_thread(self.snapshot)
+            except Exception as e:
+                logger.error(f"Leaderboard snapshot failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Loaded quests with their size and approximate memory use"""
+        with self._lock:
+            quests = {
+                quest_id: {
+                    "entries": len(ranking),
+                    "unsaved_changes": ranking.unsaved_changes,
+                    "memory_bytes": ranking.memory_bytes(),
+                    "loaded_at": datetime.fromtimestamp(ranking.loaded_at).isoformat()
+                }
+                for quest_id, ranking in self._rankings.items()
+            }
+        return {
+            "enabled": settings.LEADERBOARD_ENGINE_ENABLED,
+            "quests_loaded": len(quests),
+            "max_quests": self.max_quests,
+            "memory_bytes": sum(quest["memory_bytes"] for quest in quests.values()),
+            "loads": self.loads,
+            "snapshots": self.snapshots,
+            "rows_written": self.rows_written,
+            "snapshot_seconds": self.snapshot_seconds,
+            "quests": quests
+        }
+
+leaderboard_engine = LeaderboardEngine(
+    snapshot_seconds=settings.LEADERBOARD_SNAPSHOT_SECONDS,
+    max_quests=settings.LEADERBOARD_ENGINE_MAX_QUESTS
+)
@@ -4,21 +4,48 @@ from app.models.participant import QuestParticipant
 from app.models.leaderboard import Leaderboard
 from app.models.pool import QuestPool
 from app.models.reward import QuestReward
-from sqlalchemy import func, desc
+from app.core.config import settings
+from app.services.leaderboard_cache import leaderboard_cache, quest_scope
+from app.services.leaderboard_engine import leaderboard_engine
+from sqlalchemy import func, desc, and_, or_, update
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+from contextlib import nullcontext
 import logging
+import uuid
 
 logger = logging.getLogger(__name__)
 
+# Matches ix_leaderboards_quest_score_reply; user_id makes ties deterministic
+RANK_ORDER = (desc(Leaderboard.score), Leaderboard.last_reply_at, Leaderboard.user_id)
+
 class LeaderboardService:
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, autocommit: bool = True):
+        # autocommit=False leaves the commit to the caller's unit of work
         self.db = db
+        self.autocommit = autocommit
+    
+    def _commit(self):
+        if self.autocommit:
+            self.db.commit()
+    
+    def _rollback(self):
+        if self.autocommit:
+            self.db.rollback()
     
-    def update_leaderboard(self, quest_id: str) -> Dict[str, Any]:
-        """Update leaderboard for a quest and check for 100% completion"""
+    def _savepoint(self):
+        """Savepoint so a failed best-effort step doesn't abort the caller's transaction"""
+        return nullcontext() if self.autocommit else self.db.begin_nested()
+    
+    def update_leaderboard(self, quest_id: str, user_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Update leaderboard for a quest and check for 100% completion
+        
+        With `user_ids` only those players' entries are written (ranks are
+        computed on read, so nobody else's row changes); without it the quest's
+        leaderboard is rebuilt. No quest-wide lock is taken except to end the quest.
+        """
         try:
-            # Get quest
             quest = self.db.query(Quest).filter(Quest.quest_id == quest_id).first()
             if not quest:
                 return {"success": False, "error": "Quest not found"}
@@ -27,37 +54,49 @@ class LeaderboardService:
             if quest.status == QuestStatus.ENDED:
                 return {"success": True, "message": "Quest already ended", "quest_ended": True}
             
-            # Get all participants with their scores
-            participants = self.db.query(QuestParticipant).filter(
-                QuestParticipant.quest_id == quest_id
-            ).order_by(desc(QuestParticipant.score), QuestParticipant.last_reply_at).all()
+            if user_ids is None:
+                updated = self.rebuild_leaderboard(quest_id)
+            else:
+                updated = self._update_leaderboard_entries(quest_id, user_ids)
+            
+            if updated is None:
+                return {"success": False, "error": "Failed to update leaderboard entries"}
             
-            if not participants:
+            if not updated:
                 return {"success": True, "message": "No participants found"}
             
-            # Check for 100% completion
-            max_score = max(p.score for p in participants) if participants else 0
+            # Check for 100% completion; scores only grow, so the changed entries decide
+            max_score = max(participant.score or 0 for participant in updated)
             quest_ended = max_score >= 100
             
             if quest_ended:
-                # End the quest
-                quest.status = QuestStatus.ENDED
-                quest.end_date = datetime.now()
-                self.db.commit()
+                # End the quest; only the transaction that flips the status pays out
+                ended = self.db.execute(
+                    update(Quest).where(
+                        Quest.quest_id == quest_id,
+                        Quest.status != QuestStatus.ENDED
+                    ).values(status=QuestStatus.ENDED, end_date=datetime.now()).execution_options(
+                        synchronize_session="fetch"
+                    )
+                ).rowcount
+                if not ended:
+                    return {"success": True, "message": "Quest already ended", "quest_ended": True}
+                leaderboard_cache.bump_after_commit(self.db, quest_scope(quest_id))
+                self._commit()
                 
                 # Process rewards for final leaderboard
+                participants = self.db.query(QuestParticipant).filter(
+                    QuestParticipant.quest_id == quest_id
+                ).order_by(desc(QuestParticipant.score), QuestParticipant.last_reply_at).all()
                 self._process_final_rewards(quest_id, participants)
                 
                 logger.info(f"Quest {quest_id} ended due to 100% completion by user with score {max_score}")
             
-            # Update leaderboard
-            self._update_leaderboard_entries(quest_id, participants)
-            
             return {
                 "success": True,
                 "quest_ended": quest_ended,
                 "max_score": max_score,
-                "participant_count": len(participants),
+                "participant_count": len(updated),
                 "leaderboard_updated": True
             }
             
@@ -67,102 +106,291 @@ class LeaderboardService:
     
     def get_leaderboard(self, quest_id: str, limit: int = 10) -> List[Dict[str, Any]]:
         """Get current leaderboard for a quest"""
+        from app.models.user import User
+        
         try:
-            # Get leaderboard entries
-            leaderboard_entries = self.db.query(Leaderboard).filter(
-                Leaderboard.quest_id == quest_id
-            ).order_by(desc(Leaderboard.score), Leaderboard.rank).limit(limit).all()
+            if settings.LEADERBOARD_ENGINE_ENABLED:
+                return self._with_usernames(leaderboard_engine.top(quest_id, limit))
             
-            leaderboard = []
-            for entry in leaderboard_entries:
-                leaderboard.append({
-                    "rank": entry.rank,
-                    "user_id": entry.user_id,
-                    "score": entry.score,
-                    "username": entry.username,
-                    "last_reply_at": entry.last_reply_at.isoformat() if entry.last_reply_at else None,
-                    "total_messages": entry.total_messages
-                })
+            # Get leaderboard entries in index order
+            leaderboard_entries = self.db.query(Leaderboard, User.username).outerjoin(
+                User, User.user_id == Leaderboard.user_id
+            ).filter(
+                Leaderboard.quest_id == quest_id
+            ).order_by(*RANK_ORDER).limit(limit).all()
             
-            return leaderboard
+            # Ranks are positions in the score order, not stored values
+            return [
+                self._entry_dict(entry, rank, username)
+                for rank, (entry, username) in enumerate(leaderboard_entries, 1)
+            ]
             
         except Exception as e:
             logger.error(f"Failed to get leaderboard: {str(e)}")
             return []
     
-    def _update_leaderboard_entries(self, quest_id: str, participants: List[QuestParticipant]):
-        """Update leaderboard entries based on current participant scores"""
+    def get_leaderboard_around(self, quest_id: str, user_id: str, window: int = 5) -> Optional[Dict[str, Any]]:
+        """A player's rank with up to `window` entries above and below
+        
+        Uses a count of the entries ahead plus two keyset scans on the rank-order
+        index, so the cost depends on `window`, not on the player's rank.
+        Returns None when the player has no entry yet.
+        """
+        if settings.LEADERBOARD_ENGINE_ENABLED:
+            around = leaderboard_engine.around(quest_id, user_id, window)
+            if around is None:
+                return None
+            rank, entries = around
+            return {"rank": rank, "leaderboard": self._with_usernames(entries)}
+        
+        from app.models.user import User
+        
+        entry = self.db.query(Leaderboard).filter(
+            Leaderboard.quest_id == quest_id,
+            Leaderboard.user_id == user_id
+        ).first()
+        if entry is None:
+            return None
+        
+        score = entry.score or 0
+        rank = self._count_ahead(quest_id, user_id, score, entry.last_reply_at) + 1
+        
+        same_score = Leaderboard.score == score
+        ahead = or_(
+            Leaderboard.score > score,
+            and_(same_score, Leaderboard.last_reply_at < entry.last_reply_at),
+            and_(same_score, Leaderboard.last_reply_at == entry.last_reply_at, Leaderboard.user_id < user_id)
+        )
+        behind = or_(
+            Leaderboard.score < score,
+            and_(same_score, Leaderboard.last_reply_at > entry.last_reply_at),
+            and_(same_score, Leaderboard.last_reply_at == entry.last_reply_at, Leaderboard.user_id > user_id)
+        )
+        window_query = self.db.query(Leaderboard, User.username).outerjoin(
+            User, User.user_id == Leaderboard.user_id
+        ).filter(Leaderboard.quest_id == quest_id)
+        
+        # Nearest entries ahead: the rank order scanned backwards
+        above = window_query.filter(ahead).order_by(
+            Leaderboard.score, desc(Leaderboard.last_reply_at), desc(Leaderboard.user_id)
+        ).limit(window).all()
+        below = window_query.filter(behind).order_by(*RANK_ORDER).limit(window).all()
+        username = self.db.query(User.username).filter(User.user_id == user_id).scalar()
+        
+        leaderboard = [
+            self._entry_dict(row, rank - offset, row_username)
+            for offset, (row, row_username) in reversed(list(enumerate(above, 1)))
+        ]
+        leaderboard.append(self._entry_dict(entry, rank, username))
+        leaderboard.extend(
+            self._entry_dict(row, rank + offset, row_username)
+            for offset, (row, row_username) in enumerate(below, 1)
+        )
+        return {"rank": rank, "leaderboard": leaderboard}
+    
+    @staticmethod
+    def _entry_dict(entry: Leaderboard, rank: int, username: Optional[str]) -> Dict[str, Any]:
+        return {
+            "rank": rank,
+            "user_id": entry.user_id,
+            "score": entry.score,
+            "username": username,
+            "last_reply_at": entry.last_reply_at.isoformat() if entry.last_reply_at else None,
+            "total_messages": entry.total_messages
+        }
+    
+    def _with_usernames(self, entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Fill in usernames for entries served from the in-memory engine"""
+        from app.models.user import User
+        
+        usernames = dict(self.db.query(User.user_id, User.username).filter(
+            User.user_id.in_([entry["user_id"] for entry in entries])
+        ).all()) if entries else {}
+        for entry in entries:
+            entry["username"] = usernames.get(entry["user_id"])
+            entry["last_reply_at"] = entry["last_reply_at"].isoformat() if entry["last_reply_at"] else None
+        return entries
+    
+    def _update_leaderboard_entries(self, quest_id: str, user_ids: List[str]) -> Optional[List[QuestParticipant]]:
+        """Copy the given players' scores into their entries (one row write each)"""
         try:
-            # Clear existing leaderboard entries
-            self.db.query(Leaderboard).filter(Leaderboard.quest_id == quest_id).delete()
+            with self._savepoint():
+                participants = self.db.query(QuestParticipant).filter(
+                    QuestParticipant.quest_id == quest_id,
+                    QuestParticipant.user_id.in_(set(user_ids)),
+                    QuestParticipant.last_reply_at.isnot(None)
+                ).all()
+                
+                if settings.LEADERBOARD_ENGINE_ENABLED:
+                    # Ranked in memory after commit; rows are written by the snapshot task
+                    leaderboard_engine.stage(self.db, quest_id, participants)
+                else:
+                    for participant in participants:
+                        self._upsert_entry(quest_id, participant)
+                if participants:
+                    leaderboard_cache.bump_after_commit(self.db, quest_scope(quest_id))
+            
+            self._commit()
+            return participants
             
-            # Create new leaderboard entries
-            for rank, participant in enumerate(participants, 1):
-                leaderboard_entry = Leaderboard(
+        except Exception as e:
+            logger.error(f"Failed to update leaderboard entries: {str(e)}")
+            self._rollback()
+            return None
+    
+    def remove_participant(self, quest_id: str, user_id: str):
+        """Drop a player who left the quest from its leaderboard
+        
+        Runs in the caller's transaction (the one deleting the participant)
+        and does not commit; the cache and the in-memory ranking follow
+        once it commits.
+        """
+        self.db.query(Leaderboard).filter(
+            Leaderboard.quest_id == quest_id,
+            Leaderboard.user_id == user_id
+        ).delete(synchronize_session=False)
+        leaderboard_engine.stage_removal(self.db, quest_id, user_id)
+        leaderboard_cache.bump_after_commit(self.db, quest_scope(quest_id))
+    
+    def _count_ahead(self, quest_id: str, user_id: str, score: int, last_reply_at: datetime) -> int:
+        """Entries ranked ahead of (score, last_reply_at, user_id); an index range count"""
+        return self.db.query(func.count(Leaderboard.leaderboard_id)).filter(
+            Leaderboard.quest_id == quest_id,
+            Leaderboard.user_id != user_id,
+            or_(
+                Leaderboard.score > score,
+                and_(Leaderboard.score == score, Leaderboard.last_reply_at < last_reply_at),
+                and_(
+                    Leaderboard.score == score,
+                    Leaderboard.last_reply_at == last_reply_at,
+                    Leaderboard.user_id < user_id
+                )
+            )
+        ).scalar()
+    
+    def get_user_rank(self, quest_id: str, user_id: str) -> Optional[int]:
+        """A player's current rank, None before their first scored reply"""
+        if settings.LEADERBOARD_ENGINE_ENABLED:
+            return leaderboard_engine.rank(quest_id, user_id)
+        
+        entry = self.db.query(Leaderboard).filter(
+            Leaderboard.quest_id == quest_id,
+            Leaderboard.user_id == user_id
+        ).first()
+        if entry is None:
+            return None
+        return self._count_ahead(quest_id, user_id, entry.score or 0, entry.last_reply_at) + 1
+    
+    def _upsert_entry(self, quest_id: str, participant: QuestParticipant):
+        values = {
+            Leaderboard.score: participant.score or 0,
+            Leaderboard.last_reply_at: participant.last_reply_at,
+            Leaderboard.total_messages: participant.message_count or 0,
+            Leaderboard.updated_at: datetime.now()
+        }
+        updated = self.db.query(Leaderboard).filter(
+            Leaderboard.quest_id == quest_id,
+            Leaderboard.user_id == participant.user_id
+        ).update(values, synchronize_session=False)
+        if updated:
+            return
+        
+        try:
+            with self.db.begin_nested():
+                self.db.add(Leaderboard(
                     quest_id=quest_id,
                     user_id=participant.user_id,
-                    username=participant.username,
-                    score=participant.score,
-                    rank=rank,
-                    last_reply_at=participant.last_reply_at,
-                    total_messages=len(participant.reply_log) if participant.reply_log else 0
-                )
-                self.db.add(leaderboard_entry)
-            
-            self.db.commit()
+                    **{column.key: value for column, value in values.items()}
+                ))
+        except IntegrityError:
+            # Created by a concurrent request in the meantime
+            self._upsert_entry(quest_id, participant)
+    
+    def rebuild_leaderboard(self, quest_id: str) -> Optional[List[QuestParticipant]]:
+        """Recompute every entry of a quest from its participants (manual repair)"""
+        try:
+            with self._savepoint():
+                participants = self.db.query(QuestParticipant).filter(
+                    QuestParticipant.quest_id == quest_id,
+                    QuestParticipant.last_reply_at.isnot(None)
+                ).order_by(
+                    desc(QuestParticipant.score), QuestParticipant.last_reply_at, QuestParticipant.user_id
+                ).all()
+                
+                self.db.query(Leaderboard).filter(Leaderboard.quest_id == quest_id).delete(synchronize_session=False)
+                now = datetime.now()
+                self.db.bulk_insert_mappings(Leaderboard, [
+                    {
+                        "leaderboard_id": str(uuid.uuid4()),
+                        "quest_id": quest_id,
+                        "user_id": participant.user_id,
+                        "score": participant.score or 0,
+                        "last_reply_at": participant.last_reply_at,
+                        "total_messages": participant.message_count or 0,
+                        "updated_at": now
+                    }
+                    for participant in participants
+                ])
+                leaderboard_engine.stage_reload(self.db, quest_id)
+                leaderboard_cache.bump_after_commit(self.db, quest_scope(quest_id))
+            
+            self._commit()
+            return participants
             
         except Exception as e:
-            logger.error(f"Failed to update leaderboard entries: {str(e)}")
-            self.db.rollback()
+            logger.error(f"Failed to rebuild leaderboard: {str(e)}")
+            self._rollback()
+            return None
     
     def _process_final_rewards(self, quest_id: str, participants: List[QuestParticipant]):
         """Process final rewards when quest ends"""
         try:
-            # Get quest distribution rules
-            quest = self.db.query(Quest).filter(Quest.quest_id == quest_id).first()
-            if not quest or not quest.distribution_rules:
-                return
-            
-            distribution_rules = quest.distribution_rules
-            rank_distribution = distribution_rules.get("rank_distribution", {})
-            
-            # Calculate total quest pool
-            initial_pool = distribution_rules.get("initial_pool", 0)
-            user_pool_contributions = self.db.query(func.sum(QuestPool.split_to_pool)).filter(
-                QuestPool.quest_id == quest_id
-            ).scalar() or 0
-            
-            total_quest_pool = initial_pool + user_pool_contributions
-            
-            # Calculate rewards for each range
-            reward_percentages = self._calculate_range_rewards(participants, rank_distribution)
-            
-            # Process rewards based on final leaderboard
-            for rank, participant in enumerate(participants, 1):
-                reward_percentage = reward_percentages.get(rank, 0.0)
-                if reward_percentage > 0:
-                    reward_amount = total_quest_pool * (reward_percentage / 100)
-                    
-                    # Update user's wallet balance automatically
-                    self._update_user_balance(participant.user_id, reward_amount, quest_id)
-                    
-                    # Create reward record
-                    reward = QuestReward(
-                        quest_id=quest_id,
-                        user_id=participant.user_id,
-                        amount=reward_amount,
-                        rank=rank,
-                        percentage=reward_percentage,
-                        status="completed"  # Automatically completed
-                    )
-                    self.db.add(reward)
-            
-            self.db.commit()
+            with self._savepoint():
+                # Get quest distribution rules
+                quest = self.db.query(Quest).filter(Quest.quest_id == quest_id).first()
+                if not quest or not quest.distribution_rules:
+                    return
+                
+                distribution_rules = quest.distribution_rules
+                rank_distribution = distribution_rules.get("rank_distribution", {})
+                
+                # Calculate total quest pool
+                initial_pool = distribution_rules.get("initial_pool", 0)
+                user_pool_contributions = self.db.query(func.sum(QuestPool.split_to_pool)).filter(
+                    QuestPool.quest_id == quest_id
+                ).scalar() or 0
+                
+                total_quest_pool = initial_pool + user_pool_contributions
+                
+                # Calculate rewards for each range
+                reward_percentages = self._calculate_range_rewards(participants, rank_distribution)
+                
+                # Process rewards based on final leaderboard
+                for rank, participant in enumerate(participants, 1):
+                    reward_percentage = reward_percentages.get(rank, 0.0)
+                    if reward_percentage > 0:
+                        reward_amount = total_quest_pool * (reward_percentage / 100)
+                        
+                        # Update user's wallet balance automatically
+                        self._update_user_balance(participant.user_id, reward_amount, quest_id)
+                        
+                        # Create reward record
+                        reward = QuestReward(
+                            quest_id=quest_id,
+                            user_id=participant.user_id,
+                            amount=reward_amount,
+                            rank=rank,
+                            percentage=reward_percentage,
+                            status="completed"  # Automatically completed
+                        )
+                        self.db.add(reward)
+                
+            self._commit()
             logger.info(f"Processed final rewards for quest {quest_id} - Total pool: {total_quest_pool}")
             
         except Exception as e:
             logger.error(f"Failed to process final rewards: {str(e)}")
-            self.db.rollback()
+            self._rollback()
     
     def _calculate_range_rewards(self, participants: List[QuestParticipant], rank_distribution: Dict[str, Any]) -> Dict[int, float]:
         """Calculate reward percentages for each rank based on actual participants in ranges"""
@@ -270,9 +498,12 @@ class LeaderboardService:
             ).count()
             
             # Get max score
-            max_score = self.db.query(func.max(QuestParticipant.score)).filter(
-                QuestParticipant.quest_id == quest_id
-            ).scalar() or 0
+            if settings.LEADERBOARD_ENGINE_ENABLED:
+                max_score = leaderboard_engine.summary(quest_id)["max_score"]
+            else:
+                max_score = self.db.query(func.max(QuestParticipant.score)).filter(
+                    QuestParticipant.quest_id == quest_id
+                ).scalar() or 0
             
             return {
                 "success": True,
@@ -0,0 +1,205 @@
+from fastapi import HTTPException
+from app.core.config import settings
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Dict
+import asyncio
+import math
+import time
+import weakref
+
+# Request classes in strict priority order (highest first)
+CHAT = "chat"
+SCORING = "scoring"
+OPENING = "opening"
+ENGAGEMENT = "engagement"
+SUMMARY = "summary"
+PRIORITY_ORDER = [CHAT, SCORING, OPENING, ENGAGEMENT, SUMMARY]
+
+class LLMCapacityError(HTTPException):
+    """Raised when an LLM request class has no queue space left"""
+
+    def __init__(self, request_class: str, status_code: int, retry_after: float):
+        self.request_class = request_class
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(
+            status_code=status_code,
+            detail=f"AI service is busy ({request_class} queue full). Please retry shortly.",
+            headers={"Retry-After": str(self.retry_after)}
+        )
+
+class TokenBucket:
+    """Token bucket rate limiter; a rate of 0 means unlimited"""
+
+    def __init__(self, rate_per_second: float, burst: float):
+        self.rate = rate_per_second
+        self.capacity = max(burst, 1)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def try_take(self, now: float) -> bool:
+        if self.rate <= 0:
+            return True
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def time_until_token(self, now: float) -> float:
+        if self.rate <= 0:
+            return 0.0
+        self._refill(now)
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+class _ClassStats:
+    def __init__(self):
+        self.submitted = 0
+        self.granted = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.recent_waits = deque(maxlen=1000)
+
+class LLMScheduler:
+    """Priority scheduler in front of the LLM backend
+
+    Requests wait in a bounded queue per class. Whenever a concurrency slot is
+    free, the highest-priority class whose token bucket has a token is served
+    first. A request arriving at a full queue is rejected immediately: 429 if
+    its class is being rate limited, 503 if all slots are busy.
+    """
+
+    def __init__(self, max_concurrency: int, class_limits: Dict[str, Dict[str, float]]):
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self._queues = {request_class: deque() for request_class in PRIORITY_ORDER}
+        self._buckets = {}
+        self._max_queue = {}
+        for request_class in PRIORITY_ORDER:
+            limits = class_limits.get(request_class, {})
+            self._buckets[request_class] = TokenBucket(
+                limits.get("rate_per_second", 0), limits.get("burst", 1)
+            )
+            self._max_queue[request_class] = int(limits.get("max_queue", 100))
+        self._stats = {request_class: _ClassStats() for request_class in PRIORITY_ORDER}
+        self._timer = None
+
+    @asynccontextmanager
+    async def slot(self, request_class: str):
+        """Hold a concurrency slot for one LLM request of the given class"""
+        await self.acquire(request_class)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self, request_class: str):
+        if request_class not in self._queues:
+            raise ValueError(f"Unknown LLM request class '{request_class}'")
+
+        queue = self._queues[request_class]
+        stats = self._stats[request_class]
+        now = time.monotonic()
+
+        if len(queue) >= self._max_queue[request_class]:
+            stats.rejected += 1
+            bucket_wait = self._buckets[request_class].time_until_token(now)
+            if bucket_wait > 0:
+                raise LLMCapacityError(request_class, 429, bucket_wait)
+            raise LLMCapacityError(request_class, 503, 1)
+
+        stats.submitted += 1
+        future = asyncio.get_running_loop().create_future()
+        queue.append((future, now, request_class))
+        self._dispatch()
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Slot was granted just before the caller gave up
+                self.release()
+            raise
+
+    def release(self):
+        self.in_flight -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        now = time.monotonic()
+        next_token_in = None
+
+        for request_class in PRIORITY_ORDER:
+            queue = self._queues[request_class]
+            bucket = self._buckets[request_class]
+
+            while queue and self.in_flight < self.max_concurrency:
+                future, enqueued_at, _ = queue[0]
+                if future.done():
+                    # Caller timed out or was cancelled while waiting
+                    queue.popleft()
+                    continue
+                if not bucket.try_take(now):
+                    wait = bucket.time_until_token(now)
+                    next_token_in = wait if next_token_in is None else min(next_token_in, wait)
+                    break
+
+                queue.popleft()
+                self.in_flight += 1
+                self._record_wait(request_class, now - enqueued_at)
+                future.set_result(None)
+
+        if next_token_in is not None and self.in_flight < self.max_concurrency:
+            self._schedule_dispatch(next_token_in)
+
+    def _schedule_dispatch(self, delay: float):
+        if self._timer is not None and not self._timer.cancelled():
+            self._timer.cancel()
+        self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+
+    def _record_wait(self, request_class: str, wait: float):
+        stats = self._stats[request_class]
+        stats.granted += 1
+        stats.total_wait += wait
+        stats.max_wait = max(stats.max_wait, wait)
+        stats.recent_waits.append(wait)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and wait-time metrics per request class"""
+        classes = {}
+        for request_class in PRIORITY_ORDER:
+            stats = self._stats[request_class]
+            waits = sorted(stats.recent_waits)
+            classes[request_class] = {
+                "queue_depth": sum(1 for future, _, _ in self._queues[request_class] if not future.done()),
+                "max_queue": self._max_queue[request_class],
+                "rate_per_second": self._buckets[request_class].rate,
+                "submitted": stats.submitted,
+                "granted": stats.granted,
+                "rejected": stats.rejected,
+                "avg_wait_ms": round(stats.total_wait / stats.granted * 1000, 2) if stats.granted else 0.0,
+                "p95_wait_ms": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000, 2) if waits else 0.0,
+                "max_wait_ms": round(stats.max_wait * 1000, 2)
+            }
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "classes": classes
+        }
+
+# Futures are bound to an event loop, so each loop gets its own scheduler
+_schedulers = weakref.WeakKeyDictionary()
+
+def get_llm_scheduler() -> LLMScheduler:
+    """Get the LLM scheduler bound to the running event loop"""
+    loop = asyncio.get_running_loop()
+    scheduler = _schedulers.get(loop)
+    if scheduler is None:
+        scheduler = LLMScheduler(settings.AI_MAX_CONCURRENT_REQUESTS, settings.AI_SCHEDULER_CLASS_LIMITS)
+        _schedulers[loop] = scheduler
+    return scheduler
@@ -0,0 +1,158 @@
+from app.core.config import settings
+from app.database import SessionLocal
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+import asyncio
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+class LLMUsageTracker:
+    """Per-call LLM token and latency accounting
+
+    Every model call is kept in an in-memory ring buffer for the admin summary.
+    With `persistent` on, records are also written to the llm_call_log table
+    in batches of `flush_size`.
+    """
+
+    def __init__(self, buffer_size: int = 10000, persistent: bool = False, flush_size: int = 50):
+        self.persistent = persistent
+        self.flush_size = max(flush_size, 1)
+        self._records = deque(maxlen=buffer_size)
+        self._pending = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def extract_token_counts(response: Any) -> tuple:
+        """Read (prompt_tokens, response_tokens) from a response's usage metadata"""
+        usage = getattr(response, "usage_metadata", None)
+        if usage is None:
+            return None, None
+        return (
+            getattr(usage, "prompt_token_count", None),
+            getattr(usage, "candidates_token_count", None)
+        )
+
+    def record(
+        self,
+        caller: str,
+        model: str,
+        latency: float,
+        success: bool,
+        prompt_chars: int,
+        prompt_tokens: Optional[int] = None,
+        response_tokens: Optional[int] = None,
+        quest_id: str = None,
+        error: str = None
+    ):
+        """Record one model call"""
+        record = {
+            "created_at": datetime.utcnow(),
+            "caller": caller,
+            "quest_id": quest_id,
+            "model": model,
+            "success": success,
+            "latency_ms": round(latency * 1000, 2),
+            "prompt_chars": prompt_chars,
+            "prompt_tokens": prompt_tokens,
+            "response_tokens": response_tokens,
+            "error": error[:255] if error else None
+        }
+
+        batch = None
+        with self._lock:
+            self._records.append(record)
+            if self.persistent:
+                self._pending.append(record)
+                if len(self._pending) >= self.flush_size:
+                    batch, self._pending = self._pending, []
+
+        if batch:
+            try:
+                asyncio.get_running_loop().run_in_executor(None, self._save_persistent, batch)
+            except RuntimeError:
+                # No running loop (sync caller): write inline
+                self._save_persistent(batch)
+
+    def summary(self, window_minutes: int = 60, top_quests: int = 10) -> Dict[str, Any]:
+        """Aggregate recent calls by caller, model and quest"""
+        since = datetime.utcnow() - timedelta(minutes=window_minutes)
+        with self._lock:
+            records = [record for record in self._records if record["created_at"] >= since]
+
+        by_quest = {}
+        for record in records:
+            if record["quest_id"]:
+                by_quest.setdefault(record["quest_id"], []).append(record)
+        quest_rows = sorted(
+            ({"quest_id": quest_id, **self._aggregate(rows)} for quest_id, rows in by_quest.items()),
+            key=lambda row: row["prompt_tokens"] + row["response_tokens"],
+            reverse=True
+        )
+
+        return {
+            "window_minutes": window_minutes,
+            "buffered_calls": len(self._records),
+            "totals": self._aggregate(records),
+            "by_caller": self._group(records, "caller"),
+            "by_model": self._group(records, "model"),
+            "top_quests_by_tokens": quest_rows[:top_quests]
+        }
+
+    def flush(self) -> int:
+        """Write records still waiting for a full batch; returns how many were written"""
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if batch:
+            self._save_persistent(batch)
+        return len(batch)
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+            self._pending = []
+
+    def _group(self, records: List[Dict[str, Any]], field: str) -> Dict[str, Any]:
+        groups = {}
+        for record in records:
+            groups.setdefault(record[field], []).append(record)
+        return {key: self._aggregate(rows) for key, rows in groups.items()}
+
+    def _aggregate(self, records: List[Dict[str, Any]]) -> Dict[str, Any]:
+        calls = len(records)
+        failures = sum(1 for record in records if not record["success"])
+        latencies = sorted(record["latency_ms"] for record in records)
+        prompt_tokens = sum(record["prompt_tokens"] or 0 for record in records)
+        response_tokens = sum(record["response_tokens"] or 0 for record in records)
+        return {
+            "calls": calls,
+            "failures": failures,
+            "error_rate": round(failures / calls, 4) if calls else 0.0,
+            "prompt_tokens": prompt_tokens,
+            "response_tokens": response_tokens,
+            "avg_prompt_tokens": round(prompt_tokens / calls, 1) if calls else 0.0,
+            "avg_prompt_chars": round(sum(record["prompt_chars"] for record in records) / calls, 1) if calls else 0.0,
+            "avg_latency_ms": round(sum(latencies) / calls, 2) if calls else 0.0,
+            "p95_latency_ms": latencies[min(calls - 1, int(calls * 0.95))] if calls else 0.0
+        }
+
+    def _save_persistent(self, records: List[Dict[str, Any]]):
+        from app.models.llm_call_log import LLMCallLog
+
+        db = SessionLocal()
+        try:
+            db.bulk_insert_mappings(LLMCallLog, records)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Failed to write LLM call log: {e}")
+        finally:
+            db.close()
+
+llm_usage = LLMUsageTracker(
+    buffer_size=settings.AI_USAGE_BUFFER_SIZE,
+    persistent=settings.AI_USAGE_PERSISTENT,
+    flush_size=settings.AI_USAGE_FLUSH_SIZE
+)
@@ -0,0 +1,66 @@
+from app.core.config import settings
+from collections import OrderedDict
+from typing import Any, Optional
+import hashlib
+import json
+import threading
+
+class CompiledPrompt:
+    """Character prompt built for one version of a quest's persona"""
+
+    def __init__(self, version: Any, character_prompt: str, model: Any = None):
+        self.version = version
+        self.character_prompt = character_prompt
+        # Gemini model carrying the prompt as its system instruction, if enabled
+        self.model = model
+
+class PromptCache:
+    """Per-process LRU cache of compiled character prompts keyed by quest_id"""
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def compute_version(*parts: Any) -> str:
+        """Content version of the quest fields a prompt is built from
+
+        Only for callers without the quest's prompt_version: it serializes and
+        hashes the whole persona on every call.
+        """
+        payload = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+    def get(self, quest_id: str, version: Any) -> Optional[CompiledPrompt]:
+        """Get the compiled prompt for a quest if it matches the given version"""
+        with self._lock:
+            compiled = self._entries.get(quest_id)
+            if compiled is None:
+                return None
+            if compiled.version != version:
+                # Quest content changed (possibly in another process)
+                del self._entries[quest_id]
+                return None
+            self._entries.move_to_end(quest_id)
+            return compiled
+
+    def set(self, quest_id: str, compiled: CompiledPrompt):
+        """Store a compiled prompt, evicting the least recently used quest"""
+        with self._lock:
+            self._entries[quest_id] = compiled
+            self._entries.move_to_end(quest_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, quest_id: str):
+        """Drop the compiled prompt for a quest after its content changes"""
+        with self._lock:
+            self._entries.pop(quest_id, None)
+
+    def clear(self):
+        """Drop all compiled prompts"""
+        with self._lock:
+            self._entries.clear()
+
+prompt_cache = PromptCache(settings.AI_PROMPT_CACHE_SIZE)
@@ -0,0 +1,194 @@
+from app.core.config import settings
+from app.database import SessionLocal
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+class ScoreCache:
+    """LRU + TTL cache of message scores, optionally backed by the score_cache table
+
+    Keys hash the normalized message together with the quest id, quest context
+    and scoring criteria, so a score is only reused within the same quest context.
+    Expired table rows are deleted by the first write after every
+    `purge_interval_seconds`.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        ttl_seconds: int = 86400,
+        persistent: bool = False,
+        purge_interval_seconds: float = 3600
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.persistent = persistent
+        self.purge_interval_seconds = purge_interval_seconds
+        self._next_purge = time.monotonic() + purge_interval_seconds
+        self.hits = 0
+        self.misses = 0
+        self.persistent_hits = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize_message(message: str) -> str:
+        """Normalize a message so trivially different copies share a key"""
+        return re.sub(r"\s+", " ", message.strip().lower())
+
+    def build_key(
+        self,
+        user_message: str,
+        quest_context: str,
+        scoring_criteria: Dict[str, float],
+        quest_id: str = None
+    ) -> str:
+        """Build the cache key for a message within a quest context"""
+        payload = json.dumps({
+            "message": self.normalize_message(user_message),
+            "quest_id": quest_id,
+            "quest_context": quest_context or "",
+            "scoring_criteria": scoring_criteria or {}
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Get a cached score, falling back to the persistent table when enabled"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, score_data = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return dict(score_data)
+                del self._entries[key]
+
+        if self.persistent:
+            score_data = await asyncio.to_thread(self._load_persistent, key)
+            if score_data is not None:
+                self._store_memory(key, score_data)
+                with self._lock:
+                    self.hits += 1
+                    self.persistent_hits += 1
+                return dict(score_data)
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    async def set(self, key: str, score_data: Dict[str, Any]):
+        """Cache a successful score"""
+        score_data = {
+            "score": score_data.get("score"),
+            "score_breakdown": score_data.get("score_breakdown", {}),
+            "feedback": score_data.get("feedback", "")
+        }
+        self._store_memory(key, score_data)
+        if self.persistent:
+            await asyncio.to_thread(self._save_persistent, key, score_data)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "persistent_hits": self.persistent_hits,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "persistent": self.persistent
+            }
+
+    def clear(self):
+        """Drop all in-memory entries and reset counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.persistent_hits = 0
+
+    def purge_expired(self) -> int:
+        """Delete expired rows from the score_cache table; returns how many were deleted"""
+        from app.models.score_cache import ScoreCacheEntry
+
+        db = SessionLocal()
+        try:
+            deleted = db.query(ScoreCacheEntry).filter(
+                ScoreCacheEntry.expires_at <= datetime.utcnow()
+            ).delete(synchronize_session=False)
+            db.commit()
+            return deleted
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Failed to purge persistent score cache: {e}")
+            return 0
+        finally:
+            db.close()
+
+    def _store_memory(self, key: str, score_data: Dict[str, Any]):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, score_data)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _load_persistent(self, key: str) -> Optional[Dict[str, Any]]:
+        from app.models.score_cache import ScoreCacheEntry
+
+        db = SessionLocal()
+        try:
+            entry = db.query(ScoreCacheEntry).filter(
+                ScoreCacheEntry.cache_key == key,
+                ScoreCacheEntry.expires_at > datetime.utcnow()
+            ).first()
+            return entry.score_data if entry else None
+        except Exception as e:
+            logger.warning(f"Failed to read persistent score cache: {e}")
+            return None
+        finally:
+            db.close()
+
+    def _save_persistent(self, key: str, score_data: Dict[str, Any]):
+        from app.models.score_cache import ScoreCacheEntry
+
+        db = SessionLocal()
+        try:
+            db.merge(ScoreCacheEntry(
+                cache_key=key,
+                score_data=score_data,
+                created_at=datetime.utcnow(),
+                expires_at=datetime.utcnow() + timedelta(seconds=self.ttl_seconds)
+            ))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Failed to write persistent score cache: {e}")
+        finally:
+            db.close()
+
+        with self._lock:
+            purge_due = time.monotonic() >= self._next_purge
+            if purge_due:
+                self._next_purge = time.monotonic() + self.purge_interval_seconds
+        if purge_due:
+            self.purge_expired()
+
+score_cache = ScoreCache(
+    max_entries=settings.AI_SCORE_CACHE_SIZE,
+    ttl_seconds=settings.AI_SCORE_CACHE_TTL_SECONDS,
+    persistent=settings.AI_SCORE_CACHE_PERSISTENT,
+    purge_interval_seconds=settings.AI_SCORE_CACHE_PURGE_INTERVAL_SECONDS
+)
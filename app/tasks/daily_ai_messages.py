@@ -2,6 +2,7 @@ from celery import Celery
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 from typing import List, Dict, Any
+import asyncio
 import logging
 
 from app.database import SessionLocal
@@ -13,11 +14,15 @@ from app.services.ai_service import AIService
 logger = logging.getLogger(__name__)
 
 # Import Celery app
-from app.celery_app import celery_app
+from app.celery_app import celery_app, run_async
 
 @celery_app.task
 def send_daily_ai_messages():
     """Send daily AI messages to users who haven't been active"""
+    return run_async(_send_daily_ai_messages())
+
+async def _send_daily_ai_messages() -> Dict[str, Any]:
+    """Generate daily AI messages on the worker's event loop so Gemini calls share the async client"""
     db: Session = SessionLocal()
     try:
         # Get users who haven't received a daily AI message in the last 24 hours
@@ -123,8 +128,7 @@ Generate a mysterious, intriguing message to draw this user back. The message sh
 Write as a mysterious being would speak:"""
     
     try:
-        response = ai_service.model.generate_content(prompt)
-        return response.text
+        return await ai_service.generate_text(prompt)
     except Exception as e:
         logger.error(f"Failed to generate general engagement message: {e}")
         return "I sense your absence in the realm of philosophical mysteries. New enigmas have emerged that await your unique perspective. Will you return to unravel them?"
@@ -223,8 +227,7 @@ Generate a mysterious, teasing message to draw this user back to your quest. The
 Write as {character_name} would speak - be mysterious, intriguing, and personal:"""
     
     try:
-        response = ai_service.model.generate_content(prompt)
-        return response.text
+        return await ai_service.generate_text(prompt, quest_id=quest.quest_id)
     except Exception as e:
         logger.error(f"Failed to generate quest engagement message: {e}")
         return f"I sense your absence, {user.username or 'seeker'}. {character_name} here - the enigmas we began to unravel have deepened in your absence. What new insights await your return to our philosophical discourse?"
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Chat Write Path Benchmark
+Counts database round trips (statements, commits, rollbacks) per chat message
+sent through the messaging router, using a throwaway SQLite database and the
+fake AI backend so no network or API key is needed.
+
+Usage:
+    python benchmark_chat_write_path.py --messages 50 --participants 10
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+# Configure before the app modules read settings
+os.environ.setdefault("DATABASE_URL", "sqlite:///./benchmark_chat.db")
+os.environ.setdefault("AI_BACKEND", "fake")
+os.environ.setdefault("AI_FAKE_LATENCY_DISTRIBUTION", "fixed")
+os.environ.setdefault("AI_FAKE_LATENCY_MS", "0")
+os.environ.setdefault("AI_SUMMARY_REFRESH_TURNS", "1000000")  # keep background refreshes out of the counts
+
+from sqlalchemy import event
+
+from app.database import AsyncSessionLocal, SessionLocal, async_engine, init_db
+from app.models.credits import UserCredits
+from app.models.participant import QuestParticipant
+from app.models.quest import Quest
+from app.models.user import User
+from app.routers.messaging import send_message
+from app.schemas.message import MessageCreate
+
+class RoundTripCounter:
+    """Counts statements and transaction ends issued through the async engine"""
+
+    def __init__(self):
+        self.reset()
+        event.listen(async_engine.sync_engine, "before_cursor_execute", self._on_execute)
+        event.listen(async_engine.sync_engine, "commit", self._on_commit)
+        event.listen(async_engine.sync_engine, "rollback", self._on_rollback)
+
+    def reset(self):
+        self.statements = 0
+        self.commits = 0
+        self.rollbacks = 0
+
+    @property
+    def round_trips(self) -> int:
+        return self.statements + self.commits + self.rollbacks
+
+    def _on_execute(self, *args):
+        self.statements += 1
+
+    def _on_commit(self, *args):
+        self.commits += 1
+
+    def _on_rollback(self, *args):
+        self.rollbacks += 1
+
+def seed(participants: int, messages: int) -> tuple:
+    """Create one quest with the given number of participants"""
+    db = SessionLocal()
+    try:
+        quest = Quest(
+            title="Benchmark Quest",
+            description="Write path benchmark",
+            context="A philosophical challenge",
+            details={"properties": {"character_name": "The Oracle"}}
+        )
+        db.add(quest)
+        db.flush()
+
+        user_ids = []
+        for i in range(participants):
+            user = User(username=f"bench_user_{i}")
+            db.add(user)
+            db.flush()
+            db.add(QuestParticipant(quest_id=quest.quest_id, user_id=user.user_id, score=0))
+            db.add(UserCredits(
+                user_id=user.user_id,
+                quest_id=quest.quest_id,
+                daily_credits=messages + 1,
+                credits_used_today=0
+            ))
+            user_ids.append(user.user_id)
+
+        db.commit()
+        return quest.quest_id, user_ids
+    finally:
+        db.close()
+
+async def run(messages: int, participants: int):
+    await init_db()
+    quest_id, user_ids = seed(participants, messages)
+    counter = RoundTripCounter()
+
+    results = []
+    for i in range(messages):
+        db = AsyncSessionLocal()
+        counter.reset()
+        started = time.perf_counter()
+        try:
+            await send_message(
+                quest_id,
+                MessageCreate(user_id=user_ids[i % participants], user_message=f"Benchmark message number {i}"),
+                db,
+                idempotency_key=None
+            )
+        finally:
+            await db.close()
+        results.append((counter.statements, counter.commits, counter.rollbacks, counter.round_trips, time.perf_counter() - started))
+
+    print("💬 Chat write path benchmark")
+    print("=" * 50)
+    print(f"Messages: {messages}  Participants: {participants}  Database: {async_engine.url}")
+    print("(get_db's connection check is not included; the router is called directly)")
+    print()
+    for label, index in [("Statements", 0), ("Commits", 1), ("Rollbacks", 2), ("Round trips", 3)]:
+        values = [row[index] for row in results]
+        print(f"{label:<12} per message: mean {statistics.mean(values):6.1f}  max {max(values):4d}")
+    print(f"Latency      per message: mean {statistics.mean(row[4] for row in results) * 1000:6.1f}ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Count database round trips per chat message")
+    parser.add_argument("--messages", type=int, default=50)
+    parser.add_argument("--participants", type=int, default=10)
+    args = parser.parse_args()
+
+    db_url = os.environ["DATABASE_URL"]
+    if not db_url.startswith("sqlite:///"):
+        # The benchmark seeds and wipes its database
+        raise SystemExit("❌ Refusing to run against a non-SQLite DATABASE_URL")
+    if os.path.exists(db_url[len("sqlite:///"):]):
+        os.remove(db_url[len("sqlite:///"):])
+
+    asyncio.run(run(args.messages, args.participants))
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+AI Client Path Test
+AIService instances share one backend and model registry, model calls run
+concurrently on the event loop instead of one after another, and a call that
+outlives AI_REQUEST_TIMEOUT_SECONDS fails with a timeout instead of hanging.
+
+Run with: python -m pytest -q test_ai_clients.py  (or python test_ai_clients.py)
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+# Throwaway SQLite database and the offline AI backend; must be set before the app is imported
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/test_ai_clients.db"
+os.environ["AI_BACKEND"] = "fake"
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.config import settings
+from app.services.ai_clients import get_ai_clients
+from app.services.ai_service import AIService
+from app.services.llm_scheduler import CHAT
+
+LATENCY_MS = 200
+
+def _fixed_latency(latency_ms: float):
+    settings.AI_BACKEND = "fake"
+    settings.AI_FAKE_LATENCY_DISTRIBUTION = "fixed"
+    settings.AI_FAKE_LATENCY_MS = latency_ms
+    settings.AI_FAKE_ERROR_RATE = 0.0
+
+def test_services_share_clients():
+    _fixed_latency(0)
+    first, second = AIService(), AIService()
+
+    assert first.clients is second.clients
+    assert first.model is second.model
+
+    registry = get_ai_clients()
+    persona = registry.get_model(system_instruction="You are a sphinx.")
+    assert registry.get_model(system_instruction="You are a sphinx.") is persona
+    assert registry.get_model() is registry.default_model
+
+def test_calls_run_concurrently():
+    _fixed_latency(LATENCY_MS)
+    settings.AI_MAX_CONCURRENT_REQUESTS = 8
+    service = AIService()
+
+    async def run():
+        started = time.monotonic()
+        texts = await asyncio.gather(*[
+            service.generate_text(f"Riddle number {i}", request_class=CHAT) for i in range(8)
+        ])
+        return texts, time.monotonic() - started
+
+    texts, elapsed = asyncio.run(run())
+    assert all(texts)
+    # Eight calls one after another would take 8 x LATENCY_MS
+    assert elapsed < 3 * LATENCY_MS / 1000, elapsed
+
+def test_slow_call_times_out():
+    _fixed_latency(LATENCY_MS)
+    service = AIService()
+
+    async def run():
+        started = time.monotonic()
+        try:
+            await service._generate("Answer slowly", timeout=0.05)
+        except asyncio.TimeoutError:
+            return time.monotonic() - started
+        raise AssertionError("Expected the call to time out")
+
+    assert asyncio.run(run()) < LATENCY_MS / 1000
+
+if __name__ == "__main__":
+    test_services_share_clients()
+    test_calls_run_concurrently()
+    test_slow_call_times_out()
+    print("✅ AI calls share clients, run concurrently and honour the timeout")
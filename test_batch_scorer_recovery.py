@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Batch Scorer Recovery Test
+Messages saved with a pending score whose queue entry was lost (crash, kill,
+dropped retry) are re-queued by recover_pending() once the grace period has
+passed, and then scored like any other message. Ages are measured on the
+UTC clock of the created_at column default, whatever the local timezone.
+
+Run with: python -m pytest -q test_batch_scorer_recovery.py  (or python test_batch_scorer_recovery.py)
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Throwaway SQLite database and the offline AI backend; must be set before the app is imported
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/test_batch_scorer_recovery.db"
+os.environ["AI_BACKEND"] = "fake"
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.config import settings
+from app.database import SessionLocal, init_db
+from app.models.message import ChatMessage
+from app.models.participant import QuestParticipant
+from app.models.quest import Quest
+from app.models.user import User
+from app.services.batch_scorer import BatchScorer
+
+def _message(message_id: str, age: timedelta) -> ChatMessage:
+    return ChatMessage(
+        message_id=message_id,
+        quest_id="recovery-quest",
+        user_id="recovery-user",
+        content=f"What is truth? ({message_id})",
+        score=None,
+        created_at=datetime.utcnow() - age
+    )
+
+async def _recover_and_score(scorer: BatchScorer) -> int:
+    recovered = await scorer.recover_pending()
+    await scorer.flush()
+    return recovered
+
+def test_recover_pending_scores_lost_messages():
+    settings.AI_BACKEND = "fake"
+    settings.AI_FAKE_LATENCY_DISTRIBUTION = "fixed"
+    settings.AI_FAKE_LATENCY_MS = 0
+    asyncio.run(init_db())
+
+    db = SessionLocal()
+    db.add(User(user_id="recovery-user", username="recovery"))
+    db.add(Quest(quest_id="recovery-quest", title="Recovery"))
+    db.add(QuestParticipant(quest_id="recovery-quest", user_id="recovery-user", score=0, message_count=0))
+    db.add_all([
+        _message("lost", timedelta(minutes=10)),  # its worker died before scoring it
+        _message("in-flight", timedelta(seconds=5)),  # still within another worker's grace period
+        _message("legacy", timedelta(days=3))  # left unscored by the old synchronous flow
+    ])
+    db.commit()
+    db.close()
+
+    scorer = BatchScorer(8, 0.01, 5.0, recovery_grace_seconds=60, recovery_max_age_seconds=86400)
+    assert asyncio.run(_recover_and_score(scorer)) == 1
+
+    db = SessionLocal()
+    scores = {msg.message_id: msg.score for msg in db.query(ChatMessage).all()}
+    participant = db.query(QuestParticipant).filter(QuestParticipant.user_id == "recovery-user").one()
+    db.close()
+
+    assert scores["lost"] is not None
+    assert scores["in-flight"] is None
+    assert scores["legacy"] is None
+    assert participant.message_count == 1
+    assert participant.score == scores["lost"]
+
+    # Nothing left to recover; scored messages are not picked up again
+    assert asyncio.run(_recover_and_score(scorer)) == 0
+
+def test_fresh_message_is_not_recovered_east_of_utc():
+    previous_tz = os.environ.get("TZ")
+    os.environ["TZ"] = "Asia/Tokyo"  # local time runs 9 hours ahead of the column default
+    time.tzset()
+    try:
+        asyncio.run(init_db())
+        db = SessionLocal()
+        if db.get(User, "recovery-user") is None:
+            db.add(User(user_id="recovery-user", username="recovery"))
+            db.add(Quest(quest_id="recovery-quest", title="Recovery"))
+            db.add(QuestParticipant(quest_id="recovery-quest", user_id="recovery-user", score=0, message_count=0))
+        # created_at comes from the column default
+        db.add(ChatMessage(
+            message_id="just-sent", quest_id="recovery-quest", user_id="recovery-user",
+            content="What is truth? (just-sent)", score=None
+        ))
+        db.commit()
+        db.close()
+
+        scorer = BatchScorer(8, 0.01, 5.0, recovery_grace_seconds=60, recovery_max_age_seconds=86400)
+        assert "just-sent" not in scorer._find_stranded(100)
+    finally:
+        if previous_tz is None:
+            os.environ.pop("TZ", None)
+        else:
+            os.environ["TZ"] = previous_tz
+        time.tzset()
+
+if __name__ == "__main__":
+    test_recover_pending_scores_lost_messages()
+    test_fresh_message_is_not_recovered_east_of_utc()
+    print("✅ Lost pending scores were recovered and applied")
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Circuit Breaker and Hedging Test
+Repeated provider failures open the breaker; while it is open calls go to
+AI_FALLBACK_MODEL, or fail fast with 503 when none is configured; a single
+probe closes it again. With AI_HEDGE_ENABLED a call that outlives the recent
+p95 latency is answered by a backup request. Time spent queued for a
+scheduler slot is not a provider failure.
+
+Run with: python -m pytest -q test_circuit_breaker.py  (or python test_circuit_breaker.py)
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+# Throwaway SQLite database and the offline AI backend; must be set before the app is imported
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/test_circuit_breaker.db"
+os.environ["AI_BACKEND"] = "fake"
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.config import settings
+from app.services import ai_service as ai_service_module
+from app.services.ai_backends import FakeBackendError, FakeResponse
+from app.services.ai_service import AIService
+from app.services.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+from app.services.llm_scheduler import CHAT, get_llm_scheduler
+
+class SlowModel:
+    """Primary model that answers long after the hedging delay"""
+    model_name = "slow-primary"
+
+    async def generate_content_async(self, prompt, generation_config=None):
+        await asyncio.sleep(1.0)
+        return FakeResponse("slow answer")
+
+def _fake_backend(error_rate: float = 0.0, fallback_model: str = "", hedge: bool = False):
+    settings.AI_BACKEND = "fake"
+    settings.AI_FAKE_LATENCY_DISTRIBUTION = "fixed"
+    settings.AI_FAKE_LATENCY_MS = 0
+    settings.AI_FAKE_ERROR_RATE = error_rate
+    settings.AI_FALLBACK_MODEL = fallback_model
+    settings.AI_HEDGE_ENABLED = hedge
+
+def _use_breaker(breaker: CircuitBreaker) -> CircuitBreaker:
+    """Point AIService at `breaker`; returns the breaker it used before"""
+    previous = ai_service_module.circuit_breaker
+    ai_service_module.circuit_breaker = breaker
+    return previous
+
+def test_breaker_opens_and_recovers():
+    breaker = CircuitBreaker(failure_threshold=3, window_seconds=60, reset_seconds=0.1)
+    for _ in range(3):
+        assert breaker.allow_request()
+        breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow_request()
+
+    # One probe after the reset period; a failed probe reopens at once
+    time.sleep(0.11)
+    assert breaker.allow_request() and breaker.state == HALF_OPEN
+    assert not breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    time.sleep(0.11)
+    assert breaker.allow_request()
+    breaker.record_success(0.01)
+    assert breaker.state == CLOSED
+    assert breaker.allow_request()
+    assert breaker.times_opened == 2
+
+def test_open_breaker_uses_fallback_or_fails_fast():
+    previous = _use_breaker(CircuitBreaker(failure_threshold=3, window_seconds=60, reset_seconds=60))
+    try:
+        _fake_backend(error_rate=1.0)
+        service = AIService()
+
+        async def fail_primary():
+            for _ in range(3):
+                try:
+                    await service._generate("Provider is down")
+                except FakeBackendError:
+                    pass
+        asyncio.run(fail_primary())
+        assert ai_service_module.circuit_breaker.state == OPEN
+
+        # No fallback configured: fail fast without calling the provider
+        try:
+            asyncio.run(service._generate("Provider is still down"))
+            raise AssertionError("Expected CircuitOpenError")
+        except CircuitOpenError as e:
+            assert e.status_code == 503
+            assert int(e.headers["Retry-After"]) > 0
+
+        _fake_backend(fallback_model="fake-fallback")
+        model, is_fallback = service._select_model(service.model)
+        assert is_fallback and model.model_name == "fake-fallback"
+        assert asyncio.run(service._generate("Served by the fallback")).text
+    finally:
+        _use_breaker(previous)
+        _fake_backend()
+
+def test_hedge_answers_a_slow_primary():
+    breaker = CircuitBreaker(failure_threshold=5, window_seconds=60, reset_seconds=60)
+    for _ in range(20):
+        breaker.record_success(0.02)  # p95 latency: the hedging delay
+    previous = _use_breaker(breaker)
+    try:
+        _fake_backend(fallback_model="fake-fallback", hedge=True)
+        service = AIService()
+
+        async def run():
+            started = time.monotonic()
+            response = await service._generate("Who answers first?", model=SlowModel())
+            return response, time.monotonic() - started
+
+        response, elapsed = asyncio.run(run())
+        assert response.text != "slow answer"
+        assert elapsed < 0.5, elapsed
+        # The cancelled primary is neither a success nor a failure
+        assert breaker.state == CLOSED and not breaker.stats()["recent_failures"]
+    finally:
+        _use_breaker(previous)
+        _fake_backend()
+
+def test_queue_timeout_is_not_a_failure():
+    breaker = CircuitBreaker(failure_threshold=1, window_seconds=60, reset_seconds=60)
+    previous = _use_breaker(breaker)
+    max_concurrent = settings.AI_MAX_CONCURRENT_REQUESTS
+    try:
+        _fake_backend()
+        settings.AI_MAX_CONCURRENT_REQUESTS = 1
+        service = AIService()
+
+        async def run():
+            scheduler = get_llm_scheduler()
+            await scheduler.acquire(CHAT)  # the only slot stays busy
+            try:
+                await service._generate("Still waiting for a slot", timeout=0.05)
+            except asyncio.TimeoutError:
+                return
+            finally:
+                scheduler.release()
+            raise AssertionError("Expected the call to time out")
+
+        asyncio.run(run())
+        assert breaker.state == CLOSED
+        assert breaker.stats()["recent_failures"] == 0
+    finally:
+        _use_breaker(previous)
+        settings.AI_MAX_CONCURRENT_REQUESTS = max_concurrent
+
+if __name__ == "__main__":
+    test_breaker_opens_and_recovers()
+    test_open_breaker_uses_fallback_or_fails_fast()
+    test_hedge_answers_a_slow_primary()
+    test_queue_timeout_is_not_a_failure()
+    print("✅ The circuit breaker, fallback model and hedged requests behaved as expected")
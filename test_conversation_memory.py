@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Conversation Memory Test
+A summary refresh runs in the background while the participant keeps
+chatting. An exchange appended between the refresh loading its turns and
+saving the new summary must survive, and still count towards the next refresh.
+
+Run with: python -m pytest -q test_conversation_memory.py  (or python test_conversation_memory.py)
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+# Throwaway SQLite database; must be set before the app is imported
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/test_conversation_memory.db"
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.config import settings
+from app.database import SessionLocal, init_db
+from app.models.conversation_summary import ConversationSummary, ConversationTurn
+from app.models.message import ChatMessage
+from app.models.quest import Quest
+from app.models.user import User
+from app.services.conversation_memory import ConversationMemory
+
+START = datetime.now() - timedelta(hours=1)
+
+def _exchange(memory: ConversationMemory, index: int) -> bool:
+    """Save one user message and its reply, and append them to the memory"""
+    db = SessionLocal()
+    try:
+        created_at = START + timedelta(minutes=index)
+        user_message = ChatMessage(
+            message_id=f"user-{index}", quest_id="memory-quest", user_id="memory-user",
+            content=f"question {index}", score=0, created_at=created_at
+        )
+        ai_message = ChatMessage(
+            message_id=f"ai-{index}", quest_id="memory-quest", user_id=None,
+            content=f"answer {index}", created_at=created_at + timedelta(microseconds=1)
+        )
+        db.add_all([user_message, ai_message])
+        due = memory.append_turn(db, "memory-quest", "memory-user", user_message, ai_message)
+        db.commit()
+        return due
+    finally:
+        db.close()
+
+def test_append_during_refresh_is_kept():
+    settings.AI_HISTORY_RECENT_TURNS = 2
+    settings.AI_SUMMARY_REFRESH_TURNS = 3
+    asyncio.run(init_db())
+
+    db = SessionLocal()
+    db.add(User(user_id="memory-user", username="memory"))
+    db.add(Quest(quest_id="memory-quest", title="Memory"))
+    db.commit()
+    db.close()
+
+    memory = ConversationMemory()
+    assert [_exchange(memory, index) for index in range(3)] == [False, False, True]
+
+    # The refresh loads the turns older than the window...
+    summary, overflow, turns_since_refresh = memory._load_for_refresh("memory-quest", "memory-user")
+    assert [turn["content"] for turn in overflow] == ["question 0", "answer 0", "question 1", "answer 1"]
+    assert turns_since_refresh == 3
+
+    # ...the participant sends another message while the summary is generated...
+    assert _exchange(memory, 3) is True
+
+    # ...and the refresh saves its result afterwards
+    memory._save_refresh(
+        "memory-quest", "memory-user", "summary of 0 and 1",
+        [turn["turn_id"] for turn in overflow], turns_since_refresh
+    )
+
+    db = SessionLocal()
+    summary, recent = memory.load_history(db, "memory-quest", "memory-user")
+    remaining = [
+        content for content, in db.query(ConversationTurn.content).order_by(ConversationTurn.created_at)
+    ]
+    row = db.query(ConversationSummary).one()
+    db.close()
+
+    assert summary == "summary of 0 and 1"
+    assert remaining == ["question 2", "answer 2", "question 3", "answer 3"]
+    assert recent == [{"role": "user", "content": "question 3"}, {"role": "assistant", "content": "answer 3"}]
+    assert row.turns_since_refresh == 1
+    assert row.total_turns == 4
+
+    # Saving the same refresh again (a duplicate run) changes nothing
+    memory._save_refresh(
+        "memory-quest", "memory-user", "stale summary",
+        [turn["turn_id"] for turn in overflow], turns_since_refresh
+    )
+    db = SessionLocal()
+    row = db.query(ConversationSummary).one()
+    db.close()
+    assert row.summary == "summary of 0 and 1"
+    assert row.turns_since_refresh == 1
+
+if __name__ == "__main__":
+    test_append_during_refresh_is_kept()
+    print("✅ Turns appended during a summary refresh were kept")
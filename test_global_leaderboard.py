@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Global Leaderboard Test
+Global totals maintained by deltas on join, score change and leave, with
+ranks refreshed by POST /api/global-leaderboard/update, match a full
+rebuild from quest_participants (POST /update?rebuild=true), including a
+user whose participation predates their global row.
+
+Run with: python -m pytest -q test_global_leaderboard.py  (or python test_global_leaderboard.py)
+"""
+
+import asyncio
+import os
+import random
+import sys
+import tempfile
+
+# Throwaway SQLite database; must be set before the app is imported
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/test_global_leaderboard.db"
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi.testclient import TestClient
+
+from app.database import SessionLocal, init_db
+from app.main import app
+from app.models.global_leaderboard import GlobalLeaderboard
+from app.models.participant import QuestParticipant
+from app.models.quest import Quest
+from app.models.user import User
+from app.services.global_leaderboard_service import GlobalLeaderboardService
+
+USERS = [f"global-u{i}" for i in range(6)]
+
+def _global_rows():
+    db = SessionLocal()
+    try:
+        return {
+            row.user_id: (round(row.total_score, 3), row.quests_participated, round(row.average_score, 3), row.rank)
+            for row in db.query(GlobalLeaderboard)
+        }
+    finally:
+        db.close()
+
+def test_incremental_totals_match_rebuild():
+    asyncio.run(init_db())
+    rng = random.Random(2)
+    client = TestClient(app)
+
+    db = SessionLocal()
+    for quest_id in ("global-q1", "global-q2", "global-q3"):
+        db.add(Quest(quest_id=quest_id, title=quest_id))
+    for user_id in USERS:
+        db.add(User(user_id=user_id, username=f"{user_id}-name"))
+    # Participation from before global totals were maintained
+    db.add(QuestParticipant(quest_id="global-q1", user_id=USERS[0], score=40, message_count=0))
+    db.commit()
+
+    for user_id in USERS:
+        for quest_id in ("global-q2", "global-q3"):
+            # USERS[0]'s join creates their global row from the older participation too
+            if user_id in USERS[:2] or rng.random() < 0.7:
+                response = client.post(f"/api/quests/{quest_id}/join", json={"user_id": user_id})
+                assert response.status_code == 200, response.text
+
+    # Score changes the way a scored message applies them
+    for _ in range(30):
+        participant = rng.choice(db.query(QuestParticipant).order_by(
+            QuestParticipant.quest_id, QuestParticipant.user_id
+        ).all())
+        delta = rng.randint(1, 9)
+        participant.score += delta
+        GlobalLeaderboardService(db).apply_participant_change(participant.user_id, score_delta=delta)
+        db.commit()
+    db.close()
+
+    for quest_id in ("global-q2", "global-q3"):
+        response = client.delete(f"/api/quests/{quest_id}/leave", params={"user_id": USERS[1]})
+        assert response.status_code == 200, response.text
+
+    assert client.post("/api/global-leaderboard/update").json()["success"]
+    incremental = _global_rows()
+    assert client.post("/api/global-leaderboard/update", params={"rebuild": True}).json()["success"]
+    rebuilt = _global_rows()
+
+    assert incremental == rebuilt
+    assert rebuilt[USERS[1]][:3] == (0, 0, 0)
+    assert sorted(rank for *_, rank in rebuilt.values()) == list(range(1, len(rebuilt) + 1))
+
+    top = client.get("/api/global-leaderboard/", params={"limit": 3}).json()
+    ranked = sorted(rebuilt, key=lambda user_id: rebuilt[user_id][3])
+    assert [entry["user_id"] for entry in top["leaderboard"]] == ranked[:3]
+
+if __name__ == "__main__":
+    test_incremental_totals_match_rebuild()
+    print("✅ Incremental global totals and ranks matched a full rebuild")
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Idempotent Message Test
+A send retried with the same Idempotency-Key gets the first reply back
+without storing another message or spending another credit; reusing the key
+for a different message is rejected with 422. Concurrent duplicates run the
+handler once, and a failed request is not stored.
+
+Run with: python -m pytest -q test_idempotency.py  (or python test_idempotency.py)
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+
+# Throwaway SQLite database and the offline AI backend; must be set before the app is imported
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/test_idempotency.db"
+os.environ["AI_BACKEND"] = "fake"
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.database import SessionLocal, init_db
+from app.main import app
+from app.models.credits import UserCredits
+from app.models.message import ChatMessage
+from app.models.participant import QuestParticipant
+from app.models.quest import Quest
+from app.models.user import User
+from app.services.idempotency import IdempotencyStore
+
+def _seed(quest_id: str, user_id: str):
+    db = SessionLocal()
+    db.add(Quest(quest_id=quest_id, title="Idempotency"))
+    db.add(User(user_id=user_id, username=user_id))
+    db.add(QuestParticipant(quest_id=quest_id, user_id=user_id, score=0))
+    db.add(UserCredits(user_id=user_id, quest_id=quest_id, daily_credits=5, credits_used_today=0))
+    db.commit()
+    db.close()
+
+def _stored(quest_id: str, user_id: str):
+    db = SessionLocal()
+    try:
+        messages = db.query(ChatMessage).filter(
+            ChatMessage.quest_id == quest_id, ChatMessage.user_id == user_id
+        ).count()
+        credits = db.query(UserCredits).filter(
+            UserCredits.quest_id == quest_id, UserCredits.user_id == user_id
+        ).first()
+        return messages, credits.credits_used_today
+    finally:
+        db.close()
+
+def test_retry_replays_first_reply():
+    settings.AI_BACKEND = "fake"
+    settings.AI_FAKE_LATENCY_DISTRIBUTION = "fixed"
+    settings.AI_FAKE_LATENCY_MS = 0
+    asyncio.run(init_db())
+    _seed("idem-quest", "idem-user")
+    client = TestClient(app)
+    url = "/api/quests/idem-quest/messages"
+    body = {"user_id": "idem-user", "user_message": "What walks on four legs?"}
+
+    first = client.post(url, json=body, headers={"Idempotency-Key": "send-1"})
+    assert first.status_code == 200, first.text
+    retry = client.post(url, json=body, headers={"Idempotency-Key": "send-1"})
+    assert retry.status_code == 200, retry.text
+    assert retry.json() == first.json()
+    assert _stored("idem-quest", "idem-user") == (1, 1)
+
+    # Same key, different message
+    changed = client.post(
+        url, json={**body, "user_message": "What walks on two legs?"}, headers={"Idempotency-Key": "send-1"}
+    )
+    assert changed.status_code == 422, changed.text
+
+    # A new key is a new send
+    other = client.post(url, json=body, headers={"Idempotency-Key": "send-2"})
+    assert other.status_code == 200, other.text
+    assert other.json()["user_message"]["message_id"] != first.json()["user_message"]["message_id"]
+    assert _stored("idem-quest", "idem-user") == (2, 2)
+
+def test_concurrent_duplicates_run_once():
+    store = IdempotencyStore(max_entries=100, ttl_seconds=60, wait_seconds=5)
+    calls = []
+
+    async def handler():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"reply": len(calls)}
+
+    async def failing():
+        raise HTTPException(status_code=500, detail="AI service error")
+
+    async def run():
+        key = store.build_key("chat_message", "u1", "k1")
+        fingerprint = store.fingerprint({"user_message": "Hi"})
+        results = await asyncio.gather(*[store.execute(key, fingerprint, handler) for _ in range(5)])
+
+        failed_key = store.build_key("chat_message", "u1", "k2")
+        try:
+            await store.execute(failed_key, fingerprint, failing)
+        except HTTPException:
+            pass
+        retried = await store.execute(failed_key, fingerprint, handler)
+        return results, retried
+
+    results, retried = asyncio.run(run())
+    assert results == [{"reply": 1}] * 5
+    assert retried == {"reply": 2}
+    assert len(calls) == 2
+
+if __name__ == "__main__":
+    test_retry_replays_first_reply()
+    test_concurrent_duplicates_run_once()
+    print("✅ Retried sends were replayed once and reused keys were rejected")
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Leaderboard Around-Player Test
+GET /api/leaderboard/{quest_id}/around/{user_id} returns the player's rank
+and the `window` players above and below them, matching a brute-force sort
+(ties broken by last_reply_at, then user_id) with the in-memory engine off
+and on. Unranked players get 404.
+
+Run with: python -m pytest -q test_leaderboard_around.py  (or python test_leaderboard_around.py)
+"""
+
+import asyncio
+import os
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+# Throwaway SQLite database; must be set before the app is imported
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/test_leaderboard_around.db"
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.database import SessionLocal, init_db
+from app.main import app
+from app.models.participant import QuestParticipant
+from app.models.quest import Quest
+from app.models.user import User
+from app.services.leaderboard_service import LeaderboardService
+
+WINDOW = 3
+
+def _seed(quest_id: str) -> list:
+    """40 players with many tied scores and reply times; returns the expected order"""
+    rng = random.Random(5)
+    replied_at = datetime(2026, 1, 1)
+    db = SessionLocal()
+    db.add(Quest(quest_id=quest_id, title="Around"))
+    players = []
+    for index in range(40):
+        user_id = f"{quest_id}-u{index:02d}"
+        score = rng.randint(0, 5)
+        last_reply_at = replied_at + timedelta(seconds=rng.randint(0, 3))
+        db.add(User(user_id=user_id, username=f"{user_id}-name"))
+        db.add(QuestParticipant(
+            quest_id=quest_id, user_id=user_id, score=score, message_count=1, last_reply_at=last_reply_at
+        ))
+        players.append((-score, last_reply_at, user_id))
+    db.add(User(user_id=f"{quest_id}-nobody", username=f"{quest_id}-nobody-name"))
+    db.commit()
+    LeaderboardService(db).rebuild_leaderboard(quest_id)
+    db.close()
+    return [user_id for _, _, user_id in sorted(players)]
+
+def _check_around(client: TestClient, quest_id: str, expected: list):
+    for index in (0, 1, 5, 20, 38, 39):
+        response = client.get(
+            f"/api/leaderboard/{quest_id}/around/{expected[index]}", params={"window": WINDOW}
+        )
+        assert response.status_code == 200, response.text
+        body = response.json()
+        assert body["rank"] == index + 1
+        start = max(index - WINDOW, 0)
+        assert [(entry["rank"], entry["user_id"]) for entry in body["leaderboard"]] == [
+            (rank, user_id) for rank, user_id in enumerate(expected[start:index + WINDOW + 1], start + 1)
+        ]
+        assert all(entry["username"] == f"{entry['user_id']}-name" for entry in body["leaderboard"])
+
+    assert client.get(f"/api/leaderboard/{quest_id}/around/{quest_id}-nobody").status_code == 404
+    assert client.get(f"/api/leaderboard/{quest_id}/around/{expected[0]}", params={"window": 0}).status_code == 422
+
+def test_around_matches_brute_force():
+    settings.LEADERBOARD_ENGINE_ENABLED = False
+    asyncio.run(init_db())
+    expected = _seed("around-sql")
+
+    _check_around(TestClient(app), "around-sql", expected)
+
+def test_around_matches_brute_force_with_engine():
+    settings.LEADERBOARD_ENGINE_ENABLED = True
+    try:
+        asyncio.run(init_db())
+        expected = _seed("around-engine")
+
+        _check_around(TestClient(app), "around-engine", expected)
+    finally:
+        settings.LEADERBOARD_ENGINE_ENABLED = False
+
+if __name__ == "__main__":
+    test_around_matches_brute_force()
+    test_around_matches_brute_force_with_engine()
+    print("✅ Around-player windows matched a brute-force ranking")
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Leaderboard Cache Test
+Polling /live with If-None-Match keeps getting 304 while the standings are
+unchanged, also after the cached body expired and was rebuilt, and gets a
+new body as soon as a score change commits. The global leaderboard honours
+weak and `*` validators and is only invalidated by committed changes.
+
+Run with: python -m pytest -q test_leaderboard_cache.py  (or python test_leaderboard_cache.py)
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Throwaway SQLite database; must be set before the app is imported
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/test_leaderboard_cache.db"
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.database import SessionLocal, init_db
+from app.main import app
+from app.models.participant import QuestParticipant
+from app.models.quest import Quest
+from app.models.user import User
+from app.services.global_leaderboard_service import GlobalLeaderboardService
+from app.services.leaderboard_cache import GLOBAL_SCOPE, leaderboard_cache
+from app.services.leaderboard_service import LeaderboardService
+
+TTL_SECONDS = 0.2
+
+def _setup(quest_id: str, user_prefix: str):
+    settings.LEADERBOARD_ENGINE_ENABLED = False
+    leaderboard_cache.enabled = True
+    leaderboard_cache.ttl_seconds = TTL_SECONDS
+    asyncio.run(init_db())
+
+    db = SessionLocal()
+    db.add(Quest(quest_id=quest_id, title="Cache"))
+    replied_at = datetime.now() - timedelta(minutes=5)
+    for index in range(3):
+        db.add(User(user_id=f"{user_prefix}{index}", username=f"{user_prefix}{index}"))
+        db.add(QuestParticipant(
+            quest_id=quest_id, user_id=f"{user_prefix}{index}", score=10 * index,
+            message_count=1, last_reply_at=replied_at + timedelta(seconds=index)
+        ))
+    db.commit()
+    LeaderboardService(db).update_leaderboard(quest_id)
+    db.close()
+
+def test_unchanged_leaderboard_stays_304_after_ttl():
+    _setup("cache-quest", "cache-u")
+    client = TestClient(app)
+
+    first = client.get("/api/leaderboard/cache-quest/live")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert [entry["user_id"] for entry in first.json()["leaderboard"]] == ["cache-u2", "cache-u1", "cache-u0"]
+
+    assert client.get("/api/leaderboard/cache-quest/live", headers={"If-None-Match": etag}).status_code == 304
+
+    # The cached body expires and is rebuilt from unchanged data: same ETag
+    time.sleep(TTL_SECONDS + 0.1)
+    rebuilt = client.get("/api/leaderboard/cache-quest/live", headers={"If-None-Match": etag})
+    assert rebuilt.status_code == 304
+    assert rebuilt.headers["etag"] == etag
+
+    # A committed score change is served right away
+    db = SessionLocal()
+    participant = db.query(QuestParticipant).filter(QuestParticipant.user_id == "cache-u0").one()
+    participant.score = 50
+    participant.last_reply_at = datetime.now()
+    db.commit()
+    LeaderboardService(db).update_leaderboard("cache-quest", ["cache-u0"])
+    db.close()
+
+    changed = client.get("/api/leaderboard/cache-quest/live", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert changed.json()["leaderboard"][0]["user_id"] == "cache-u0"
+
+def test_global_leaderboard_revalidation():
+    _setup("global-cache-quest", "global-cache-u")
+    db = SessionLocal()
+    GlobalLeaderboardService(db).rebuild_global_leaderboard()
+    client = TestClient(app)
+
+    first = client.get("/api/global-leaderboard/")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    for validator in (etag, f"W/{etag}", '"other", ' + etag, "*"):
+        response = client.get("/api/global-leaderboard/", headers={"If-None-Match": validator})
+        assert response.status_code == 304, validator
+    assert client.get("/api/global-leaderboard/", headers={"If-None-Match": '"other"'}).status_code == 200
+
+    # A rolled-back change leaves the cached body in place
+    version = leaderboard_cache.version(GLOBAL_SCOPE)
+    GlobalLeaderboardService(db).apply_participant_change("global-cache-u0", score_delta=100)
+    db.rollback()
+    assert leaderboard_cache.version(GLOBAL_SCOPE) == version
+
+    GlobalLeaderboardService(db).apply_participant_change("global-cache-u0", score_delta=100)
+    db.commit()
+    GlobalLeaderboardService(db).update_global_leaderboard()
+    db.close()
+    assert leaderboard_cache.version(GLOBAL_SCOPE) > version
+
+    changed = client.get("/api/global-leaderboard/", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert changed.json()["leaderboard"][0]["user_id"] == "global-cache-u0"
+
+if __name__ == "__main__":
+    test_unchanged_leaderboard_stays_304_after_ttl()
+    test_global_leaderboard_revalidation()
+    print("✅ Unchanged leaderboards were revalidated with 304 until a change committed")
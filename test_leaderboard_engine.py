@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Leaderboard Engine Test
+The in-memory order-statistic ranking agrees with a brute-force sort after
+random inserts, moves and removals. With LEADERBOARD_ENGINE_ENABLED only
+committed score updates reach it, and a snapshot writes the same order
+to the leaderboards table.
+
+Run with: python -m pytest -q test_leaderboard_engine.py  (or python test_leaderboard_engine.py)
+"""
+
+import asyncio
+import os
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+# Throwaway SQLite database; must be set before the app is imported
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/test_leaderboard_engine.db"
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.config import settings
+from app.database import SessionLocal, init_db
+from app.models.leaderboard import Leaderboard
+from app.models.participant import QuestParticipant
+from app.models.quest import Quest
+from app.models.user import User
+from app.services.leaderboard_engine import QuestRanking, SortedKeyList, leaderboard_engine
+from app.services.leaderboard_service import RANK_ORDER, LeaderboardService
+
+class SmallSortedKeyList(SortedKeyList):
+    """Tiny sublists so a few thousand operations split and merge them often"""
+    LOAD = 4
+
+def test_sorted_key_list_matches_sorted_reference():
+    rng = random.Random(3)
+    keys = SmallSortedKeyList()
+    reference = []
+    for _ in range(3000):
+        key = (rng.randint(0, 50), rng.randint(0, 50))
+        if key in reference:
+            keys.remove(key)
+            reference.remove(key)
+        else:
+            keys.add(key)
+            reference.append(key)
+        reference.sort()
+
+        assert len(keys) == len(reference)
+        if reference:
+            position = rng.randrange(len(reference))
+            assert keys.index(reference[position]) == position
+            assert list(keys.islice(position, position + 5)) == reference[position:position + 5]
+    assert list(keys) == reference
+
+def test_quest_ranking_matches_brute_force():
+    rng = random.Random(7)
+    started = datetime(2026, 1, 1)
+    players = {
+        f"u{i:02d}": (rng.randint(0, 20), started + timedelta(seconds=i), 1) for i in range(40)
+    }
+    ranking = QuestRanking("engine-unit", [(user_id, *entry) for user_id, entry in players.items()])
+
+    for step in range(500):
+        user_id = f"new{step}" if rng.random() < 0.2 else rng.choice(list(players))
+        if user_id in players and rng.random() < 0.2:
+            ranking.remove(user_id)
+            del players[user_id]
+            continue
+        score, _, messages = players.get(user_id, (0, None, 0))
+        entry = (score + rng.randint(0, 3), started + timedelta(minutes=step), messages + 1)
+        ranking.update(user_id, *entry)
+        players[user_id] = entry
+
+    expected = sorted(players, key=lambda user_id: (-players[user_id][0], players[user_id][1], user_id))
+    assert len(expected) > 15
+    assert [entry["user_id"] for entry in ranking.entries(0, len(expected))] == expected
+    for position, user_id in enumerate(expected, 1):
+        assert ranking.rank(user_id) == position
+    assert [entry["rank"] for entry in ranking.entries(10, 15)] == [11, 12, 13, 14, 15]
+    assert ranking.max_score() == players[expected[0]][0]
+    assert ranking.rank("nobody") is None
+
+def test_engine_applies_committed_updates_only():
+    settings.LEADERBOARD_ENGINE_ENABLED = True
+    try:
+        asyncio.run(init_db())
+        rng = random.Random(11)
+        replied_at = datetime(2026, 1, 1)
+        user_ids = [f"engine-u{i:02d}" for i in range(30)]
+
+        db = SessionLocal()
+        db.add(Quest(quest_id="engine-quest", title="Engine"))
+        for index, user_id in enumerate(user_ids):
+            db.add(User(user_id=user_id, username=user_id))
+            db.add(QuestParticipant(
+                quest_id="engine-quest", user_id=user_id, score=index % 7,
+                message_count=1, last_reply_at=replied_at + timedelta(seconds=index)
+            ))
+        db.commit()
+        LeaderboardService(db).rebuild_leaderboard("engine-quest")
+
+        for step in range(200):
+            changed = rng.sample(user_ids, rng.choice([1, 2]))
+            for user_id in changed:
+                participant = db.query(QuestParticipant).filter_by(quest_id="engine-quest", user_id=user_id).one()
+                replied_at += timedelta(seconds=1)
+                participant.score += rng.choice([0, 1, 5])
+                participant.last_reply_at = replied_at
+                participant.message_count += 1
+            db.flush()
+            LeaderboardService(db, autocommit=False).update_leaderboard("engine-quest", changed)
+            if step % 10 == 0:
+                db.rollback()  # rolled-back scores must not reach memory
+            else:
+                db.commit()
+
+        participants = db.query(QuestParticipant).filter_by(quest_id="engine-quest").order_by(
+            QuestParticipant.score.desc(), QuestParticipant.last_reply_at, QuestParticipant.user_id
+        ).all()
+        expected = [participant.user_id for participant in participants]
+        service = LeaderboardService(db)
+        assert [entry["user_id"] for entry in service.get_leaderboard("engine-quest", 30)] == expected
+        assert service.get_user_rank("engine-quest", expected[7]) == 8
+
+        leaderboard_engine.snapshot()
+        rows = db.query(Leaderboard).filter_by(quest_id="engine-quest").order_by(*RANK_ORDER).all()
+        assert [(row.user_id, row.score, row.total_messages) for row in rows] == [
+            (participant.user_id, participant.score, participant.message_count) for participant in participants
+        ]
+        db.close()
+    finally:
+        settings.LEADERBOARD_ENGINE_ENABLED = False
+
+if __name__ == "__main__":
+    test_sorted_key_list_matches_sorted_reference()
+    test_quest_ranking_matches_brute_force()
+    test_engine_applies_committed_updates_only()
+    print("✅ The in-memory leaderboard matched a brute-force ranking")
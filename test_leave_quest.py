@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Leave Quest Test
+A player who leaves a quest disappears from its leaderboard right away:
+their leaderboards row is deleted in the leave transaction, cached
+responses are invalidated and the in-memory ranking (when enabled) drops
+them without a later snapshot writing the row back.
+
+Run with: python -m pytest -q test_leave_quest.py  (or python test_leave_quest.py)
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+# Throwaway SQLite database; must be set before the app is imported
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/test_leave_quest.db"
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.database import SessionLocal, init_db
+from app.main import app
+from app.models.leaderboard import Leaderboard
+from app.models.participant import QuestParticipant
+from app.models.quest import Quest
+from app.models.user import User
+from app.services.leaderboard_engine import leaderboard_engine
+from app.services.leaderboard_service import LeaderboardService
+
+def _seed(quest_id: str):
+    db = SessionLocal()
+    db.add(Quest(quest_id=quest_id, title=quest_id))
+    replied_at = datetime.now() - timedelta(minutes=5)
+    for index, score in enumerate([30, 90, 60]):
+        user_id = f"{quest_id}-u{index}"
+        if db.get(User, user_id) is None:
+            db.add(User(user_id=user_id, username=user_id))
+        db.add(QuestParticipant(
+            quest_id=quest_id, user_id=user_id, score=score,
+            message_count=1, last_reply_at=replied_at + timedelta(seconds=index)
+        ))
+    db.commit()
+    LeaderboardService(db).update_leaderboard(quest_id)
+    db.close()
+
+def _top(client: TestClient, quest_id: str):
+    response = client.get(f"/api/leaderboard/{quest_id}/top/5")
+    assert response.status_code == 200, response.text
+    return [(entry["rank"], entry["user_id"]) for entry in response.json()["top_participants"]]
+
+def _stored(quest_id: str):
+    db = SessionLocal()
+    try:
+        return {user_id for user_id, in db.query(Leaderboard.user_id).filter(Leaderboard.quest_id == quest_id)}
+    finally:
+        db.close()
+
+def _leave_and_check(client: TestClient, quest_id: str):
+    # Served (and cached) before the leave
+    assert _top(client, quest_id) == [(1, f"{quest_id}-u1"), (2, f"{quest_id}-u2"), (3, f"{quest_id}-u0")]
+
+    response = client.delete(f"/api/quests/{quest_id}/leave", params={"user_id": f"{quest_id}-u1"})
+    assert response.status_code == 200, response.text
+
+    assert _top(client, quest_id) == [(1, f"{quest_id}-u2"), (2, f"{quest_id}-u0")]
+    assert _stored(quest_id) == {f"{quest_id}-u0", f"{quest_id}-u2"}
+
+def test_leave_removes_leaderboard_entry():
+    settings.LEADERBOARD_ENGINE_ENABLED = False
+    asyncio.run(init_db())
+    _seed("leave-sql")
+
+    _leave_and_check(TestClient(app), "leave-sql")
+
+def test_leave_removes_engine_entry():
+    settings.LEADERBOARD_ENGINE_ENABLED = True
+    try:
+        asyncio.run(init_db())
+        _seed("leave-engine")
+
+        _leave_and_check(TestClient(app), "leave-engine")
+        assert leaderboard_engine.rank("leave-engine", "leave-engine-u1") is None
+
+        # A snapshot after the leave does not write the departed player's row back
+        leaderboard_engine.snapshot()
+        assert _stored("leave-engine") == {"leave-engine-u0", "leave-engine-u2"}
+    finally:
+        settings.LEADERBOARD_ENGINE_ENABLED = False
+
+if __name__ == "__main__":
+    test_leave_removes_leaderboard_entry()
+    test_leave_removes_engine_entry()
+    print("✅ Players who left were removed from the leaderboard")
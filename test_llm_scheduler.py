@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+LLM Scheduler Test
+When a concurrency slot frees up, waiting chat requests are served before
+lower classes regardless of arrival order; a class whose queue is full is
+rejected right away (503 when slots are busy, 429 when it is rate limited).
+
+Run with: python -m pytest -q test_llm_scheduler.py  (or python test_llm_scheduler.py)
+"""
+
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.llm_scheduler import CHAT, ENGAGEMENT, SCORING, SUMMARY, LLMCapacityError, LLMScheduler
+
+def test_higher_priority_class_is_served_first():
+    scheduler = LLMScheduler(1, {})
+    served = []
+
+    async def request(request_class: str):
+        async with scheduler.slot(request_class):
+            served.append(request_class)
+            await asyncio.sleep(0.01)
+
+    async def run():
+        await scheduler.acquire(CHAT)  # every slot is busy
+        waiting = [asyncio.create_task(request(request_class)) for request_class in (SUMMARY, SCORING, CHAT)]
+        await asyncio.sleep(0.01)
+        scheduler.release()
+        await asyncio.gather(*waiting)
+
+    asyncio.run(run())
+    assert served == [CHAT, SCORING, SUMMARY]
+    assert scheduler.in_flight == 0
+
+def test_full_queue_is_rejected():
+    scheduler = LLMScheduler(1, {
+        SUMMARY: {"max_queue": 1},
+        ENGAGEMENT: {"rate_per_second": 0.5, "burst": 1, "max_queue": 1}
+    })
+
+    async def run():
+        errors = {}
+        await scheduler.acquire(CHAT)
+        queued = asyncio.create_task(scheduler.acquire(SUMMARY))
+        await asyncio.sleep(0)
+        try:
+            await scheduler.acquire(SUMMARY)
+        except LLMCapacityError as e:
+            errors[SUMMARY] = e.status_code
+
+        # Rate limited: the one token goes to the first request, the next one waits in the queue
+        scheduler.release()
+        await queued
+        scheduler.release()
+        await scheduler.acquire(ENGAGEMENT)
+        scheduler.release()
+        limited = asyncio.create_task(scheduler.acquire(ENGAGEMENT))
+        await asyncio.sleep(0)
+        try:
+            await scheduler.acquire(ENGAGEMENT)
+        except LLMCapacityError as e:
+            errors[ENGAGEMENT] = (e.status_code, e.headers["Retry-After"])
+        limited.cancel()
+        return errors
+
+    errors = asyncio.run(run())
+    assert errors[SUMMARY] == 503
+    assert errors[ENGAGEMENT] == (429, "2")
+    assert scheduler.stats()["classes"][SUMMARY]["rejected"] == 1
+
+if __name__ == "__main__":
+    test_higher_priority_class_is_served_first()
+    test_full_queue_is_rejected()
+    print("✅ LLM requests were served by priority and rejected when queues were full")
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+LLM Usage Test
+A call's prompt_chars includes the system instruction sent with it, and
+with AI_USAGE_PERSISTENT the records still short of a full batch are
+written to llm_call_log when the app shuts down.
+
+Run with: python -m pytest -q test_llm_usage.py  (or python test_llm_usage.py)
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+
+# Throwaway SQLite database and the offline AI backend; must be set before the app is imported
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/test_llm_usage.db"
+os.environ["AI_BACKEND"] = "fake"
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.database import SessionLocal, init_db
+from app.main import app
+from app.models.llm_call_log import LLMCallLog
+from app.services.ai_clients import get_ai_clients
+from app.services.ai_service import AIService
+from app.services.llm_usage import llm_usage
+
+PERSONA = "You are the Sphinx. Answer only in riddles."
+
+def _fake_backend():
+    settings.AI_BACKEND = "fake"
+    settings.AI_FAKE_LATENCY_DISTRIBUTION = "fixed"
+    settings.AI_FAKE_LATENCY_MS = 0
+    settings.AI_FAKE_ERROR_RATE = 0.0
+
+def test_prompt_chars_include_system_instruction():
+    _fake_backend()
+    llm_usage.clear()
+    service = AIService()
+    model = get_ai_clients().get_model(system_instruction=PERSONA)
+
+    asyncio.run(service._generate("Hello", model=model, system_instruction=PERSONA, quest_id="usage-q1"))
+    asyncio.run(service._generate("Hello", quest_id="usage-q1"))
+
+    totals = llm_usage.summary()["totals"]
+    assert totals["calls"] == 2
+    assert totals["avg_prompt_chars"] == (2 * len("Hello") + len(PERSONA)) / 2
+
+def test_pending_records_are_written_on_shutdown():
+    _fake_backend()
+    asyncio.run(init_db())
+    persistent, flush_size = llm_usage.persistent, llm_usage.flush_size
+    llm_usage.persistent, llm_usage.flush_size = True, 50
+    llm_usage.clear()
+    try:
+        with TestClient(app):
+            for i in range(3):
+                llm_usage.record("chat", "fake-model", 0.01, True, prompt_chars=10, quest_id=f"usage-q{i}")
+            db = SessionLocal()
+            assert db.query(LLMCallLog).count() == 0  # below AI_USAGE_FLUSH_SIZE
+            db.close()
+
+        db = SessionLocal()
+        try:
+            assert db.query(LLMCallLog).count() == 3
+        finally:
+            db.close()
+    finally:
+        llm_usage.persistent, llm_usage.flush_size = persistent, flush_size
+
+if __name__ == "__main__":
+    test_prompt_chars_include_system_instruction()
+    test_pending_records_are_written_on_shutdown()
+    print("✅ LLM usage counted system instructions and was flushed on shutdown")
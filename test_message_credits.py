@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Message Credits Test
+Two messages sent at once with one credit left both pass the up-front check
+while their replies are generated; only one may spend the credit. The other
+gets 402 and leaves nothing behind (no stored message, no score).
+
+Run with: python -m pytest -q test_message_credits.py  (or python test_message_credits.py)
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+
+# Throwaway SQLite database and the offline AI backend; must be set before the app is imported
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/test_message_credits.db"
+os.environ["AI_BACKEND"] = "fake"
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import httpx
+
+from app.core.config import settings
+from app.database import SessionLocal, init_db
+from app.main import app
+from app.models.credits import UserCredits
+from app.models.message import ChatMessage
+from app.models.participant import QuestParticipant
+from app.models.quest import Quest
+from app.models.user import User
+from app.services.credits_service import CreditsService
+
+def _seed(quest_id: str, user_id: str):
+    db = SessionLocal()
+    db.add(Quest(quest_id=quest_id, title="Credits"))
+    db.add(User(user_id=user_id, username=user_id))
+    db.add(QuestParticipant(quest_id=quest_id, user_id=user_id, score=0))
+    db.add(UserCredits(user_id=user_id, quest_id=quest_id, daily_credits=1, credits_used_today=0))
+    db.commit()
+    db.close()
+
+def test_concurrent_sends_spend_one_credit():
+    settings.AI_BACKEND = "fake"
+    settings.AI_FAKE_LATENCY_DISTRIBUTION = "fixed"
+    settings.AI_FAKE_LATENCY_MS = 200  # both requests are past the credit check before either saves
+    asyncio.run(init_db())
+    _seed("credit-quest", "credit-user")
+
+    async def send_both():
+        # One event loop, as in a server worker
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await asyncio.gather(*[
+                client.post("/api/quests/credit-quest/messages", json={"user_id": "credit-user", "user_message": text})
+                for text in ("First riddle answer", "Second riddle answer")
+            ])
+
+    responses = asyncio.run(send_both())
+
+    assert sorted(response.status_code for response in responses) == [200, 402], [r.text for r in responses]
+    accepted = next(response for response in responses if response.status_code == 200)
+
+    db = SessionLocal()
+    try:
+        messages = db.query(ChatMessage).filter(ChatMessage.quest_id == "credit-quest").all()
+        assert len(messages) == 2  # the accepted message and its reply
+        participant = db.query(QuestParticipant).filter_by(quest_id="credit-quest", user_id="credit-user").one()
+        assert participant.score == accepted.json()["total_score"]
+        credits = db.query(UserCredits).filter_by(quest_id="credit-quest", user_id="credit-user").one()
+        assert credits.credits_used_today == 1
+    finally:
+        db.close()
+
+def test_spend_credit_without_credits_changes_nothing():
+    asyncio.run(init_db())
+    _seed("credit-quest-2", "credit-user-2")
+    db = SessionLocal()
+    try:
+        service = CreditsService(db)
+        assert service.spend_credit("credit-user-2", "credit-quest-2")["success"]
+        result = service.spend_credit("credit-user-2", "credit-quest-2")
+        assert not result["success"]
+        assert service.get_user_credits("credit-user-2", "credit-quest-2").credits_used_today == 1
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    test_concurrent_sends_spend_one_credit()
+    test_spend_credit_without_credits_changes_nothing()
+    print("✅ Concurrent sends could not spend more credits than the user had")
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Chat History Polling Test
+Two sends interleave: the earlier-stamped one commits last. A client polling
+with `after` must still receive both messages exactly once. The default
+(newest) page shows a message sent a moment ago right away, and its cursor
+still leads the next poll to a message that commits late behind it.
+
+Run with: python -m pytest -q test_message_polling.py  (or python test_message_polling.py)
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Throwaway SQLite database; must be set before the app is imported
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/test_message_polling.db"
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.database import SessionLocal, init_db
+from app.main import app
+from app.models.message import ChatMessage
+from app.models.quest import Quest
+
+SETTLE_SECONDS = 0.5
+
+def _add_message(db, quest_id: str, content: str, created_at: datetime):
+    db.add(ChatMessage(quest_id=quest_id, user_id=None, content=content, created_at=created_at))
+
+def _poll(client: TestClient, quest_id: str, cursor: str):
+    response = client.get(f"/api/quests/{quest_id}/messages", params={"after": cursor})
+    assert response.status_code == 200, response.text
+    page = response.json()
+    return [message["content"] for message in page["messages"]], page["next_cursor"]
+
+def test_poll_does_not_skip_late_commit():
+    settings.CHAT_POLL_SETTLE_SECONDS = SETTLE_SECONDS
+    asyncio.run(init_db())
+    client = TestClient(app)
+
+    db = SessionLocal()
+    db.add(Quest(quest_id="poll-quest", title="Polling"))
+    _add_message(db, "poll-quest", "opening", datetime.utcnow() - timedelta(minutes=1))
+    db.commit()
+
+    first = client.get("/api/quests/poll-quest/messages").json()
+    assert [message["content"] for message in first["messages"]] == ["opening"]
+    cursor = first["next_cursor"]
+
+    # Send A is stamped first but is still writing when send B commits
+    a_created_at = datetime.utcnow()
+    time.sleep(0.01)
+    _add_message(db, "poll-quest", "B", datetime.utcnow())
+    db.commit()
+
+    seen, cursor = _poll(client, "poll-quest", cursor)
+
+    # A commits after the poll, behind B in (created_at, message_id) order
+    _add_message(db, "poll-quest", "A", a_created_at)
+    db.commit()
+
+    time.sleep(SETTLE_SECONDS + 0.1)
+    more, cursor = _poll(client, "poll-quest", cursor)
+    seen += more
+    more, cursor = _poll(client, "poll-quest", cursor)
+    seen += more
+    db.close()
+
+    assert sorted(seen) == ["A", "B"], seen
+
+def test_newest_page_shows_recent_messages_without_skipping():
+    settings.CHAT_POLL_SETTLE_SECONDS = SETTLE_SECONDS
+    asyncio.run(init_db())
+    client = TestClient(app)
+
+    db = SessionLocal()
+    db.add(Quest(quest_id="reload-quest", title="Reload"))
+    _add_message(db, "reload-quest", "opening", datetime.utcnow() - timedelta(minutes=1))
+    db.commit()
+
+    # Send A is stamped first but is still writing when send B commits
+    a_created_at = datetime.utcnow()
+    time.sleep(0.01)
+    _add_message(db, "reload-quest", "B", datetime.utcnow())
+    db.commit()
+
+    # The sender reloads the history right away and sees their message
+    page = client.get("/api/quests/reload-quest/messages").json()
+    assert [message["content"] for message in page["messages"]] == ["opening", "B"]
+
+    _add_message(db, "reload-quest", "A", a_created_at)
+    db.commit()
+    db.close()
+
+    # Recent rows may come again in the next poll; the late commit must not be skipped
+    time.sleep(SETTLE_SECONDS + 0.1)
+    seen, cursor = _poll(client, "reload-quest", page["next_cursor"])
+    assert sorted(set(seen)) == ["A", "B"], seen
+    more, _ = _poll(client, "reload-quest", cursor)
+    assert more == []
+
+if __name__ == "__main__":
+    test_poll_does_not_skip_late_commit()
+    test_newest_page_shows_recent_messages_without_skipping()
+    print("✅ Polling with `after` received every message exactly once")
+    print("✅ The newest page showed recent messages without skipping late commits")
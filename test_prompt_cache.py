@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Prompt Cache Test
+A quest's character prompt is built once and reused while its
+prompt_version is unchanged; a bumped version or an explicit invalidate
+rebuilds it, and callers without a version are keyed on the quest content.
+With AI_USE_SYSTEM_INSTRUCTION the persona rides on a per-quest model.
+
+Run with: python -m pytest -q test_prompt_cache.py  (or python test_prompt_cache.py)
+"""
+
+import os
+import sys
+import tempfile
+
+# Throwaway SQLite database and the offline AI backend; must be set before the app is imported
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/test_prompt_cache.db"
+os.environ["AI_BACKEND"] = "fake"
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.config import settings
+from app.services.ai_service import AIService
+from app.services.prompt_cache import prompt_cache
+
+DETAILS = {"properties": {"character_name": "The Sphinx", "personality": "cryptic"}}
+
+def _use_system_instruction(enabled: bool) -> bool:
+    """Set AI_USE_SYSTEM_INSTRUCTION and start from an empty cache; returns the previous setting"""
+    previous = settings.AI_USE_SYSTEM_INSTRUCTION
+    settings.AI_USE_SYSTEM_INSTRUCTION = enabled
+    prompt_cache.clear()
+    return previous
+
+def _compile(service: AIService, quest_id: str, version=None, title: str = "Riddles"):
+    return service._get_compiled_prompt(DETAILS, title, "Answer the riddle", "", quest_id, version)
+
+def test_prompt_is_reused_until_version_changes():
+    previous = _use_system_instruction(False)
+    try:
+        service = AIService()
+        first = _compile(service, "prompt-q1", version=1)
+        assert "The Sphinx" in first.character_prompt
+        assert _compile(service, "prompt-q1", version=1) is first
+
+        # An edit bumps prompt_version; the stale entry is discarded
+        bumped = _compile(service, "prompt-q1", version=2)
+        assert bumped is not first
+        assert _compile(service, "prompt-q1", version=2) is bumped
+
+        prompt_cache.invalidate("prompt-q1")
+        assert _compile(service, "prompt-q1", version=2) is not bumped
+    finally:
+        _use_system_instruction(previous)
+
+def test_content_version_without_prompt_version():
+    previous = _use_system_instruction(False)
+    try:
+        service = AIService()
+        first = _compile(service, "prompt-q2")
+        assert _compile(service, "prompt-q2") is first
+        renamed = _compile(service, "prompt-q2", title="Harder riddles")
+        assert renamed is not first
+        assert "Harder riddles" in renamed.character_prompt
+    finally:
+        _use_system_instruction(previous)
+
+def test_system_instruction_model_is_cached():
+    previous = _use_system_instruction(True)
+    try:
+        service = AIService()
+        compiled = _compile(service, "prompt-q3", version=1)
+        assert compiled.model is not None
+
+        prompt, model, system_instruction = service._with_character_prompt(compiled, "User: Hello")
+        assert prompt == "User: Hello"
+        assert model is compiled.model
+        assert system_instruction == compiled.character_prompt
+        assert _compile(service, "prompt-q3", version=1).model is compiled.model
+    finally:
+        _use_system_instruction(previous)
+
+if __name__ == "__main__":
+    test_prompt_is_reused_until_version_changes()
+    test_content_version_without_prompt_version()
+    test_system_instruction_model_is_cached()
+    print("✅ Character prompts were reused until the quest changed")
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Score Cache Test
+A repeated message in the same quest context is scored from the cache
+(ignoring case and whitespace); a different quest, context or scoring
+criteria misses, an expired entry misses, and with AI_SCORE_CACHE_PERSISTENT
+a score survives the in-memory cache being cleared while expired rows are
+purged from the table.
+
+Run with: python -m pytest -q test_score_cache.py  (or python test_score_cache.py)
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+# Throwaway SQLite database and the offline AI backend; must be set before the app is imported
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/test_score_cache.db"
+os.environ["AI_BACKEND"] = "fake"
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.config import settings
+from app.database import SessionLocal, init_db
+from app.models.score_cache import ScoreCacheEntry
+from app.services import ai_service as ai_service_module
+from app.services.ai_service import AIService
+from app.services.score_cache import ScoreCache
+
+CRITERIA = {"creativity": 0.5, "depth": 0.5}
+
+def _use_cache(cache: ScoreCache) -> ScoreCache:
+    """Point AIService at `cache`; returns the cache it used before"""
+    settings.AI_BACKEND = "fake"
+    settings.AI_FAKE_LATENCY_DISTRIBUTION = "fixed"
+    settings.AI_FAKE_LATENCY_MS = 0
+    settings.AI_SCORE_CACHE_ENABLED = True
+    previous = ai_service_module.score_cache
+    ai_service_module.score_cache = cache
+    return previous
+
+def test_repeated_message_is_scored_from_cache():
+    cache = ScoreCache(max_entries=100, ttl_seconds=60)
+    previous = _use_cache(cache)
+    service = AIService()
+
+    async def run():
+        first = await service.score_user_message("What is truth?", "A riddle", CRITERIA, quest_id="q1")
+        again = await service.score_user_message("  what IS   truth? ", "A riddle", CRITERIA, quest_id="q1")
+        other_quest = await service.score_user_message("What is truth?", "A riddle", CRITERIA, quest_id="q2")
+        other_context = await service.score_user_message("What is truth?", "A new riddle", CRITERIA, quest_id="q1")
+        other_criteria = await service.score_user_message("What is truth?", "A riddle", {"depth": 1.0}, quest_id="q1")
+        return first, again, other_quest, other_context, other_criteria
+
+    try:
+        first, again, *misses = asyncio.run(run())
+    finally:
+        _use_cache(previous)
+
+    assert first["success"] and not first.get("cached")
+    assert again["cached"] and again["score"] == first["score"]
+    assert not any(result.get("cached") for result in misses)
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 4
+
+def test_expired_entry_misses():
+    cache = ScoreCache(max_entries=100, ttl_seconds=0.1)
+    key = cache.build_key("Hello", "context", CRITERIA, "q1")
+
+    async def run():
+        await cache.set(key, {"score": 70, "score_breakdown": {}, "feedback": ""})
+        fresh = await cache.get(key)
+        time.sleep(0.15)
+        return fresh, await cache.get(key)
+
+    fresh, expired = asyncio.run(run())
+    assert fresh["score"] == 70
+    assert expired is None
+
+def test_persistent_entry_survives_memory_clear():
+    asyncio.run(init_db())
+    cache = ScoreCache(max_entries=100, ttl_seconds=60, persistent=True)
+    key = cache.build_key("Hello", "context", CRITERIA, "q1")
+
+    async def run():
+        await cache.set(key, {"score": 81, "score_breakdown": {"depth": 81}, "feedback": "Deep"})
+        cache.clear()
+        return await cache.get(key)
+
+    restored = asyncio.run(run())
+    assert restored["score"] == 81
+    assert cache.stats()["persistent_hits"] == 1
+
+def test_expired_rows_are_purged():
+    asyncio.run(init_db())
+    cache = ScoreCache(max_entries=100, ttl_seconds=0.1, persistent=True, purge_interval_seconds=0.1)
+    keys = [cache.build_key(f"Message {i}", "context", CRITERIA, "purge-q") for i in range(3)]
+
+    def stored():
+        db = SessionLocal()
+        try:
+            return {key for key, in db.query(ScoreCacheEntry.cache_key).filter(ScoreCacheEntry.cache_key.in_(keys))}
+        finally:
+            db.close()
+
+    async def run():
+        for key in keys[:2]:
+            await cache.set(key, {"score": 60})
+        assert stored() == set(keys[:2])
+        time.sleep(0.15)
+        # The next write after the purge interval deletes what has expired
+        await cache.set(keys[2], {"score": 60})
+
+    asyncio.run(run())
+    assert stored() == {keys[2]}
+
+if __name__ == "__main__":
+    test_repeated_message_is_scored_from_cache()
+    test_expired_entry_misses()
+    test_persistent_entry_survives_memory_clear()
+    test_expired_rows_are_purged()
+    print("✅ Scores were reused within a quest context and missed outside it")